@@ -0,0 +1,380 @@
+"""An asyncio-native serving mode for the snippet routes.
+
+`app` is a plain ASGI application, so any ASGI server can run it:
+
+    uvicorn asgi:app --port 8080
+
+For environments without one, `python3 asgi.py` serves it with the minimal
+HTTP/1.1 server below. Either way, one event loop can hold many thousands of
+slow connections, rather than tying an OS thread to each like `app.run` does.
+
+It shares `solution.database` and friends, so the status codes and JSON are
+the same as the Flask routes'; only `hash()` (via `solution.hasher`) and
+journal commits leave the event loop, on the default executor.
+"""
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+from http import HTTPStatus
+
+import compression
+import solution
+import validation
+
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+# past this many bytes of a body that the app didn't read, `handle()` hangs up
+# rather than read them
+MAX_DRAIN = 64 * 1024
+
+
+async def read_json(scope, receive, **kwargs):
+    """Parses the body as it arrives, like `solution.get_json()` does."""
+    parser = validation.JSONParser(limit=solution.MAX_BODY, **kwargs)
+    length = dict(scope["headers"]).get(b"content-length")
+    if length is not None and length.isdigit():
+        parser.check_length(int(length))
+    first = True
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client disconnected mid-request")
+        if first and not message.get("more_body"):  # it all came at once
+            return parser.parse(message.get("body", b""))
+        first = False
+        parser.feed(message.get("body", b""))
+        if not message.get("more_body"):
+            return parser.close()
+
+
+def base_url(scope) -> str:
+    headers = dict(scope["headers"])
+    host = headers.get(b"host", b"").decode("latin1")
+    if not host:
+        host = "%s:%d" % tuple(scope["server"])
+    return f"{scope['scheme']}://{host}{scope.get('root_path', '')}/snippets/"
+
+
+async def make_snippet(scope, receive):
+    """The asynchronous twin of `solution.make_snippet()`."""
+    js = await read_json(scope, receive, fields=solution.SNIPPET_FIELDS)
+    valid = isinstance(js, dict) and solution.validate_make_snippet(js)
+    if not valid:
+        return {"error": "Invalid JSON"}, 400
+    name, expiration, content, password = valid
+
+    if name in solution.database:  # cheap check before paying for `hash()`
+        return {"error": "Snippet already exists"}, 409
+    if solution.over_budget(name, content):
+        return {"error": "Snippet is larger than the memory budget"}, 413
+
+    loop = asyncio.get_running_loop()
+    password_hash = None
+    if password:
+        password_hash = await loop.run_in_executor(None, solution.hasher.hash, password)
+
+    snippet = solution.Snippet.restore(
+        name, time.time() + expiration, content, password_hash, 0, base_url(scope)
+    )
+    if not solution.database.create_if_absent(snippet):
+        return {"error": "Snippet already exists"}, 409
+
+    seq = solution.created(snippet)
+    if solution.journal is not None:
+        await loop.run_in_executor(None, solution.journal.wait, seq)
+    return solution.respond(snippet, 201, cache=False)
+
+
+async def make_snippets(scope, receive):
+    """The asynchronous twin of `solution.make_snippets()`."""
+    js = await read_json(scope, receive, fields=solution.BULK_FIELDS, many=True)
+    # the passwords are hashed, and the batch waits on the journal
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, solution.create_snippets, js, base_url(scope)
+    )
+
+
+async def edit_snippet(scope, receive, name):
+    """The asynchronous twin of `solution.edit_snippet()`."""
+    js = await read_json(scope, receive, fields=solution.SNIPPET_FIELDS)
+    if_match = dict(scope["headers"]).get(b"if-match")
+    if if_match is not None:
+        if_match = if_match.decode("latin1")
+    # the password check hashes, and durable edits wait on the journal
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, solution.change_snippet, name, js, if_match)
+
+
+def throttled(scope):
+    """`solution.throttle()` for the request's endpoint and client."""
+    if not solution.rate_limits:
+        return None
+    client = None
+    if solution.RATE_LIMIT_HEADER:
+        headers = dict(scope["headers"])
+        key = solution.RATE_LIMIT_HEADER.lower().encode("latin1")
+        client = headers.get(key, b"").decode("latin1")
+    if not client and scope.get("client"):
+        client = scope["client"][0]
+    return solution.throttle(scope["endpoint"], client)
+
+
+def query_args(scope) -> dict:
+    query = urllib.parse.parse_qs(scope["query_string"].decode("latin1"))
+    return {key: values[0] for key, values in query.items()}
+
+
+async def dispatch(scope, receive):
+    """Routes a request, returning a view's `(body, status[, headers])`.
+
+    The view's name is left in `scope["endpoint"]`, as Flask would call it.
+    """
+    method = scope["method"]
+    raw_path = scope.get("raw_path") or scope["path"].encode()
+    segments = raw_path.decode("latin1").split("?")[0].strip("/").split("/")
+    segments = [urllib.parse.unquote(segment) for segment in segments]
+
+    if segments == ["metrics"]:
+        scope["endpoint"] = "metrics"
+        if method != "GET":
+            return {"error": "Method not allowed"}, 405
+        headers = {"Content-Type": solution.METRICS_CONTENT_TYPE}
+        return solution.render_metrics().encode(), 200, headers
+
+    if segments == ["snippets"]:
+        if method == "GET":
+            scope["endpoint"] = "list_snippets"
+            args = query_args(scope)
+            return solution.scan_snippets(
+                args.get("prefix", ""), args.get("limit"), args.get("cursor")
+            )
+        scope["endpoint"] = "make_snippet"
+        if method != "POST":
+            return {"error": "Method not allowed"}, 405
+        refused = throttled(scope)
+        if refused:
+            return refused
+        return await make_snippet(scope, receive)
+
+    if segments == ["snippets", "_bulk"]:
+        scope["endpoint"] = "make_snippets"
+        if method != "POST":
+            return {"error": "Method not allowed"}, 405
+        refused = throttled(scope)
+        if refused:
+            return refused
+        return await make_snippets(scope, receive)
+
+    if segments == ["snippets", "_mget"]:
+        scope["endpoint"] = "get_snippets"
+        if method != "POST":
+            return {"error": "Method not allowed"}, 405
+        refused = throttled(scope)
+        if refused:
+            return refused
+        return solution.fetch_snippets(await read_json(scope, receive))
+
+    if segments == ["snippets", "_top"]:
+        scope["endpoint"] = "top_snippets"
+        if method != "GET":
+            return {"error": "Method not allowed"}, 405
+        return solution.rank_snippets(query_args(scope).get("n"))
+
+    if segments == ["snippets", "_search"]:
+        scope["endpoint"] = "search_snippets"
+        if method != "GET":
+            return {"error": "Method not allowed"}, 405
+        args = query_args(scope)
+        return solution.find_snippets(args.get("q", ""), args.get("limit"))
+
+    if len(segments) == 2 and segments[0] == "snippets" and method == "PUT":
+        scope["endpoint"] = "edit_snippet"
+        refused = throttled(scope)
+        if refused:
+            return refused
+        return await edit_snippet(scope, receive, segments[1])
+
+    if len(segments) == 2 and segments[0] == "snippets":
+        scope["endpoint"] = "get_snippet"
+        if method != "GET":
+            return {"error": "Method not allowed"}, 405
+        refused = throttled(scope)
+        if refused:
+            return refused
+        headers = dict(scope["headers"])
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin1")
+        accept_encoding = headers.get(b"accept-encoding", b"").decode("latin1")
+        gzip = compression.accepts_gzip(accept_encoding)
+        return solution.fetch_snippet(segments[1], if_none_match, gzip)
+
+    if len(segments) == 3 and segments[0] == "snippets" and segments[2] == "like":
+        scope["endpoint"] = "like_snippet"
+        if method != "POST":
+            return {"error": "Method not allowed"}, 405
+        refused = throttled(scope)
+        if refused:
+            return refused
+        return solution.like_snippet(segments[1])
+
+    return {"error": "Not found"}, 404
+
+
+def handle_error(e):
+    """The response of the Flask app's error handler for `e`, e.g. a 503 for
+    `hashing.Saturated`, or `None` if it has none.
+    """
+    handlers = solution.app.error_handler_spec[None][None]
+    for cls in type(e).__mro__:
+        if cls in handlers:
+            return handlers[cls](e)
+    return None
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await receive()  # startup
+        await send({"type": "lifespan.startup.complete"})
+        await receive()  # shutdown
+        await send({"type": "lifespan.shutdown.complete"})
+        return
+    if scope["type"] != "http":
+        return
+
+    started = time.perf_counter()
+    try:
+        rv = await dispatch(scope, receive)
+    except ConnectionError:
+        return
+    except Exception as e:
+        rv = handle_error(e)
+        if rv is None:
+            raise
+
+    body, status, *extra = rv
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+    headers = [(b"content-length", str(len(body)).encode())]
+    extra = {key.lower(): value for key, value in (extra[0] if extra else {}).items()}
+    if status != 304 and "content-type" not in extra:
+        headers += JSON_HEADERS
+    for key, value in extra.items():
+        headers.append((key.encode("latin1"), value.encode("latin1")))
+
+    elapsed = time.perf_counter() - started
+    solution.meter.observe(scope.get("endpoint", "unmatched"), status, elapsed)
+
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+#
+# A minimal HTTP/1.1 server follows
+#
+
+
+async def handle(reader, writer, app=app):
+    """Serves requests from one keep-alive connection until it closes."""
+    server = writer.get_extra_info("sockname")[:2]
+    client = writer.get_extra_info("peername")
+    try:
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            method, target, version = line.decode("latin1").split()
+
+            headers = []
+            while True:
+                header = await reader.readline()
+                if not header.strip():
+                    break
+                key, _, value = header.decode("latin1").partition(":")
+                headers.append((key.strip().lower().encode(), value.strip().encode()))
+
+            fields = dict(headers)
+            if b"chunked" in fields.get(b"transfer-encoding", b""):
+                writer.write(b"HTTP/1.1 411 Length Required\r\n\r\n")
+                break
+            remaining = int(fields.get(b"content-length", 0))
+            keep_alive = version == "HTTP/1.1"
+            keep_alive = keep_alive and fields.get(b"connection") != b"close"
+
+            path, _, query = target.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": version.partition("/")[2],
+                "method": method.upper(),
+                "scheme": "http",
+                "path": urllib.parse.unquote(path),
+                "raw_path": path.encode("latin1"),
+                "query_string": query.encode("latin1"),
+                "root_path": "",
+                "headers": headers,
+                "server": server,
+                "client": client,
+            }
+
+            async def receive():
+                nonlocal remaining
+                if not remaining:
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                chunk = await reader.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    return {"type": "http.disconnect"}
+                remaining -= len(chunk)
+                return {"type": "http.request", "body": chunk, "more_body": remaining > 0}
+
+            async def send(message):
+                nonlocal keep_alive
+                if message["type"] == "http.response.start":
+                    if remaining > MAX_DRAIN:  # e.g. a body refused early
+                        keep_alive = False  # rather than read the rest of it
+                    status = message["status"]
+                    lines = [f"HTTP/1.1 {status} {reason(status)}".encode()]
+                    lines += [k + b": " + v for k, v in message.get("headers", [])]
+                    if not keep_alive:
+                        lines.append(b"connection: close")
+                    writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+                elif message["type"] == "http.response.body":
+                    writer.write(message.get("body", b""))
+                    if not message.get("more_body"):
+                        await writer.drain()
+
+            await app(scope, receive, send)
+            if not keep_alive:
+                break
+            if remaining:  # the app didn't read the whole body
+                await reader.readexactly(remaining)
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+def reason(status) -> str:
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ""
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle, host, port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
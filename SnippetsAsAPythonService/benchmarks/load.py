@@ -0,0 +1,215 @@
+"""Drives a mix of create/get/like traffic at the server and reports latencies.
+
+    python3 benchmarks/load.py [--duration 10] [--clients 16]
+        [--mix create=1,get=8,like=1] [--keys 1000] [--zipf 1.1]
+        [--secured 0.1] [--sizes 64,1024,16384] [--url URL] [--output FILE]
+
+Unless `--url` points at a running server (say, `prefork.py` or `asgi.py`),
+the app is started in the background with `tests/runner.py`'s `ServerManager`,
+as the functional tests do.
+
+`--keys` snippets are created up front, and gets and likes pick among them,
+uniformly or, with `--zipf`, skewed towards a few hot keys. Creations always
+make new snippets. Sizes and whether a snippet is secured are drawn per
+snippet. The report is JSON, so runs can be diffed against each other.
+"""
+# add the solution's and the tests' directories into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+sys.path.insert(0, os.path.join(os.path.dirname(currentdir), "tests"))
+
+import argparse
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+
+import runner
+import solution
+from helpers import BASE_URL
+
+
+OPS = ("create", "get", "like")
+
+
+def parse_mix(text) -> dict:
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPS:
+            raise argparse.ArgumentTypeError(f"unknown operation: {op!r}")
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def parse_sizes(text) -> list:
+    return [int(size) for size in text.split(",")]
+
+
+class Workload:
+    """Everything a client needs to make up its next request."""
+
+    def __init__(self, args):
+        self.args = args
+        self.base_url = args.url.rstrip("/") + "/"
+        self.ops, self.op_weights = zip(*args.mix.items())
+        self.names = [f"load-{os.getpid()}-{i}" for i in range(args.keys)]
+
+        if args.zipf:
+            weights = [1 / (rank + 1) ** args.zipf for rank in range(args.keys)]
+        else:
+            weights = [1] * args.keys
+        self.key_weights = list(itertools.accumulate(weights))
+        self._serial = itertools.count()
+
+    def snippet(self, rng, name) -> dict:
+        request = {
+            "name": name,
+            "expires_in": 3600,
+            "snippet": "x" * rng.choice(self.args.sizes),
+        }
+        if rng.random() < self.args.secured:
+            request["password"] = "hunter2"
+        return request
+
+    def key(self, rng) -> str:
+        return rng.choices(self.names, cum_weights=self.key_weights)[0]
+
+    def url(self, *parts) -> str:
+        quoted = (urllib.parse.quote(part, safe="") for part in parts)
+        return self.base_url + "".join(part + "/" for part in quoted)
+
+    def request(self, session, rng, op):
+        if op == "create":
+            name = f"load-{os.getpid()}-new-{next(self._serial)}"
+            return session.post(self.url("snippets"), json=self.snippet(rng, name))
+        if op == "get":
+            return session.get(self.url("snippets", self.key(rng)))
+        return session.post(self.url("snippets", self.key(rng), "like"))
+
+
+def populate(workload, session):
+    rng = random.Random(0)
+    for name in workload.names:
+        r = session.post(workload.url("snippets"), json=workload.snippet(rng, name))
+        if r.status_code != 201:
+            raise RuntimeError(f"couldn't create {name}: {r.status_code} {r.text}")
+
+
+def client(workload, seed, deadline, samples):
+    """Sends requests until `deadline`, appending `(op, status, seconds)`."""
+    rng = random.Random(seed)
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            op = rng.choices(workload.ops, workload.op_weights)[0]
+            start = time.perf_counter()
+            try:
+                status = workload.request(session, rng, op).status_code
+            except requests.RequestException:
+                status = 0
+            samples.append((op, status, time.perf_counter() - start))
+
+
+def percentile(latencies, p) -> float:
+    """The nearest-rank percentile of sorted `latencies`, in milliseconds."""
+    if not latencies:
+        return 0.0
+    index = min(len(latencies) - 1, int(p / 100 * len(latencies)))
+    return round(latencies[index] * 1000, 3)
+
+
+def summarize(samples, elapsed) -> dict:
+    latencies = sorted(seconds for _, _, seconds in samples)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    errors = sum(n for status, n in statuses.items() if not 200 <= status < 400)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "p999_ms": percentile(latencies, 99.9),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def run(args) -> dict:
+    workload = Workload(args)
+    with requests.Session() as session:
+        populate(workload, session)
+
+    per_client = [[] for _ in range(args.clients)]
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [
+        threading.Thread(target=client, args=(workload, seed, deadline, samples))
+        for seed, samples in enumerate(per_client)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for samples in per_client for sample in samples]
+    by_op = {op: [s for s in samples if s[0] == op] for op in workload.ops}
+    return {
+        "config": {
+            "duration": args.duration,
+            "clients": args.clients,
+            "mix": args.mix,
+            "keys": args.keys,
+            "zipf": args.zipf,
+            "secured": args.secured,
+            "sizes": args.sizes,
+        },
+        "total": summarize(samples, elapsed),
+        "ops": {op: summarize(op_samples, elapsed) for op, op_samples in by_op.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default="create=1,get=8,like=1")
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--zipf", type=float, default=0.0, help="skew, 0 for uniform")
+    parser.add_argument("--secured", type=float, default=0.1)
+    parser.add_argument("--sizes", type=parse_sizes, default="64,1024,16384")
+    parser.add_argument("--url", help="a running server, instead of starting one")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url is None:
+        args.url = BASE_URL
+        # logging every request would be most of what's measured
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = runner.ServerManager.create(solution.app)
+        server.start()
+    try:
+        report = run(args)
+    finally:
+        if server is not None:
+            server.stop()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares the memory used per snippet against the original representation.
+
+    python3 benchmarks/memory.py [count]
+
+Names and contents are allocated up front and shared by both representations,
+so only the per-snippet overhead is measured. A second run gives every snippet
+its own copy of the same template, as separate requests would.
+
+Each snippet is measured once it's been responded with, as it is when created:
+responses to writes cache nothing, like the original, which encoded every
+response from scratch.
+"""
+# add the solution's directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import datetime
+import json
+import tracemalloc
+import urllib
+
+import solution
+
+
+class LegacySnippet:
+    """The original `Snippet` attributes: a `__dict__`, `datetime` and `url`."""
+
+    def __init__(self, name, expires_in, content, base_url):
+        self.name = name
+        self.expires_at = datetime.datetime.now()
+        self.expires_at += datetime.timedelta(seconds=expires_in)
+        self.snippet = content
+        self.password_hash = None
+        self.likes = 0
+
+        self.url = base_url + urllib.parse.quote(self.name, safe="")
+
+
+def measure(make, count) -> float:
+    """Returns the bytes allocated per object by `make(i)`."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = [make(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the list holding them isn't part of a snippet
+    return (after - before - sys.getsizeof(keep)) / len(keep)
+
+
+def main(count=100_000):
+    names = [f"snippet-{i}" for i in range(count)]
+    content = "hello, snippets!"
+    template = "<p>{{ greeting }}, {{ name }}!</p>\n" * 32
+    base_url = "http://localhost:8080/snippets/"
+
+    def copy(i):
+        return "".join(template.partition("\n"))
+
+    def responded(snippet):
+        solution.respond(snippet, 201, cache=False)
+        return snippet
+
+    with solution.app.test_request_context("/snippets/", method="POST"):
+        legacy = measure(lambda i: LegacySnippet(names[i], 30, content, base_url), count)
+        compact = measure(
+            lambda i: responded(solution.Snippet(names[i], 30, content)), count
+        )
+        legacy_copies = measure(
+            lambda i: LegacySnippet(names[i], 30, copy(i), base_url), count
+        )
+        deduplicated = measure(
+            lambda i: responded(solution.Snippet(names[i], 30, copy(i))), count
+        )
+
+    print(
+        json.dumps(
+            {
+                "count": count,
+                "legacy_bytes_per_snippet": round(legacy, 1),
+                "bytes_per_snippet": round(compact, 1),
+                "ratio": round(compact / legacy, 3),
+                "template_bytes": len(template),
+                "legacy_bytes_per_copy": round(legacy_copies, 1),
+                "bytes_per_copy": round(deduplicated, 1),
+                "copy_ratio": round(deduplicated / legacy_copies, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,125 @@
+"""Times the hot helpers in `solution.py`, without starting a server.
+
+    python3 benchmarks/micro.py              # just report
+    python3 benchmarks/micro.py --save       # record the results as the baseline
+    python3 benchmarks/micro.py --check [--threshold 25]
+
+`--check` exits with a non-zero status if any helper got slower than its
+baseline by more than the threshold, in percent, even after measuring it again.
+Baselines are only comparable on the machine (and Python) they were recorded
+on, so re-record them with `--save` when either changes.
+"""
+# add the solution's directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import argparse
+import json
+import platform
+import timeit
+
+import solution
+
+
+BASELINE = os.path.join(currentdir, "baseline.json")
+
+
+def cases() -> dict:
+    """Returns a zero-argument callable for each helper, by name."""
+    create = {"name": "name", "expires_in": 30, "snippet": "x" * 256, "password": "pw"}
+    edit = {"snippet": "y" * 256, "password": "pw"}
+
+    with solution.app.test_request_context("/snippets/", method="POST"):
+        snippet = solution.Snippet("name", 30, "x" * 256)
+
+        def make():
+            return solution.Snippet("name", 30, "x" * 256)
+
+    return {
+        "validate_make_snippet": lambda: solution.validate_make_snippet(create),
+        "validate_edit_request": lambda: solution.validate_edit_request(edit),
+        "hash": lambda: solution.hash("hunter2"),
+        "Snippet.__init__": make,
+        "Snippet.json": lambda: snippet.json,
+        "Snippet.body": lambda: snippet.body,
+        "Snippet.expired": lambda: snippet.expired,
+    }
+
+
+def measure(fn, repeat=5) -> float:
+    """The best of `repeat` runs of at least 0.2s each, in nanoseconds per call."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def run(names=None) -> dict:
+    """Measures every helper, or only those in `names`, in nanoseconds per call."""
+    results = {}
+    for name, fn in cases().items():
+        if names and name not in names:
+            continue
+        if name == "Snippet.__init__":  # it needs a request for the base url
+            with solution.app.test_request_context("/snippets/", method="POST"):
+                results[name] = measure(fn)
+        else:
+            results[name] = measure(fn)
+    return results
+
+
+def compare(results, baseline, threshold) -> tuple:
+    """Returns a report of each result against its baseline, and the regressions."""
+    report, regressions = {}, []
+    for name, ns in results.items():
+        entry = report[name] = {"ns": round(ns, 1)}
+        if name not in baseline:
+            continue
+        change = (ns / baseline[name] - 1) * 100
+        entry.update(baseline_ns=baseline[name], change_pct=round(change, 1))
+        if change > threshold:
+            regressions.append(name)
+    return report, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="only these helpers")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save", action="store_true", help="record a new baseline")
+    mode.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--threshold", type=float, default=25.0, help="in percent")
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args(argv)
+
+    results = run(args.names)
+    if args.save:
+        recorded = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "ns": {name: round(ns, 1) for name, ns in results.items()},
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(recorded, f, indent=2)
+            f.write("\n")
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["ns"]
+
+    report, regressions = compare(results, baseline, args.threshold)
+    for _ in range(2):  # re-measure suspects, a noisy neighbour is likelier
+        if not (args.check and regressions):
+            break
+        for name, ns in run(regressions).items():
+            results[name] = min(results[name], ns)
+        report, regressions = compare(results, baseline, args.threshold)
+
+    print(json.dumps({"results": report, "regressions": regressions}, indent=2))
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Measures how long recovering from the journal takes.
+
+    python3 benchmarks/recovery.py [count]
+
+A snapshot of `count` snippets, each of a few dozen words drawn from a
+Zipf-like vocabulary (as in `benchmarks/search.py`), is written out and then
+recovered into the app's (otherwise empty) store. That takes `seconds`, after
+which requests could be served, and the contents have all been indexed for
+search after `indexed_seconds`.
+"""
+# add the solution's directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import json
+import random
+import tempfile
+import time
+
+import persistence
+import solution
+
+
+def main(count=200_000, words=12, vocabulary=5_000):
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    tokens = [f"w{rank}" for rank in range(vocabulary)]
+    expires_at = time.time() + 3600
+    base_url = "http://localhost:8080/snippets/"
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = persistence.Journal(directory, lambda: ())
+        path = journal._path("snapshot-", 1, ".snap")
+        with open(path, "wb") as f:
+            for i in range(count):
+                content = " ".join(rng.choices(tokens, weights, k=words))
+                f.write(
+                    persistence.encode(
+                        persistence.CREATE,
+                        expires_at,
+                        i % 7,
+                        f"snippet-{i}",
+                        content,
+                        b"",
+                        base_url,
+                        "0",
+                    )
+                )
+        size = os.path.getsize(path)
+
+        started = time.perf_counter()
+        indexer = solution.recover(journal)
+        recovered = time.perf_counter() - started
+        indexer.join()
+        indexed = time.perf_counter() - started
+
+    print(
+        json.dumps(
+            {
+                "count": count,
+                "snapshot_bytes": size,
+                "seconds": round(recovered, 3),
+                "us_per_event": round(recovered / count * 1e6, 2),
+                "indexed_seconds": round(indexed, 3),
+                "stored": len(solution.database),
+                "searchable": len(solution.search_index),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""Measures the search index's memory and query latency.
+
+    python3 benchmarks/search.py [count]
+
+Snippets are made of words drawn from a Zipf-like vocabulary, so some words
+are in most snippets and most words are in a few, as in real text.
+"""
+# add the solution's directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import json
+import random
+import time
+import tracemalloc
+
+import search
+import solution
+
+
+QUERIES = ["w1 w7", "w3 w150", "w12*", "w2 w40*", "w999 w5"]
+
+
+def percentile(samples, p):
+    return sorted(samples)[int(p / 100 * (len(samples) - 1))]
+
+
+def main(count=20_000, words=40, vocabulary=5_000, repeat=50):
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    tokens = [f"w{rank}" for rank in range(vocabulary)]
+
+    with solution.app.test_request_context("/snippets/", method="POST"):
+        snippets = [
+            solution.Snippet(
+                f"snippet-{i}", 3600, " ".join(rng.choices(tokens, weights, k=words))
+            )
+            for i in range(count)
+        ]
+
+    index = search.SearchIndex()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for snippet in snippets:
+        index.add(snippet)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    latencies = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            index.search(query, 10)
+            samples.append(time.perf_counter() - start)
+        latencies[query] = {
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        }
+
+    print(
+        json.dumps(
+            {
+                "count": count,
+                "words_per_snippet": words,
+                "index_bytes": memory,
+                "index_bytes_per_snippet": round(memory / count, 1),
+                "index_us_per_snippet": round(elapsed / count * 1e6, 1),
+                "queries": latencies,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
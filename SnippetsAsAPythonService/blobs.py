@@ -0,0 +1,73 @@
+"""Content-addressed storage for snippet contents.
+
+Many snippets are the same template posted under different names, so contents
+are deduplicated by their Blake2 digest, and every snippet with the same
+content references a single `Blob`.
+"""
+import hashlib
+import threading
+import weakref
+
+
+class Blob:
+    """One stored content; `value` is whatever the store's `pack()` made of it."""
+
+    __slots__ = ("digest", "value", "size", "encoded", "__weakref__")
+
+    def __init__(self, digest, value, size):
+        self.digest = digest
+        self.value = value
+        self.size = size  # of the content in UTF-8, however it's stored
+        self.encoded = None  # cached by whoever encodes it, e.g. for responses
+
+
+class BlobStore:
+    """Hands out a shared `Blob` for every content of at least `min_size`.
+
+    Shorter contents are returned as they are, since a blob and its index
+    entry would cost more than a copy. Blobs are only referenced weakly here,
+    so the reference counts are the snippets': when the last one holding a
+    blob is evicted, the blob is freed and drops out of the index.
+    """
+
+    def __init__(self, pack=None, min_size=256):
+        self.pack = pack or (lambda text: text)
+        self.min_size = min_size
+
+        self._blobs = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._hits = self._misses = 0
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def intern(self, text: str):
+        """Returns `text` itself if it's short, its `Blob` otherwise."""
+        if len(text) < self.min_size:
+            return text
+
+        raw = text.encode("utf8")
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        with self._lock:
+            blob = self._blobs.get(digest)
+            if blob is not None:
+                self._hits += 1
+                return blob
+
+        value = self.pack(text)  # may be slow, so outside the lock
+        with self._lock:
+            blob = self._blobs.get(digest)
+            if blob is None:
+                blob = self._blobs[digest] = Blob(digest, value, len(raw))
+                self._misses += 1
+            else:
+                self._hits += 1
+        return blob
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
@@ -0,0 +1,249 @@
+"""Caps the memory snippets may take up, evicting some early to stay under it.
+
+Which snippets go first is up to a policy:
+
+    lru     the least recently read
+    lfu     the least liked, and the least recently added or liked among those
+    expiry  the soonest to expire
+
+Each keeps its order up to date as snippets are read or liked, so picking a
+victim never means scanning the store.
+"""
+import collections
+import heapq
+import itertools
+import threading
+
+
+# Bytes per snippet besides its name and contents: the instance, its entries in
+# the store and the indexes, and the cached encoding's and strings' headers.
+OVERHEAD = 512
+
+
+class LRU:
+    def __init__(self):
+        self._order = collections.OrderedDict()  # snippet -> None, oldest first
+
+    def add(self, snippet):
+        self._order[snippet] = None
+
+    def discard(self, snippet):
+        self._order.pop(snippet, None)
+
+    def touch(self, snippet):
+        try:
+            self._order.move_to_end(snippet)
+        except KeyError:
+            pass
+
+    def liked(self, snippet):
+        pass
+
+    def pop(self):
+        if not self._order:
+            return None
+        return self._order.popitem(last=False)[0]
+
+
+class _Bucket:
+    __slots__ = ("likes", "members", "prev", "next")
+
+    def __init__(self, likes):
+        self.likes = likes
+        self.members = {}  # snippet -> None, in the order they got here
+        self.prev = self.next = self
+
+
+class LFU:
+    """Snippets with equal likes share a bucket, and buckets form a list sorted
+    by likes, so the least liked are at its head.
+
+    Getting `k` likes moves a snippet at most `k` buckets along, so keeping the
+    list sorted costs O(1) amortized per like.
+    """
+
+    def __init__(self):
+        self._head = _Bucket(-1)  # a sentinel, the list is circular
+        self._buckets = {}  # snippet -> its bucket
+
+    def add(self, snippet):
+        self._place(snippet, self._head)
+
+    def discard(self, snippet):
+        self._remove(snippet)
+
+    def touch(self, snippet):
+        pass
+
+    def liked(self, snippet):
+        before = self._remove(snippet)
+        if before is not None:
+            self._place(snippet, before)
+
+    def pop(self):
+        first = self._head.next
+        if first is self._head:
+            return None
+        snippet = next(iter(first.members))
+        self._remove(snippet)
+        return snippet
+
+    def _place(self, snippet, bucket):
+        """Adds `snippet` to the list, searching onwards from `bucket`."""
+        likes = snippet.likes
+        while bucket.next is not self._head and bucket.next.likes <= likes:
+            bucket = bucket.next
+        if bucket.likes != likes:
+            new = _Bucket(likes)
+            new.prev, new.next = bucket, bucket.next
+            bucket.next.prev = bucket.next = new
+            bucket = new
+        bucket.members[snippet] = None
+        self._buckets[snippet] = bucket
+
+    def _remove(self, snippet):
+        """Removes `snippet`, returning the bucket before the one it was in."""
+        bucket = self._buckets.pop(snippet, None)
+        if bucket is None:
+            return None
+        del bucket.members[snippet]
+        before = bucket.prev
+        if not bucket.members:
+            before.next, bucket.next.prev = bucket.next, before
+        return before
+
+
+class Expiry:
+    """A min-heap of `(expires_at, seq, snippet)`, lazily updated like
+    `expiry.ExpiryIndex`: extended snippets are re-pushed once they come up.
+
+    Discarded snippets' entries are skipped when they come up, or dropped
+    whenever they make up most of the heap.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._members = set()
+
+    def add(self, snippet):
+        self._members.add(snippet)
+        heapq.heappush(self._heap, (snippet.expires_at, next(self._seq), snippet))
+
+    def discard(self, snippet):
+        self._members.discard(snippet)
+        if len(self._heap) > 2 * len(self._members) + 64:
+            self._heap = [e for e in self._heap if e[-1] in self._members]
+            heapq.heapify(self._heap)
+
+    def touch(self, snippet):
+        pass
+
+    def liked(self, snippet):
+        pass
+
+    def pop(self):
+        heap = self._heap
+        while heap:
+            expires_at, _, snippet = heapq.heappop(heap)
+            if snippet not in self._members:
+                continue
+            if snippet.expires_at > expires_at:  # extended since it was pushed
+                heapq.heappush(heap, (snippet.expires_at, next(self._seq), snippet))
+                continue
+            self._members.remove(snippet)
+            return snippet
+        return None
+
+
+POLICIES = {"lru": LRU, "lfu": LFU, "expiry": Expiry}
+
+
+class MemoryBudget:
+    """Keeps the total cost of the snippets it's given under `limit` bytes.
+
+    Snippets are referenced directly, so whatever evicts one must `discard()`
+    it as well. Memory they share, like a `blobs.Blob`, is charged once while
+    any of them is accounted for, and credited back once none is.
+    """
+
+    def __init__(self, limit, policy="lru"):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown eviction policy: {policy!r}")
+        self.limit = limit
+        self.used = 0
+        self._policy = POLICIES[policy]()
+        self._costs = {}  # snippet -> (what it was added at, its shared key)
+        self._shared = {}  # shared key -> [its cost, snippets referencing it]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._costs)
+
+    def add(self, snippet, cost, shared=None) -> list:
+        """Accounts for `snippet` at `cost` bytes, again if it was edited, plus
+        the memory it shares with others if `shared` is a `(key, cost)` pair.
+
+        Returns the snippets that have to go to make room for it, first to go
+        first; they're no longer accounted for. A snippet over the limit all by
+        itself displaces nothing, and is returned as the one that has to go.
+        """
+        with self._lock:
+            if self._release(snippet):
+                self._policy.discard(snippet)
+            if cost + (shared[1] if shared else 0) > self.limit:
+                return [snippet]
+
+            # charged before evicting, so evicting others can't credit it back
+            self._charge(snippet, cost, shared)
+            victims = []
+            while self.used > self.limit:
+                victim = self._policy.pop()
+                if victim is None:
+                    break
+                self._release(victim)
+                victims.append(victim)
+
+            self._policy.add(snippet)
+            return victims
+
+    def discard(self, snippet):
+        with self._lock:
+            if self._release(snippet):
+                self._policy.discard(snippet)
+
+    def touch(self, snippet):
+        """Notes that `snippet` was just read."""
+        with self._lock:
+            self._policy.touch(snippet)
+
+    def liked(self, snippet):
+        """Notes that `snippet`'s likes went up."""
+        with self._lock:
+            self._policy.liked(snippet)
+
+    def _charge(self, snippet, cost, shared):
+        key = None
+        if shared is not None:
+            key, shared_cost = shared
+            entry = self._shared.get(key)
+            if entry is None:
+                entry = self._shared[key] = [shared_cost, 0]
+                self.used += shared_cost
+            entry[1] += 1
+        self._costs[snippet] = (cost, key)
+        self.used += cost
+
+    def _release(self, snippet) -> bool:
+        """Credits back `snippet`, and what it shared if it was the last to."""
+        cost, key = self._costs.pop(snippet, (None, None))
+        if cost is None:
+            return False
+        self.used -= cost
+        if key is not None:
+            entry = self._shared[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._shared[key]
+                self.used -= entry[0]
+        return True
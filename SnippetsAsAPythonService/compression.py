@@ -0,0 +1,132 @@
+"""At-rest compression of large snippet contents.
+
+Pasted logs and code compress several times over, so contents past a size
+threshold are kept compressed and only inflated when they're read.
+
+Compressed snippets can also be sent gzipped without compressing anything per
+request: the unchanging part of the response is deflated once, ending on a
+byte boundary (`Z_SYNC_FLUSH`), so the few changing bytes can be deflated and
+appended after it, and the CRC continued from where it left off. With zlib,
+that deflated prefix is what's stored, rather than a second copy of it.
+"""
+import lzma
+import struct
+import threading
+import zlib
+
+
+ALGORITHMS = ("zlib", "lzma")
+
+# magic, deflate, no flags, no mtime, no extra flags, unknown OS
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+_GZIP_TRAILER = struct.Struct("<II")
+
+
+class Codec:
+    """Compresses strings of at least `threshold` UTF-8 bytes.
+
+    `pack()` returns either the string itself or its compressed bytes, and
+    `unpack()` undoes it, so callers can tell the two apart by type alone.
+
+    Given `encode`, zlib compresses `encode(text)` instead, as a prefix (see
+    `deflate_prefix()`), and `unpack()` then needs the `decode` that undoes it.
+    """
+
+    def __init__(self, algorithm="zlib", level=6, threshold=4096):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown compression algorithm: {algorithm!r}")
+        if not 0 <= level <= 9:
+            raise ValueError(f"compression level must be 0-9, not {level}")
+
+        self.algorithm = algorithm
+        self.level = level
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._compressed = self._skipped = 0
+        self._raw_bytes = self._stored_bytes = 0
+
+    def pack(self, text: str, encode=None):
+        if len(text) < self.threshold:  # never more bytes than characters
+            return text
+        raw = text.encode("utf8")
+
+        if self.algorithm == "lzma":
+            data = value = lzma.compress(raw, preset=self.level)
+        elif encode is not None:
+            value = self.deflate_prefix(encode(text))
+            data = value[0]
+        else:
+            data = value = zlib.compress(raw, self.level)
+
+        with self._lock:
+            if len(data) >= len(raw):
+                self._skipped += 1
+                return text
+            self._compressed += 1
+            self._raw_bytes += len(raw)
+            self._stored_bytes += len(data)
+        return value
+
+    def unpack(self, value, decode=None) -> str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, tuple):
+            return decode(inflate_prefix(value))
+        if self.algorithm == "lzma":
+            return lzma.decompress(value).decode("utf8")
+        return zlib.decompress(value).decode("utf8")
+
+    def deflate_prefix(self, data: bytes):
+        """Deflates the start of a gzip body, see `gzip_body()`."""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return deflated, zlib.crc32(data), len(data)
+
+    def stats(self) -> dict:
+        """Totals over every string that was large enough to compress."""
+        with self._lock:
+            stored = self._stored_bytes
+            return {
+                "algorithm": self.algorithm,
+                "compressed": self._compressed,
+                "incompressible": self._skipped,
+                "raw_bytes": self._raw_bytes,
+                "stored_bytes": stored,
+                "ratio": self._raw_bytes / stored if stored else 1.0,
+            }
+
+
+def inflate_prefix(prefix) -> bytes:
+    """Undoes `Codec.deflate_prefix()`."""
+    deflated, _, _ = prefix
+    return zlib.decompressobj(-zlib.MAX_WBITS).decompress(deflated)
+
+
+def gzip_body(prefix, tail: bytes) -> bytes:
+    """A gzip stream of the data `prefix` was made from, followed by `tail`."""
+    deflated, crc, size = prefix
+    compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return b"".join(
+        (
+            _GZIP_HEADER,
+            deflated,
+            compressor.compress(tail),
+            compressor.flush(),
+            _GZIP_TRAILER.pack(zlib.crc32(tail, crc), (size + len(tail)) & 0xFFFFFFFF),
+        )
+    )
+
+
+def accepts_gzip(accept_encoding) -> bool:
+    """Whether an `Accept-Encoding` header allows gzip."""
+    for entry in (accept_encoding or "").split(","):
+        coding, _, params = entry.partition(";")
+        if coding.strip().lower() not in ("gzip", "x-gzip", "*"):
+            continue
+        quality = params.strip().lower().removeprefix("q=")
+        try:
+            return not params.strip() or float(quality) > 0
+        except ValueError:
+            return False
+    return False
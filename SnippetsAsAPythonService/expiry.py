@@ -0,0 +1,138 @@
+"""Active expiration of snippets.
+
+Snippets are otherwise only checked for expiry when they are read, so anything
+that is never touched again would stay in memory forever.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+class ExpiryIndex:
+    """A min-heap of `(expires_at, seq, snippet)` entries.
+
+    Expirations only ever move forward (`update()`, `like()` and `edit()` all
+    extend them), so a heap entry is always a lower bound on the real expiry of
+    its snippet. Rather than re-heapifying on every extension, entries that come
+    due for snippets which have since been extended are re-scheduled at their
+    new time. Each snippet therefore costs O(log n) per reap, not per request.
+    """
+
+    def __init__(self, clock, batch_size=1024):
+        self.clock = clock
+        self.batch_size = batch_size
+        self._heap = []
+        self._seq = itertools.count()  # tie-breaker, snippets aren't orderable
+        self._discarded = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, snippet):
+        entry = (snippet.expires_at, next(self._seq), snippet)
+        with self._lock:
+            heapq.heappush(self._heap, entry)
+
+    def schedule_many(self, snippets):
+        """Like `schedule()` for each snippet, heapifying once for many."""
+        seq = self._seq
+        entries = [(snippet.expires_at, next(seq), snippet) for snippet in snippets]
+        with self._lock:
+            if len(entries) * 8 < len(self._heap):
+                for entry in entries:
+                    heapq.heappush(self._heap, entry)
+            else:
+                self._heap += entries
+                heapq.heapify(self._heap)
+
+    def discard(self, snippet):
+        """Unschedules `snippet`, e.g. when it's evicted before it expires.
+
+        Its entry is skipped once it comes due, unless the discarded entries
+        come to make up an eighth of the heap first, and are all dropped. That
+        keeps the snippets they reference from lingering for long.
+        """
+        with self._lock:
+            discarded = self._discarded
+            discarded.add(snippet)
+            if len(discarded) * 8 > len(self._heap):
+                self._heap = [e for e in self._heap if e[-1] not in discarded]
+                heapq.heapify(self._heap)
+                discarded.clear()
+
+    def due(self) -> list:
+        """Returns the snippets of every due entry, without popping any.
+
+        Only the part of the heap that's due is visited, since every child of
+        an entry that isn't due isn't either.
+        """
+        now = self.clock()
+        rv = []
+        with self._lock:
+            heap, stack = self._heap, [0]
+            while stack:
+                i = stack.pop()
+                if i < len(heap) and heap[i][0] <= now:
+                    rv.append(heap[i][-1])
+                    stack += (2 * i + 1, 2 * i + 2)
+        return rv
+
+    def reap(self, evict) -> int:
+        """Handles at most `batch_size` due entries, returning how many it did.
+
+        The lock is only held while popping, `evict` runs outside of it.
+        """
+        now = self.clock()
+        due, popped = [], 0
+        with self._lock:
+            while self._heap and popped < self.batch_size:
+                if self._heap[0][0] > now:
+                    break
+                popped += 1
+                snippet = heapq.heappop(self._heap)[-1]
+                if snippet in self._discarded:
+                    self._discarded.remove(snippet)
+                elif snippet.expires_at > now:  # extended since it was scheduled
+                    entry = (snippet.expires_at, next(self._seq), snippet)
+                    heapq.heappush(self._heap, entry)
+                else:
+                    due.append(snippet)
+
+        for snippet in due:
+            evict(snippet)
+        return popped
+
+
+class Reaper:
+    """Periodically drains an `ExpiryIndex` from a daemon thread.
+
+    The thread is started lazily because the server may be forked after this
+    module is imported (see `tests/runner.py`), and threads don't survive that.
+    """
+
+    def __init__(self, index, evict, interval=1.0):
+        self.index = index
+        self.evict = evict
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    name="SnippetReaper", target=self._run, daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            # drain in bounded batches, yielding between them so request
+            # threads never wait on a long eviction run
+            while self.index.reap(self.evict) >= self.index.batch_size:
+                time.sleep(0)
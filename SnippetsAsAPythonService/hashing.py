@@ -0,0 +1,91 @@
+"""Runs password hashing on a bounded worker pool.
+
+`hash()` is deliberately slow, so it must not be allowed to pile up behind a
+burst of secured snippets and starve everything else.
+"""
+import concurrent.futures
+import math
+import os
+import threading
+import time
+
+
+class Saturated(Exception):
+    """Raised when the hashing queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"hashing is saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class HashPool:
+    """Hashes on a thread or process pool with at most `max_pending` jobs.
+
+    Jobs beyond that are rejected with `Saturated` rather than queued, which
+    the routes turn into a 503. The executor is created lazily, and again
+    after a fork, since neither threads nor process pools survive one.
+    """
+
+    def __init__(self, fn, workers=4, max_pending=64, kind="thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown pool kind: {kind!r}")
+
+        self.fn = fn
+        self.workers = workers
+        self.max_pending = max_pending
+        self.kind = kind
+
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._hashes = self._rejected = 0
+        self._latency_total = self._latency_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            if self.kind == "process":
+                pool = concurrent.futures.ProcessPoolExecutor
+            else:
+                pool = concurrent.futures.ThreadPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def hash(self, s: str):
+        """Hashes `s` on the pool, or raises `Saturated` if the queue is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise Saturated(self._retry_after())
+            self._pending += 1
+            executor = self._get_executor()
+
+        start = time.perf_counter()
+        try:
+            return executor.submit(self.fn, s).result()
+        finally:
+            self._finished(start)
+
+    def _finished(self, start):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._pending -= 1
+            self._hashes += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+
+    def _retry_after(self) -> int:
+        """Estimates how long the current queue takes to drain, in seconds."""
+        average = self._latency_total / self._hashes if self._hashes else 0.0
+        return max(1, math.ceil(self._pending * average / self.workers))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "hashes": self._hashes,
+                "rejected": self._rejected,
+                "latency_total": self._latency_total,
+                "latency_max": self._latency_max,
+            }
@@ -0,0 +1,81 @@
+"""The most liked snippets, ranked as likes come in.
+
+Sorting every snippet by likes on each request would cost O(n log n) in the
+size of the store, so the ranking is kept sorted instead, and reading the top
+`n` costs O(log n + n) in the number requested.
+"""
+import itertools
+import threading
+
+from store import NameIndex
+
+
+class Leaderboard:
+    """Ranks snippets by likes, most liked (and then earliest liked) first.
+
+    Only snippets that were ever liked are ranked. Snippets are referenced
+    directly, so whatever evicts one must `discard()` it as well.
+    """
+
+    def __init__(self):
+        self._ranking = NameIndex()  # (-likes, entry), so the most liked sort first
+        self._keys = {}  # snippet -> its key in `_ranking`
+        self._snippets = {}  # entry -> snippet
+        self._next_entry = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, snippet, likes):
+        """Ranks `snippet` as having `likes` likes, unless it's ranked higher."""
+        if not likes:
+            return
+        with self._lock:
+            key = self._keys.get(snippet)
+            if key is None:
+                entry = next(self._next_entry)
+                self._snippets[entry] = snippet
+            elif -key[0] >= likes:
+                return  # a concurrent fold got here first
+            else:
+                entry = key[1]
+                self._ranking.discard(key)
+
+            key = self._keys[snippet] = (-likes, entry)
+            self._ranking.add(key)
+
+    def rank_many(self, snippets):
+        """Ranks snippets that aren't ranked yet by their likes, all at once."""
+        keys = []
+        with self._lock:
+            for snippet in snippets:
+                if snippet.likes and snippet not in self._keys:
+                    entry = next(self._next_entry)
+                    self._snippets[entry] = snippet
+                    key = self._keys[snippet] = (-snippet.likes, entry)
+                    keys.append(key)
+            self._ranking.update(keys)
+
+    def discard(self, snippet):
+        with self._lock:
+            key = self._keys.pop(snippet, None)
+            if key is not None:
+                self._ranking.discard(key)
+                del self._snippets[key[1]]
+
+    def top(self, n) -> list:
+        """Returns up to `n` `(likes, snippet)` pairs, skipping expired snippets."""
+        rv, after = [], None
+        while len(rv) < n:
+            wanted = n - len(rv)
+            keys = self._ranking.page(None, after, wanted)
+            with self._lock:
+                for likes, entry in keys:
+                    snippet = self._snippets.get(entry)
+                    if snippet is not None and not snippet.expired:
+                        rv.append((-likes, snippet))
+            if len(keys) < wanted:
+                break
+            after = keys[-1]
+        return rv
@@ -9,6 +9,8 @@
 # This run the web server in the background. Note that you have a 60s execution
 # limit, and the server will harakiri after 10s.
 python3 solution.py &
+# or, to serve it as in production, with a fixed pool of worker threads:
+# python3 serve.py --threads 16 &
 sleep 1
 
 curl http://localhost:8080/
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""Request counters and latency histograms, in the Prometheus text format.
+
+Every thread records into its own `_Shard`, so the request path never takes a
+lock or contends on a shared counter; a scrape adds the shards up. Werkzeug
+serves each request on a new thread, so a shard folds itself into the totals
+when its thread exits, rather than piling up until the next scrape.
+"""
+import bisect
+import threading
+import weakref
+
+
+# seconds, from a cached GET up to a request queued behind slow hashes
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+class _Shard:
+    __slots__ = ("requests", "latencies", "sums", "owner", "__weakref__")
+
+    def __init__(self, owner=None):
+        self.requests = {}  # (route, status) -> count
+        self.latencies = {}  # route -> [count per bucket..., count over, total]
+        self.sums = {}  # name -> total of `Metrics.add()` amounts
+        self.owner = owner
+
+    def __del__(self):
+        if self.owner is not None:
+            self.owner._retire(self)
+
+
+class Metrics:
+    """Collects per-route request metrics, plus sums of arbitrary amounts."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = weakref.WeakSet()
+        self._retired = _Shard()  # what exited threads recorded
+        self._lock = threading.RLock()  # a shard may be retired during a scrape
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard(self)
+            with self._lock:
+                self._shards.add(shard)
+            return shard
+
+    def observe(self, route, status, seconds):
+        """Records a request to `route` that took `seconds`."""
+        shard = self._shard()
+        key = (route, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+
+        histogram = shard.latencies.get(route)
+        if histogram is None:
+            histogram = shard.latencies[route] = [0] * (len(self.buckets) + 2)
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def add(self, name, amount=1):
+        """Adds to a named sum, e.g. a counter or a gauge kept as deltas."""
+        sums = self._shard().sums
+        sums[name] = sums.get(name, 0) + amount
+
+    def _retire(self, shard):
+        with self._lock:
+            self._merge(self._retired, shard)
+
+    @staticmethod
+    def _merge(into, shard):
+        for key, count in list(shard.requests.items()):
+            into.requests[key] = into.requests.get(key, 0) + count
+        for route, histogram in list(shard.latencies.items()):
+            total = into.latencies.setdefault(route, [0] * len(histogram))
+            for i, value in enumerate(histogram):
+                total[i] += value
+        for name, amount in list(shard.sums.items()):
+            into.sums[name] = into.sums.get(name, 0) + amount
+
+    def collect(self) -> _Shard:
+        """Returns everything recorded so far, summed over every thread."""
+        rv = _Shard()
+        with self._lock:
+            self._merge(rv, self._retired)
+            for shard in list(self._shards):
+                self._merge(rv, shard)
+        return rv
+
+    def sum(self, name):
+        return self.collect().sums.get(name, 0)
+
+    def render(self, extra=()) -> str:
+        """The request metrics and `extra` `(name, type, help, value)` metrics."""
+        totals = self.collect()
+        lines = [
+            "# HELP snippets_requests_total Requests handled, by route and status.",
+            "# TYPE snippets_requests_total counter",
+        ]
+        for (route, status), count in sorted(totals.requests.items()):
+            lines.append(
+                f'snippets_requests_total{{route="{route}",status="{status}"}} {count}'
+            )
+
+        name = "snippets_request_duration_seconds"
+        lines.append(f"# HELP {name} Request latency, by route.")
+        lines.append(f"# TYPE {name} histogram")
+        for route, histogram in sorted(totals.latencies.items()):
+            label, cumulative = f'route="{route}"', 0
+            for bound, count in zip((*self.buckets, "+Inf"), histogram):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label}}} {histogram[-1]}")
+            lines.append(f"{name}_count{{{label}}} {cumulative}")
+
+        for name, kind, description, value in extra:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
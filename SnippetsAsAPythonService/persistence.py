@@ -0,0 +1,291 @@
+"""Optional durable storage: a write-ahead log plus compacted snapshots.
+
+Everything lives in one directory:
+
+    wal-<gen>.log       append-only event log segments
+    snapshot-<gen>.snap every live snippet at some point after `wal-<gen>` began
+
+Both use the same length-prefixed record format:
+
+    <u32 length> <u32 crc32> <u8 op> <f64 expires_at> <u64 likes> <u8 nfields>
+    (<u32 length> <bytes>) * nfields
+
+Events carry the resulting expiry and like count rather than deltas. Both only
+ever grow, so replay takes the maximum and is idempotent; it doesn't matter if
+an event is also reflected in the snapshot it's replayed on top of.
+"""
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+CREATE, LIKE, EXTEND, EDIT = range(1, 5)
+
+Event = collections.namedtuple("Event", "op expires_at likes fields")
+
+_HEADER = struct.Struct("<II")
+_FIXED = struct.Struct("<BdQB")
+_LENGTH = struct.Struct("<I")
+
+# How long the writer thread waits before retrying a commit that failed.
+RETRY_INTERVAL = 1.0
+
+
+class CommitFailed(Exception):
+    """Raised by `Journal.wait()` if the commit that was to cover the event
+    failed. It's retried, so the event may yet become durable.
+    """
+
+
+def encode(op, expires_at, likes, *fields) -> bytes:
+    parts = [_FIXED.pack(op, expires_at, likes, len(fields))]
+    for field in fields:
+        if isinstance(field, str):
+            field = field.encode("utf8")
+        parts.append(_LENGTH.pack(len(field)))
+        parts.append(field)
+
+    payload = b"".join(parts)
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode(buffer):
+    """Yields every intact `Event` in `buffer`, stopping at a torn tail."""
+    offset, end = 0, len(buffer)
+    header, fixed, field = _HEADER.size, _FIXED.size, _LENGTH.size
+    while offset + header <= end:
+        length, crc = _HEADER.unpack_from(buffer, offset)
+        start = offset + header
+        if start + length > end:
+            return  # a crash mid-write, everything before it is still good
+        # one copy per record, which every field is then sliced out of
+        payload = bytes(buffer[start : start + length])
+        if zlib.crc32(payload) != crc:
+            return
+
+        op, expires_at, likes, count = _FIXED.unpack_from(payload)
+        cursor, fields = fixed, []
+        for _ in range(count):
+            (size,) = _LENGTH.unpack_from(payload, cursor)
+            cursor += field
+            fields.append(payload[cursor : cursor + size])
+            cursor += size
+
+        yield Event(op, expires_at, likes, fields)
+        offset = start + length
+
+
+def _read(path):
+    """Decodes a file through a read-only memory map, avoiding a full copy."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with memoryview(buffer) as view:
+                yield from decode(view)
+
+
+class Journal:
+    """Group-commits events to the log from a background thread.
+
+    `append()` only buffers the record; the writer thread flushes everything
+    that accumulated since its last pass with a single `fsync()`. Callers that
+    need durability (e.g. before acknowledging a creation) `wait()` on the
+    sequence number they got back.
+
+    Every `snapshot_interval` seconds the log is rotated and `dump()` (which
+    yields encoded CREATE records for every live snippet) is written out as a
+    new snapshot, after which older segments and snapshots are deleted. That
+    happens on a thread of its own, so commits carry on while it's written.
+    """
+
+    def __init__(self, directory, dump, commit_interval=0.005, snapshot_interval=300):
+        self.directory = directory
+        self.dump = dump
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._appended = self._durable = 0
+        self._error = None  # why the commit of events up to `_failed` failed
+        self._failed = 0
+        self._io_lock = threading.Lock()  # guards the segment file itself
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._snapshotter = None
+        self._last_snapshot = time.monotonic()
+
+        # always start a fresh segment, so we never append after a torn tail
+        os.makedirs(directory, exist_ok=True)
+        existing = [*self._generations("wal-"), *self._generations("snapshot-")]
+        self._generation = max(existing, default=0) + 1
+        self._file = None
+
+    def _path(self, prefix, generation, suffix):
+        return os.path.join(self.directory, f"{prefix}{generation:08d}{suffix}")
+
+    def _generations(self, prefix):
+        for entry in os.listdir(self.directory):
+            if entry.startswith(prefix) and entry[len(prefix) :][:8].isdigit():
+                if not entry.endswith(".tmp"):
+                    yield int(entry[len(prefix) :][:8])
+
+    def recover(self, restore) -> int:
+        """Calls `restore(event)` for the latest snapshot then newer log events."""
+        count = 0
+        snapshot = max(self._generations("snapshot-"), default=None)
+        if snapshot is not None:
+            for event in _read(self._path("snapshot-", snapshot, ".snap")):
+                restore(event)
+                count += 1
+
+        for generation in sorted(self._generations("wal-")):
+            if snapshot is None or generation >= snapshot:
+                for event in _read(self._path("wal-", generation, ".log")):
+                    restore(event)
+                    count += 1
+        return count
+
+    def append(self, op, expires_at, likes, *fields) -> int:
+        record = encode(op, expires_at, likes, *fields)
+        with self._cond:
+            self._pending.append(record)
+            self._appended += 1
+            seq = self._appended
+            self._cond.notify()
+        self.ensure_started()
+        return seq
+
+    def wait(self, seq):
+        """Blocks until the event numbered `seq` has been fsync'd.
+
+        Raises `CommitFailed` if the last commit to include it failed.
+        """
+        with self._cond:
+            while self._durable < seq:
+                if self._error is not None and seq <= self._failed:
+                    raise CommitFailed(f"journal commit failed: {self._error}")
+                self._cond.wait()
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    name="SnippetJournal", target=self._run, daemon=True
+                )
+                self._thread.start()
+
+    def commit(self):
+        """Writes and fsyncs everything appended so far.
+
+        If that fails, the batch is put back to be retried in a new segment,
+        since the current one may now end in a torn record, and the `OSError`
+        is re-raised after waking those waiting on the batch.
+        """
+        with self._io_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                upto = self._appended
+
+            if batch:
+                try:
+                    if self._file is None:
+                        path = self._path("wal-", self._generation, ".log")
+                        self._file = open(path, "ab")
+                    self._file.write(b"".join(batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    self._abandon_segment()
+                    with self._cond:
+                        self._pending[:0] = batch
+                        self._error, self._failed = e, upto
+                        self._cond.notify_all()
+                    raise
+
+        with self._cond:
+            self._durable = max(self._durable, upto)
+            self._error = None
+            self._cond.notify_all()
+
+    def _abandon_segment(self):
+        """Moves on to a new segment, without touching the current one again."""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass  # it failed to flush what's left, which is being retried
+            self._file = None
+        self._generation += 1
+
+    def snapshot(self):
+        """Rotates the log, then writes a compacted snapshot of the live set.
+
+        Every event in an older segment was applied in memory before rotation,
+        so it's covered by the dump, which is taken afterwards.
+        """
+        self.commit()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._generation += 1
+            generation = self._generation
+
+        final = self._path("snapshot-", generation, ".snap")
+        with open(final + ".tmp", "wb") as f:
+            for record in self.dump():
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(final + ".tmp", final)
+        self._fsync_directory()
+
+        for prefix, suffix in (("wal-", ".log"), ("snapshot-", ".snap")):
+            for old in list(self._generations(prefix)):
+                if old < generation:
+                    os.remove(self._path(prefix, old, suffix))
+        self._last_snapshot = time.monotonic()
+
+    def _start_snapshot(self):
+        if self._snapshotter is not None and self._snapshotter.is_alive():
+            return
+        # from now, so a snapshot that fails isn't retried straight away
+        self._last_snapshot = time.monotonic()
+        self._snapshotter = threading.Thread(
+            name="SnippetSnapshot", target=self.snapshot, daemon=True
+        )
+        self._snapshotter.start()
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait(self.snapshot_interval)
+                    if time.monotonic() - self._last_snapshot > self.snapshot_interval:
+                        break
+
+            try:
+                self.commit()
+            except OSError:
+                time.sleep(RETRY_INTERVAL)  # `wait()` raises meanwhile
+                continue
+            if time.monotonic() - self._last_snapshot > self.snapshot_interval:
+                self._start_snapshot()
+
+            # let concurrent requests pile up behind a single fsync
+            time.sleep(self.commit_interval)
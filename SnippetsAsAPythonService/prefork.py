@@ -0,0 +1,92 @@
+"""Serves the app from several pre-forked worker processes sharing one store.
+
+    python3 prefork.py --workers 4 --port 8080
+
+The parent process swaps `solution.database` for a `SharedSnippetStore`, binds
+the listening socket and then forks the workers, which accept connections from
+that socket themselves. Workers that die are replaced until the parent is told
+to stop with SIGTERM or SIGINT.
+
+Likes are still combined per process, so a like made through one worker may
+take up to `LikeCombiner.interval` to show up through another.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+
+from werkzeug.serving import make_server
+
+import solution
+from shared_store import SharedSnippetStore, StoreFull
+
+
+def store_full(e: StoreFull):
+    return {"error": "Snippet store is full"}, 507
+
+
+def worker(sock):
+    server = make_server(
+        *sock.getsockname()[:2], solution.app, threaded=True, fd=sock.fileno()
+    )
+    # `shutdown()` waits for `serve_forever()` to return, so calling it from
+    # the handler, on the thread running that loop, would never return
+    stop = lambda *_: threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+    # let the likes buffered in this worker reach the shared store
+    solution.like_buffer.flush_all()
+
+
+def spawn(sock) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            worker(sock)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--capacity", type=int, default=1 << 20, help="in snippets")
+    parser.add_argument("--arena", type=int, default=1024, help="in MiB")
+    args = parser.parse_args(argv)
+
+    if solution.journal is not None:
+        parser.error("SNIPPETS_DATA_DIR isn't supported with several workers")
+
+    solution.database = SharedSnippetStore(args.capacity, args.arena << 20)
+    # each worker would only see its own creations and likes, and the shared
+    # store is bounded by its capacity and arena instead of a memory budget
+    solution.search_index = solution.leaderboard = solution.memory_budget = None
+    solution.app.register_error_handler(StoreFull, store_full)
+
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    workers = {spawn(sock) for _ in range(args.workers)}
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        pid, _ = os.wait()
+        workers.discard(pid)
+        if not stopping:
+            workers.add(spawn(sock))
+
+
+if __name__ == "__main__":
+    main()
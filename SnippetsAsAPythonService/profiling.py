@@ -0,0 +1,84 @@
+"""Opt-in profiling of individual requests.
+
+`RequestProfiler` wraps the WSGI app, so whatever Flask does around a view
+(routing, parsing JSON, building the response) is profiled along with it. It
+only gets installed when profiling is configured, see `solution.py`, so it
+costs nothing otherwise.
+"""
+import collections
+import cProfile
+import heapq
+import pstats
+import random
+import time
+
+
+class RequestProfiler:
+    """WSGI middleware profiling requests that ask for it, or a random sample.
+
+    A request asks by sending `header` with a value other than "0". The `top`
+    frames with the most time spent in them (excluding what they called) are
+    kept for each of the last `capacity` profiled requests.
+    """
+
+    def __init__(self, app, sample_rate=0.0, header="X-Profile", top=20, capacity=100):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.top = top
+        self._environ_key = "HTTP_" + header.upper().replace("-", "_")
+        self._profiles = collections.deque(maxlen=capacity)
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ):
+            return self.app(environ, start_response)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is already running
+            return self.app(environ, start_response)
+
+        statuses = []
+
+        def capture(status, headers, exc_info=None):
+            statuses.append(int(status.split()[0]))
+            return start_response(status, headers, exc_info)
+
+        started = time.perf_counter()
+        try:
+            return self.app(environ, capture)
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            self._profiles.append(
+                {
+                    "method": environ.get("REQUEST_METHOD"),
+                    "path": environ.get("PATH_INFO"),
+                    "status": statuses[-1] if statuses else None,
+                    "seconds": round(elapsed, 6),
+                    "at": time.time(),
+                    "frames": self._hottest(profile),
+                }
+            )
+
+    def _wanted(self, environ) -> bool:
+        if environ.get(self._environ_key, "0") != "0":
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _hottest(self, profile) -> list:
+        stats = pstats.Stats(profile).stats
+        frames = heapq.nlargest(self.top, stats.items(), key=lambda item: item[1][2])
+        return [
+            {
+                "function": pstats.func_std_string(func),
+                "calls": calls,
+                "tottime": round(tottime, 6),
+                "cumtime": round(cumtime, 6),
+            }
+            for func, (_, calls, tottime, cumtime, _) in frames
+        ]
+
+    def recent(self) -> list:
+        """The kept profiles, newest first."""
+        return list(reversed(self._profiles))
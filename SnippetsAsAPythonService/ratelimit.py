@@ -0,0 +1,77 @@
+"""Per-client token buckets, to keep one client from hogging a route.
+
+A bucket holds up to `burst` tokens and refills at `rate` tokens per second;
+each request takes one, or is refused until the next one is due. A bucket
+that has refilled completely is no different from a missing one, so idle
+clients are dropped from the table as new ones arrive.
+"""
+import collections
+import threading
+import time
+
+
+class RateLimiter:
+    """Token buckets keyed by client, remembering at most `max_clients`.
+
+    Past that, the least recently seen client is forgotten, which only ever
+    errs on the side of letting it through.
+    """
+
+    def __init__(self, rate, burst, max_clients=100_000, clock=time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"invalid rate limit: {rate}/s, burst {burst}")
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._idle = burst / rate  # seconds for an empty bucket to fill up
+        self._clock = clock
+        self._buckets = collections.OrderedDict()  # key -> (tokens, as of), LRU
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, key) -> float:
+        """Takes a token for `key`: 0 if it got one, else the seconds to wait."""
+        now = self._clock()
+        buckets = self._buckets
+        with self._lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                self._forget(now)
+                tokens = self.burst
+            else:
+                buckets.move_to_end(key)
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                return 0.0
+            buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _forget(self, now):
+        """Makes room for a new client, dropping any full buckets on the way."""
+        buckets = self._buckets
+        while buckets:
+            tokens, since = next(iter(buckets.values()))
+            if len(buckets) < self.max_clients and now - since < self._idle:
+                break
+            buckets.popitem(last=False)
+
+
+def parse_limits(text: str) -> dict:
+    """Parses `"endpoint=rate/burst,..."` into a limiter per endpoint.
+
+    `rate` is in requests per second; `burst` defaults to `rate`, or to 1 if
+    that's less.
+    """
+    limits = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        endpoint, _, budget = part.partition("=")
+        rate, _, burst = budget.partition("/")
+        rate = float(rate)
+        limits[endpoint.strip()] = RateLimiter(rate, float(burst or max(1, rate)))
+    return limits
@@ -0,0 +1,160 @@
+"""Full-text search over snippet contents.
+
+An inverted index maps every token to the snippets containing it, along with
+how often it occurs there. It's updated as snippets are created, edited and
+evicted, so a query only touches the postings of the tokens it names.
+"""
+import heapq
+import itertools
+import math
+import re
+import threading
+
+from store import NameIndex
+
+
+_TOKEN = re.compile(r"\w+")
+
+MAX_TOKEN_LENGTH = 64
+MAX_EXPANSIONS = 64  # tokens a single prefix term may stand for
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) <= MAX_TOKEN_LENGTH]
+
+
+def count(text: str) -> dict:
+    """Maps each of the tokens of `text` to how often it occurs."""
+    counts = {}
+    for token in tokenize(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def parse(query: str) -> list:
+    """Splits a query into `(token, is_prefix)` terms, all of which must match.
+
+    A term ending in `*` matches every token it's a prefix of.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        for token in tokenize(word):
+            terms.append((token, False))
+        if prefix and terms:
+            terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+class SearchIndex:
+    """An inverted index of snippets, ranked by TF-IDF.
+
+    Snippets are referenced directly, so whatever evicts one must `discard()`
+    it as well.
+    """
+
+    def __init__(self):
+        self._postings = {}  # token -> {doc: occurrences}
+        self._vocabulary = NameIndex()  # every token, sorted for prefix terms
+        self._docs = {}  # doc -> (snippet, distinct tokens)
+        self._ids = {}  # snippet -> doc
+        self._next_id = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, snippet, text=None):
+        """Indexes `snippet`, replacing whatever it was indexed with before."""
+        counts = count(snippet.snippet if text is None else text)
+        with self._lock:
+            for token in self._insert(snippet, counts):
+                self._vocabulary.add(token)
+
+    def backfill(self, snippets, stored, batch_size=1024):
+        """Indexes those of `snippets` that aren't indexed yet, a batch at a
+        time so that searches aren't held up for long, e.g. after recovery.
+
+        `stored(snippet)` says whether one is still around. It's asked while
+        holding the lock that `discard()` takes, so one that went away in the
+        meantime is skipped, rather than indexed after it was discarded.
+        """
+        for i in range(0, len(snippets), batch_size):
+            counted = [(s, count(s.snippet)) for s in snippets[i : i + batch_size]]
+            with self._lock:
+                new = []
+                for snippet, counts in counted:
+                    # one edited in the meantime was indexed as it was edited
+                    if snippet not in self._ids and stored(snippet):
+                        new.extend(self._insert(snippet, counts))
+                self._vocabulary.update(new)
+
+    def _insert(self, snippet, counts) -> list:
+        """Indexes `snippet`, returning the tokens that are new to the index."""
+        self._remove(snippet)
+        doc = next(self._next_id)
+        self._ids[snippet] = doc
+        self._docs[doc] = (snippet, tuple(counts))
+        new = []
+        postings_of = self._postings
+        for token, count in counts.items():
+            postings = postings_of.get(token)
+            if postings is None:
+                postings = postings_of[token] = {}
+                new.append(token)
+            postings[doc] = count
+        return new
+
+    def discard(self, snippet):
+        with self._lock:
+            self._remove(snippet)
+
+    def _remove(self, snippet):
+        doc = self._ids.pop(snippet, None)
+        if doc is None:
+            return
+        _, tokens = self._docs.pop(doc)
+        for token in tokens:
+            postings = self._postings[token]
+            del postings[doc]
+            if not postings:
+                del self._postings[token]
+                self._vocabulary.discard(token)
+
+    def search(self, query: str, k=10) -> list:
+        """Returns `(score, snippet)` for the `k` best live matches of `query`."""
+        terms = parse(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            matches = [self._match(token, prefix) for token, prefix in terms]
+            matches.sort(key=len)  # intersect starting from the rarest term
+            if not matches[0]:
+                return []
+            docs = set(matches[0])
+            for match in matches[1:]:
+                docs.intersection_update(match)
+                if not docs:
+                    return []
+
+            total = len(self._docs)
+            idfs = [math.log(1 + total / len(match)) for match in matches]
+            scored = (
+                (sum(idf * match[doc] for idf, match in zip(idfs, matches)), doc)
+                for doc in docs
+                if not self._docs[doc][0].expired
+            )
+            best = heapq.nlargest(k, scored)
+            return [(score, self._docs[doc][0]) for score, doc in best]
+
+    def _match(self, token, prefix) -> dict:
+        """Occurrences of the term per doc, merged over a prefix' expansions."""
+        if not prefix:
+            return self._postings.get(token, {})
+
+        rv = {}
+        for expansion in self._vocabulary.page(token, None, MAX_EXPANSIONS):
+            for doc, count in self._postings[expansion].items():
+                rv[doc] = rv.get(doc, 0) + count
+        return rv
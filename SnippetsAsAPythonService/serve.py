@@ -0,0 +1,437 @@
+"""Serves the app for production, with nothing but the standard library.
+
+    python3 serve.py [--host 0.0.0.0] [--port 8080] [--threads 16]
+        [--max-body BYTES] [--keepalive SECONDS] [--drain SECONDS]
+
+`app.run` starts a thread per connection, without bound. Here a fixed pool of
+`--threads` workers serves the connections that the accepting thread hands
+over, and connections beyond that wait in the listen backlog. HTTP/1.1
+connections are kept alive between requests until they've been idle for
+`--keepalive` seconds, or sooner, if other connections are waiting for a
+worker, which idle connections are closed to make room for. Bodies over
+`--max-body` get a 413 without being read.
+
+On SIGTERM (or SIGINT) the server stops accepting connections and closes the
+idle ones. Requests in progress are allowed to finish, and the server exits
+once they're done or `--drain` seconds have passed, after saving the likes
+that are still buffered and committing the journal.
+"""
+import argparse
+import http.server
+import json
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+
+import solution
+
+# past this many bytes of a body that the app didn't read, the connection is
+# closed rather than drained for the next request
+MAX_DRAIN = 64 * 1024
+
+
+class Body:
+    """A request's `wsgi.input`, which never reads past the request's end."""
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._rfile.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._rfile.readline(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def drain(self) -> bool:
+        """Skips whatever the app didn't read, so the next request can be."""
+        while self.remaining:
+            if not self.read(min(self.remaining, 64 * 1024)):
+                return False  # the client hung up
+        return True
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Runs the server's WSGI app for each request on a connection."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive by default
+    server_version = "snippets"
+    body = None  # of the request in progress
+    # a response goes out in one write, when it's flushed (or per chunk, if
+    # it's streamed), so Nagle's algorithm would only delay it
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        self.timeout = self.server.keepalive
+        super().setup()
+
+    def handle_one_request(self):
+        # `body` is only set once a request was served, see `run_app()`
+        if not self.server.park(self.connection, self.body is not None):
+            self.close_connection = True
+            return
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except (TimeoutError, ConnectionError):  # idle for too long
+            self.raw_requestline = b""
+        finally:
+            self.server.unpark(self.connection)
+
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > 65536:
+            self.requestline = self.request_version = self.command = ""
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return  # it has replied already
+
+        try:
+            self.run_app()
+            self.wfile.flush()
+        except (TimeoutError, ConnectionError):
+            self.close_connection = True
+
+    def handle_expect_100(self):
+        if self.content_length() > self.server.max_body:
+            self.refuse(413, "Request body too large")
+            return False
+        super().handle_expect_100()
+        self.wfile.flush()  # or the client would wait for it
+        return True
+
+    def content_length(self) -> int:
+        try:
+            return max(0, int(self.headers.get("Content-Length") or 0))
+        except ValueError:
+            return -1
+
+    def refuse(self, status, error):
+        """Replies with an error before the app gets the request."""
+        body = json.dumps({"error": error}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def environ(self, body) -> dict:
+        path, _, query = self.path.partition("?")
+        environ = {
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            "REQUEST_METHOD": self.command,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": urllib.parse.unquote_to_bytes(path).decode("latin1"),
+            "QUERY_STRING": query,
+            "RAW_URI": self.path,
+            "REQUEST_URI": self.path,
+            "CONTENT_TYPE": self.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": str(body.remaining),
+            "SERVER_NAME": self.server.server_address[0],
+            "SERVER_PORT": str(self.server.server_address[1]),
+            "SERVER_PROTOCOL": self.request_version,
+            "REMOTE_ADDR": self.client_address[0],
+            "REMOTE_PORT": str(self.client_address[1]),
+        }
+        for key, value in self.headers.items():
+            key = "HTTP_" + key.upper().replace("-", "_")
+            if key in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+                continue
+            if key in environ:  # a repeated header
+                value = environ[key] + "," + value
+            environ[key] = value
+        return environ
+
+    def run_app(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            return self.refuse(411, "Length required")
+        length = self.content_length()
+        if length < 0:
+            return self.refuse(400, "Invalid Content-Length")
+        if length > self.server.max_body:
+            return self.refuse(413, "Request body too large")
+
+        body = self.body = Body(self.rfile, length)
+        response = Response(self)
+        try:
+            result = self.server.app(self.environ(body), response.start)
+        except Exception:
+            self.server.handle_error(self.request, self.client_address)
+            return response.fail()
+        try:
+            for chunk in result:
+                response.write(chunk)
+            response.finish()
+        except (TimeoutError, ConnectionError):
+            raise
+        except Exception:
+            self.server.handle_error(self.request, self.client_address)
+            response.fail()
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        if not self.close_connection and not body.drain():
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class Response:
+    """The `start_response()` and `write()` of a request, per PEP 3333."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.status = self.headers = None
+        self.sent = False
+        self.chunked = False
+
+    def start(self, status, headers, exc_info=None):
+        if exc_info is not None:
+            try:
+                if self.sent:
+                    raise exc_info[1].with_traceback(exc_info[2])
+            finally:
+                exc_info = None
+        elif self.status is not None:
+            raise AssertionError("start_response() was already called")
+        self.status, self.headers = status, headers
+        return self.write
+
+    def write(self, data):
+        if not self.sent:
+            self._send_headers(ended=False)
+        if not data or self.handler.command == "HEAD":
+            return
+        if self.chunked:
+            data = b"%x\r\n%s\r\n" % (len(data), data)
+        self.handler.wfile.write(data)
+        if self.chunked:
+            self.handler.wfile.flush()
+
+    def finish(self):
+        if not self.sent:
+            self._send_headers(ended=True)
+        elif self.chunked and self.handler.command != "HEAD":
+            self.handler.wfile.write(b"0\r\n\r\n")
+
+    def fail(self):
+        """Replies with a 500 if nothing was sent yet, or hangs up otherwise."""
+        if self.sent:
+            self.handler.close_connection = True
+        else:
+            self.handler.refuse(500, "Internal server error")
+
+    def _send_headers(self, ended):
+        handler, server = self.handler, self.handler.server
+        if self.status is None:
+            raise AssertionError("start_response() wasn't called")
+
+        code, _, reason = self.status.partition(" ")
+        code = int(code)
+        names = {name.lower() for name, _ in self.headers}
+        bodiless = code < 200 or code in (204, 304)
+        if "content-length" not in names and not bodiless:
+            if ended:
+                self.headers.append(("Content-Length", "0"))
+            elif handler.request_version == "HTTP/1.1":
+                self.chunked = True
+                self.headers.append(("Transfer-Encoding", "chunked"))
+            else:
+                handler.close_connection = True  # the body ends when it does
+
+        # let connections waiting for a worker have a turn
+        if server.draining or server.waiting():
+            handler.close_connection = True
+        # and rather than read much of a body the app turned away, hang up
+        if handler.body is not None and handler.body.remaining > MAX_DRAIN:
+            handler.close_connection = True
+        handler.send_response(code, reason or None)
+        for name, value in self.headers:
+            handler.send_header(name, value)
+        if handler.close_connection and "connection" not in names:
+            handler.send_header("Connection", "close")
+        handler.end_headers()
+        self.sent = True
+
+
+class Server(socketserver.TCPServer):
+    """Serves `app` with a fixed pool of `threads` workers.
+
+    The accepting thread hands connections to the workers through a queue of
+    one per worker, and blocks while that's full, so that connections beyond
+    it wait in the listen backlog rather than piling up in memory.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        address,
+        app,
+        threads=16,
+        max_body=16 << 20,
+        keepalive=5.0,
+        backlog=1024,
+        access_log=False,
+    ):
+        self.request_queue_size = backlog
+        super().__init__(address, Handler)
+        self.app = app
+        self.max_body = max_body
+        self.keepalive = keepalive
+        self.access_log = access_log
+        self.draining = False
+
+        self._pending = queue.Queue(threads)
+        self._idle = 0  # workers waiting for a connection
+        # sockets of connections waiting for a request, longest waiting first
+        self._parked = {}
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(name=f"Worker-{i}", target=self._work, daemon=True)
+            for i in range(threads)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            # with no worker left for it, an idle connection has to give
+            # up its own, as when draining
+            if self._pending.qsize() >= self._idle and self._parked:
+                sock = next(iter(self._parked))
+                del self._parked[sock]
+                self._hang_up(sock)
+        self._pending.put((request, client_address))
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            item = self._pending.get()
+            with self._lock:
+                self._idle -= 1
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def waiting(self) -> bool:
+        """Whether accepted connections are waiting for a worker."""
+        return not self._pending.empty()
+
+    def park(self, sock, kept_alive=False) -> bool:
+        """Notes that a connection is idle, unless the server is draining, or
+        it's `kept_alive` and would keep connections waiting for a worker.
+        """
+        with self._lock:
+            if self.draining or kept_alive and self._pending.qsize() > self._idle:
+                return False
+            self._parked[sock] = None
+            return True
+
+    def unpark(self, sock):
+        with self._lock:
+            self._parked.pop(sock, None)
+
+    @staticmethod
+    def _hang_up(sock):
+        try:
+            sock.shutdown(socket.SHUT_RD)  # wakes its worker up
+        except OSError:
+            pass
+
+    def drain(self, timeout=30.0) -> bool:
+        """Stops accepting connections, and closes each as soon as it's idle.
+
+        Returns whether every worker finished within `timeout` seconds. Must
+        not be called from the thread running `serve_forever()`.
+        """
+        with self._lock:
+            self.draining = True
+            for sock in self._parked:
+                self._hang_up(sock)
+        self.shutdown()
+        for _ in self._workers:
+            self._pending.put(None)  # after the connections accepted already
+
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        self.server_close()
+        return not any(worker.is_alive() for worker in self._workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--max-body", type=int, default=16 << 20, help="in bytes")
+    parser.add_argument("--keepalive", type=float, default=5.0, help="in seconds")
+    parser.add_argument("--drain", type=float, default=30.0, help="in seconds")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+
+    server = Server(
+        (args.host, args.port),
+        solution.app,
+        threads=args.threads,
+        max_body=args.max_body,
+        keepalive=args.keepalive,
+        backlog=args.backlog,
+        access_log=args.access_log,
+    )
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    threading.Thread(name="Acceptor", target=server.serve_forever, daemon=True).start()
+    stopping.wait()
+    drained = server.drain(args.drain)
+    # the likes still buffered, and the events not yet committed, would be lost
+    solution.like_buffer.flush_all()
+    if solution.journal is not None:
+        solution.journal.commit()
+    sys.exit(0 if drained else 1)
+
+
+if __name__ == "__main__":
+    main()
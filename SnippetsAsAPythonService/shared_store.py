@@ -0,0 +1,452 @@
+"""A snippet store in shared memory, for serving from several worker processes.
+
+The store is one anonymous `MAP_SHARED` mapping, created before the workers are
+forked so that they all see the same one:
+
+    shard headers   <u64 arena used> <u64 occupied> <u64 live> <u64 next serial>
+    slot table      a fixed-size, open-addressed hash table per shard
+    arenas          a bump-allocated byte arena per shard for names, contents...
+
+Each shard has its own cross-process lock, and a full shard (too many slots
+used, or its arena exhausted) is rebuilt in place to drop expired snippets and
+reclaim their space.
+
+Snippets handed out are `SharedSnippet`s: snapshots of a slot, refreshed under
+the shard lock by every store operation, whose mutations write through to the
+slot. They're identified by a serial number rather than by `id()`, since each
+process has its own copies.
+"""
+import hashlib
+import mmap
+import multiprocessing
+import struct
+import sys
+import time
+import weakref
+
+import solution
+
+
+EMPTY, USED, DELETED = range(3)
+
+# state, serial, name hash, expires_at, likes, tickets, revision, then an
+# (offset, length) pair into the shard's arena for the name, content, password
+# hash and base url
+_SLOT = struct.Struct("<B7xQQdQQQ8Q")
+_COUNTERS = struct.Struct("<dQQ")  # expires_at, likes, tickets
+_COUNTERS_OFFSET = 24
+_HEADER = struct.Struct("<QQQQ")
+
+MAX_LOAD = 0.75
+
+
+class StoreFull(Exception):
+    """Raised when a shard has no room left even after being rebuilt."""
+
+
+class SharedSnippet(solution.Snippet):
+    __slots__ = ("_store", "_serial", "_index", "__weakref__")
+
+    def update(self):
+        super().update()
+        self._store._write_counters(self)
+        return self
+
+    def like(self, count=1):
+        super().like(count)
+        self._store._write_counters(self)
+        return self
+
+    def take_like(self) -> int:
+        return self._store.take_ticket(self)
+
+
+def _digest(raw: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little")
+
+
+class SharedSnippetStore:
+    """A drop-in replacement for `store.SnippetStore` that lives in shared memory.
+
+    `capacity` is the total number of slots and `arena_size` the total bytes
+    available for strings; both are split evenly across the shards.
+    """
+
+    def __init__(self, capacity=1 << 16, arena_size=64 << 20, shards=16):
+        self.shards = shards
+        self.slots_per_shard = capacity // shards
+        self.arena_per_shard = arena_size // shards
+
+        self._table = shards * _HEADER.size
+        self._arenas = self._table + shards * self.slots_per_shard * _SLOT.size
+        self._buffer = mmap.mmap(-1, self._arenas + shards * self.arena_per_shard)
+        self._locks = [multiprocessing.Lock() for _ in range(shards)]
+        self._proxies = weakref.WeakValueDictionary()  # per process, by serial
+
+    #
+    # The dict-like interface of `SnippetStore`
+    #
+
+    def __len__(self):
+        return sum(self._header(shard)[2] for shard in range(self.shards))
+
+    def __contains__(self, name):
+        snippet = self.get(name)
+        return snippet is not None and not snippet.expired
+
+    def __iter__(self):
+        for snippet in self.values():
+            yield snippet.name
+
+    def get(self, name, default=None):
+        """Returns the snippet without refreshing it, even if it's expired."""
+        shard, h, raw = self._key(name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            return default if index is None else self._load(shard, index)
+
+    def values(self):
+        rv = []
+        for shard in range(self.shards):
+            with self._locks[shard]:
+                for i in range(self.slots_per_shard):
+                    index = shard * self.slots_per_shard + i
+                    if self._slot(index)[0] == USED:
+                        rv.append(self._load(shard, index))
+        return rv
+
+    def scan(self, prefix="", after=None, limit=100):
+        raise NotImplementedError("listing isn't supported by the shared store")
+
+    def edit(self, snippet, new_name, apply, version=None, content=None) -> str:
+        """Like `SnippetStore.edit()`, rewriting the snippet's slot (in the
+        new name's shard, if it's renamed) once `apply(snippet)` has run.
+
+        Room for the edited snippet is made before `apply()` runs, so it's left
+        as it was if there's none (with `StoreFull` raised). The slot keeps its
+        serial, so copies in other processes stay valid, and reload once they
+        see the new revision.
+        """
+        shard, h, raw = self._key(snippet.name)
+        new_shard, new_h, new_raw = self._key(new_name)
+        locks = [self._locks[i] for i in sorted({shard, new_shard})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            index = self._find(shard, h, raw)[0]
+            if index is None or self._slot(index)[1] != snippet._serial:
+                return "missing"
+            snippet = self._load(shard, index)  # refreshes the caller's copy
+            if snippet.expired:
+                return "missing"
+            if version is not None and snippet.version != version:
+                return "conflict"
+            if new_name != snippet.name:
+                existing = self._find(new_shard, new_h, new_raw)[0]
+                if existing is not None:
+                    if not self._load(new_shard, existing).expired:
+                        return "taken"
+                    self._delete(new_shard, existing)
+
+            content = snippet.snippet if content is None else content
+            strings = self._encode(new_raw, content, snippet)
+            # the old slot's strings are reclaimed by a rebuild of its shard
+            replacing = self._slot(index) if new_shard == shard else None
+            if not self._has_room(new_shard, strings, replacing):
+                self._rebuild(new_shard)
+                if not self._has_room(new_shard, strings, replacing):
+                    raise StoreFull(f"shard {new_shard} is full")
+                index = self._find(shard, h, raw)[0]  # it may have moved
+
+            apply(snippet)
+            tickets = self._slot(index)[5]
+            self._delete(shard, index)
+            self._insert(new_shard, new_h, new_raw, snippet, snippet._serial, tickets)
+            return "edited"
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def put(self, snippet):
+        shard, h, raw = self._key(snippet.name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            if index is not None:
+                self._delete(shard, index)
+            self._insert(shard, h, raw, snippet)
+
+    def pop(self, name, default=None):
+        shard, h, raw = self._key(name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            if index is None:
+                return default
+            snippet = self._load(shard, index)
+            self._delete(shard, index)
+            return snippet
+
+    def create_if_absent(self, snippet) -> bool:
+        shard, h, raw = self._key(snippet.name)
+        with self._locks[shard]:
+            return self._create(shard, h, raw, snippet)
+
+    def create_many(self, snippets) -> list:
+        created = [False] * len(snippets)
+        for shard, indices in self._group([s.name for s in snippets]):
+            with self._locks[shard]:
+                for i in indices:
+                    _, h, raw = self._key(snippets[i].name)
+                    created[i] = self._create(shard, h, raw, snippets[i])
+        return created
+
+    def get_many_and_extend(self, names) -> list:
+        rv = [None] * len(names)
+        for shard, indices in self._group(names):
+            with self._locks[shard]:
+                for i in indices:
+                    _, h, raw = self._key(names[i])
+                    index = self._find(shard, h, raw)[0]
+                    if index is None:
+                        rv[i] = ("missing", None)
+                        continue
+
+                    snippet = self._load(shard, index)
+                    if snippet.expired:
+                        self._delete(shard, index)
+                        rv[i] = ("expired", None)
+                    else:
+                        rv[i] = ("found", snippet.update())
+        return rv
+
+    def get_and_extend(self, name):
+        return self._modify(name, lambda snippet: snippet.update())
+
+    def add_likes(self, snippet, count) -> bool:
+        shard, h, raw = self._key(snippet.name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            if index is None or self._slot(index)[1] != snippet._serial:
+                return False
+            self._load(shard, index).like(count)
+            return True
+
+    def remove_expired(self, snippet) -> bool:
+        # unlike `SnippetStore`, this drops whichever snippet has the name if
+        # it's expired: the caller may hold a copy made before it was stored
+        shard, h, raw = self._key(snippet.name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            if index is None or not self._load(shard, index).expired:
+                return False
+            self._delete(shard, index)
+            return True
+
+    def take_ticket(self, snippet) -> int:
+        """The shared equivalent of `Snippet.take_like()`."""
+        shard, h, raw = self._key(snippet.name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            if index is None or self._slot(index)[1] != snippet._serial:
+                return snippet.likes + 1  # it's gone, so nobody else can like it
+
+            offset = self._slot_offset(index) + _COUNTERS_OFFSET
+            expires_at, likes, tickets = _COUNTERS.unpack_from(self._buffer, offset)
+            _COUNTERS.pack_into(self._buffer, offset, expires_at, likes, tickets + 1)
+            return tickets + 1
+
+    #
+    # Internals, all of which expect the shard's lock to be held
+    #
+
+    def _key(self, name):
+        raw = name.encode("utf8")
+        h = _digest(raw)
+        return h % self.shards, h, raw
+
+    def _group(self, names):
+        groups = {}
+        for i, name in enumerate(names):
+            groups.setdefault(self._key(name)[0], []).append(i)
+        return groups.items()
+
+    def _header(self, shard):
+        return _HEADER.unpack_from(self._buffer, shard * _HEADER.size)
+
+    def _set_header(self, shard, *values):
+        _HEADER.pack_into(self._buffer, shard * _HEADER.size, *values)
+
+    def _slot_offset(self, index):
+        return self._table + index * _SLOT.size
+
+    def _slot(self, index):
+        """Returns `(state, serial, hash, expires_at, likes, tickets, revision,
+        *offsets_and_lengths)` for a slot."""
+        return _SLOT.unpack_from(self._buffer, self._slot_offset(index))
+
+    def _string(self, shard, offset, length) -> bytes:
+        start = self._arenas + shard * self.arena_per_shard + offset
+        return self._buffer[start : start + length]
+
+    def _strings(self, shard, slot):
+        return [self._string(shard, *slot[7 + 2 * i : 9 + 2 * i]) for i in range(4)]
+
+    def _find(self, shard, h, raw):
+        """Returns the index of the slot holding `raw` (or `None`) and of the
+        first slot on its probe sequence that a new snippet could use."""
+        start = shard * self.slots_per_shard
+        home = (h // self.shards) % self.slots_per_shard
+        free = None
+        for step in range(self.slots_per_shard):
+            index = start + (home + step) % self.slots_per_shard
+            slot = self._slot(index)
+            if slot[0] == EMPTY:
+                return None, index if free is None else free
+            if slot[0] == DELETED:
+                free = index if free is None else free
+            elif slot[2] == h and self._string(shard, slot[7], slot[8]) == raw:
+                return index, free
+        return None, free
+
+    def _encode(self, raw, content, snippet) -> list:
+        """The strings of a slot, for `snippet` named `raw` holding `content`."""
+        return [
+            raw,
+            content.encode("utf8"),
+            snippet.password_hash or b"",
+            snippet.base_url.encode("utf8"),
+        ]
+
+    def _insert(self, shard, h, raw, snippet, serial=None, tickets=None):
+        """Stores `snippet` in a new slot, under a new serial unless given one."""
+        strings = self._encode(raw, snippet.snippet, snippet)
+        if not self._has_room(shard, strings):
+            self._rebuild(shard)
+            if not self._has_room(shard, strings):
+                raise StoreFull(f"shard {shard} is full")
+
+        if serial is None:
+            used, occupied, live, next_serial = self._header(shard)
+            self._set_header(shard, used, occupied, live, next_serial + 1)
+            serial = next_serial * self.shards + shard  # unique across shards
+        expires_at, likes = snippet.expires_at, snippet.likes
+        tickets = likes if tickets is None else tickets
+        counters = (expires_at, likes, tickets, snippet._revision)
+        self._place(shard, h, serial, counters, strings)
+
+    def _has_room(self, shard, strings, replacing=None) -> bool:
+        """Whether `strings` fit in a new slot, once the slot `replacing` (if
+        any) is deleted and the shard rebuilt, if need be."""
+        used, occupied, _, _ = self._header(shard)
+        if replacing is not None:
+            occupied -= 1
+            used -= sum(replacing[8::2])
+        if occupied + 1 > MAX_LOAD * self.slots_per_shard:
+            return False
+        return used + sum(map(len, strings)) <= self.arena_per_shard
+
+    def _place(self, shard, h, serial, counters, strings):
+        """Writes a slot, with `counters` being `(expires_at, likes, tickets,
+        revision)`, allocating its strings at the end of the arena."""
+        index = self._find(shard, h, strings[0])[1]
+        used, occupied, live, next_serial = self._header(shard)
+        occupied += self._slot(index)[0] == EMPTY
+
+        base = self._arenas + shard * self.arena_per_shard
+        offsets = []
+        for string in strings:
+            self._buffer[base + used : base + used + len(string)] = string
+            offsets += [used, len(string)]
+            used += len(string)
+
+        self._set_header(shard, used, occupied, live + 1, next_serial)
+        _SLOT.pack_into(
+            self._buffer,
+            self._slot_offset(index),
+            USED,
+            serial,
+            h,
+            *counters,
+            *offsets,
+        )
+
+    def _rebuild(self, shard):
+        """Rehashes a shard in place, dropping expired snippets and tombstones
+        and compacting its arena. Serials are kept, so copies stay valid."""
+        start = shard * self.slots_per_shard
+        now = time.time()
+        survivors = []
+        for index in range(start, start + self.slots_per_shard):
+            slot = self._slot(index)
+            if slot[0] == USED and slot[3] >= now:
+                survivors.append((slot, self._strings(shard, slot)))
+
+        table = self._slot_offset(start)
+        size = self.slots_per_shard * _SLOT.size
+        self._buffer[table : table + size] = bytes(size)
+        next_serial = self._header(shard)[3]
+        self._set_header(shard, 0, 0, 0, next_serial)
+
+        for slot, strings in survivors:
+            self._place(shard, slot[2], slot[1], slot[3:7], strings)
+
+    def _delete(self, shard, index):
+        offset = self._slot_offset(index)
+        self._buffer[offset] = DELETED
+        used, occupied, live, serial = self._header(shard)
+        self._set_header(shard, used, occupied, live - 1, serial)
+
+    def _load(self, shard, index) -> SharedSnippet:
+        """Returns this process' copy of the snippet in a slot, refreshed."""
+        slot = self._slot(index)
+        serial, expires_at, likes, revision = slot[1], slot[3], slot[4], slot[6]
+
+        snippet = self._proxies.get(serial)
+        if snippet is None:
+            snippet = SharedSnippet.__new__(SharedSnippet)
+            snippet._store, snippet._serial = self, serial
+            snippet._static = snippet._tickets = None
+            snippet._revision = None
+            self._proxies[serial] = snippet
+        if snippet._revision != revision:  # new, or edited by another process
+            name, content, password_hash, base_url = self._strings(shard, slot)
+            snippet.name = name.decode("utf8")
+            snippet.snippet = content.decode("utf8")
+            snippet.password_hash = password_hash or None
+            snippet.base_url = sys.intern(base_url.decode("utf8"))
+            snippet._revision = revision  # last, see `Snippet.encoding()`
+
+        snippet._index = index  # only valid while the lock is held
+        snippet.expires_at, snippet.likes = expires_at, likes
+        return snippet
+
+    def _write_counters(self, snippet):
+        """Writes a copy's expiry and likes back, see `SharedSnippet.update()`."""
+        offset = self._slot_offset(snippet._index)
+        if _SLOT.unpack_from(self._buffer, offset)[1] != snippet._serial:
+            return
+        offset += _COUNTERS_OFFSET
+        tickets = _COUNTERS.unpack_from(self._buffer, offset)[2]
+        _COUNTERS.pack_into(
+            self._buffer, offset, snippet.expires_at, snippet.likes, tickets
+        )
+
+    def _create(self, shard, h, raw, snippet) -> bool:
+        index = self._find(shard, h, raw)[0]
+        if index is not None:
+            if not self._load(shard, index).expired:
+                return False
+            self._delete(shard, index)
+        self._insert(shard, h, raw, snippet)
+        return True
+
+    def _modify(self, name, op):
+        shard, h, raw = self._key(name)
+        with self._locks[shard]:
+            index = self._find(shard, h, raw)[0]
+            if index is None:
+                return None
+            snippet = self._load(shard, index)
+            if snippet.expired:
+                self._delete(shard, index)
+                return None
+            return op(snippet)
@@ -4,20 +4,122 @@ from flask import Flask, request
 # Do not modify this line or any function signatures.
 app = Flask(__name__)
 
+from flask import g
 
-import time, datetime
-import functools
-import json, urllib
+
+import os, sys, time
+import functools, itertools, threading
+import base64, json, math, urllib
 import hashlib, binascii
 
+from expiry import ExpiryIndex, Reaper
+from store import SnippetStore
+from leaderboard import Leaderboard
+from likes import LikeCombiner
+from metrics import Metrics
+import blobs, budget, compression, hashing, persistence, profiling, ratelimit, search
+import validation
+
 
-database = {}
+database = SnippetStore()
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 
+def evict(snippet):
+    # looked up on each call, since `prefork.py` swaps in a shared store
+    removed = database.remove_expired(snippet)
+    # it may have been dropped (or replaced) by something else first
+    if removed or database.get(snippet.name) is not snippet:
+        forget(snippet)
+    return removed
+
+
+def forget(snippet):
+    """Drops a snippet that's no longer stored from everything else tracking it."""
+    if search_index is not None:
+        search_index.discard(snippet)
+    if leaderboard is not None:
+        leaderboard.discard(snippet)
+    if memory_budget is not None:
+        memory_budget.discard(snippet)
+    meter.add("content_bytes", -snippet.size)
+
+
+def make_room(snippet):
+    """Accounts for a stored (or edited) snippet against the memory budget,
+    evicting the snippets that it displaces.
+    """
+    if memory_budget is None:
+        return
+    victims = memory_budget.add(snippet, snippet.footprint, snippet.shared_footprint)
+    for victim in victims:
+        if database.remove(victim):
+            expiry_index.discard(victim)
+            forget(victim)
+            meter.add("evictions")
+
+
+def over_budget(name, content) -> bool:
+    """Whether a snippet with `name` and `content` would cost more than the
+    whole memory budget (at most, see `Snippet.footprint`), so that storing it
+    would only evict everything else, and then it too.
+    """
+    if memory_budget is None:
+        return False
+    size = len(content.encode("utf8"))
+    return budget.OVERHEAD + len(name) + 2 * size > memory_budget.limit
+
+
+expiry_index = ExpiryIndex(clock=time.time)
+reaper = Reaper(expiry_index, evict)
+
+# `None` where an index local to this process would miss snippets, see `prefork.py`
+search_index = search.SearchIndex()
+leaderboard = Leaderboard()
+
+# Past this many bytes (see `Snippet.footprint`), snippets are evicted before
+# they expire, in the order SNIPPETS_EVICTION_POLICY says; see `budget.py`.
+MEMORY_BUDGET = int(os.environ.get("SNIPPETS_MEMORY_BUDGET", 0))
+memory_budget = None
+if MEMORY_BUDGET:
+    memory_budget = budget.MemoryBudget(
+        MEMORY_BUDGET, os.environ.get("SNIPPETS_EVICTION_POLICY", "lru")
+    )
+
+meter = Metrics()
+
+# Snippets only survive restarts if this points to a directory.
+DATA_DIR = os.environ.get("SNIPPETS_DATA_DIR")
+journal = None
+
+
+def format_time(timestamp: float) -> str:
+    return time.strftime(DATE_FORMAT, time.localtime(timestamp))
+
+
+# Request bodies are parsed as they're read, and turned away as soon as they go
+# over one of these limits (in bytes), or turn out not to be valid.
+MAX_BODY = int(os.environ.get("SNIPPETS_MAX_BODY", 16 << 20))
+MAX_NAME = int(os.environ.get("SNIPPETS_MAX_NAME", 1024))
+MAX_SNIPPET = int(os.environ.get("SNIPPETS_MAX_SNIPPET", 8 << 20))
+
+SNIPPET_FIELDS = {
+    "name": validation.Field(("string",), MAX_NAME),
+    "expires_in": validation.Field(("number",)),
+    "snippet": validation.Field(("string",), MAX_SNIPPET),
+}
+# items of a bulk request with fields of the wrong kind get a 400 of their own
+BULK_FIELDS = {key: field._replace(kinds=()) for key, field in SNIPPET_FIELDS.items()}
+
+
 def get_json(**kwargs) -> Dict:
-    """Forcibly returns the request data as JSON, `None` otherwise."""
-    return request.get_json(force=True, **kwargs)
+    """Forcibly returns the request data as JSON, parsed while it's read.
+
+    The keyword arguments are those of `validation.JSONParser`. It raises
+    `validation.Invalid` or `validation.TooLarge` as soon as the body is either.
+    """
+    parser = validation.JSONParser(limit=MAX_BODY, **kwargs)
+    return validation.read(request.stream, parser, request.content_length)
 
 
 def validate_make_snippet(request: Dict, required=True):
@@ -32,6 +134,8 @@ def validate_make_snippet(request: Dict, required=True):
             return False
         if field in request and not isinstance(request[field], types):
             return False
+    if isinstance(request.get("expires_in"), bool):  # which is an `int`, too
+        return False
 
     if request.get("expires_in", 1) <= 0:
         return False
@@ -62,64 +166,757 @@ def hash(s: str) -> str:
     return binascii.hexlify(digest)
 
 
+# `hash()` runs on this pool so slow hashes queue up (boundedly) off to the side.
+hasher = hashing.HashPool(
+    hash,
+    workers=int(os.environ.get("SNIPPETS_HASH_WORKERS", 4)),
+    max_pending=int(os.environ.get("SNIPPETS_HASH_QUEUE", 64)),
+    kind=os.environ.get("SNIPPETS_HASH_POOL", "thread"),
+)
+
+# Contents of at least this many bytes are kept compressed in memory.
+codec = compression.Codec(
+    algorithm=os.environ.get("SNIPPETS_COMPRESSION", "zlib"),
+    level=int(os.environ.get("SNIPPETS_COMPRESSION_LEVEL", 6)),
+    threshold=int(os.environ.get("SNIPPETS_COMPRESSION_THRESHOLD", 4096)),
+)
+
+
+
+def encode_head(content: str) -> bytes:
+    """Encodes the start of a snippet's `json`, up to and including `content`."""
+    return b'{"snippet": %s, ' % json.dumps(content).encode()
+
+
+def decode_head(head: bytes) -> str:
+    """Undoes `encode_head()`."""
+    return json.loads(head[len(b'{"snippet": ') : -2])
+
+
+# Identical contents of at least this many characters are stored once, and
+# compressed (if they're large enough) once: with zlib, as the deflated
+# `encode_head()` that gzipped responses start with.
+contents = blobs.BlobStore(
+    lambda content: codec.pack(content, encode_head),
+    min_size=int(os.environ.get("SNIPPETS_DEDUP_MIN_SIZE", 256)),
+)
+
+
+_UNSHARED = (b"", None, b"")  # see `Snippet.encoding()`
+
+
 class Snippet:
+    # Slots and float timestamps keep each instance small, since there can be
+    # tens of millions of them; see `benchmarks/memory.py`.
+    __slots__ = (
+        "name",
+        "expires_at",  # seconds since the epoch
+        "_content",  # a `str`, or a `blobs.Blob` shared with other snippets
+        "password_hash",
+        "likes",
+        "base_url",  # shared by every snippet made through the same route
+        "_revision",
+        "_static",
+        "_tickets",
+    )
+
+    _tickets_lock = threading.Lock()
+
     def __init__(self, name, expires_in, content):
         self.name = name
-        self.expires_at = datetime.datetime.now()
-        self.expires_at += datetime.timedelta(seconds=expires_in)
+        self.expires_at = time.time() + expires_in
         self.snippet = content
         self.password_hash = None
         self.likes = 0
 
-        self.url = request.url + urllib.parse.quote(self.name, safe="")
+        self.base_url = sys.intern(request.url_root + "snippets/")
+        self._revision = 0
+        self._static = self._tickets = None
+
+    @classmethod
+    def restore(cls, name, expires_at, content, password_hash, likes, base_url):
+        """Rebuilds a snippet outside of a request, e.g. from the journal."""
+        self = cls.__new__(cls)
+        self.name = name
+        self.expires_at = expires_at
+        self.snippet = content
+        self.password_hash = password_hash
+        self.likes = likes
+        self.base_url = sys.intern(base_url)
+        self._revision = 0
+        self._static = self._tickets = None
+        return self
+
+    @property
+    def snippet(self) -> str:
+        content = self._content
+        if isinstance(content, str):
+            return content
+        return codec.unpack(content.value, decode_head)
+
+    @snippet.setter
+    def snippet(self, content):
+        self._content = contents.intern(content)
+
+    @property
+    def size(self) -> int:
+        """The content's size in UTF-8, however it's stored."""
+        content = self._content
+        if isinstance(content, str):
+            return len(content.encode("utf8"))
+        return content.size
+
+    @property
+    def footprint(self) -> int:
+        """Roughly the bytes this snippet takes up by itself, for
+        `budget.MemoryBudget`.
+
+        That's its name, its content unless that's shared (see
+        `shared_footprint`), as much again for the encoding cached for
+        responses, and `budget.OVERHEAD`.
+        """
+        content = self._content
+        own = 2 * self.size if isinstance(content, str) else 0
+        return budget.OVERHEAD + len(self.name) + own
+
+    @property
+    def shared_footprint(self):
+        """The `(blobs.Blob, bytes)` this snippet shares with others with the
+        same content, or `None`: the blob's stored value, and if that's not
+        compressed, as much again for the encoding cached on it.
+        """
+        content = self._content
+        if isinstance(content, str):
+            return None
+        value = content.value
+        if isinstance(value, str):
+            return content, 2 * content.size
+        # compressed, and either encoded already or encoded per response
+        return content, len(value[0] if isinstance(value, tuple) else value)
+
+    @property
+    def compressed(self) -> bool:
+        content = self._content
+        return not isinstance(content, str) and not isinstance(content.value, str)
 
     def secure(self, password):
         if not password:
             return
-        self.password_hash = hash(password)
+        self.password_hash = hasher.hash(password)
+        self._static = None  # it says whether it's secure
 
     def update(self):
-        self.expires_at += datetime.timedelta(seconds=5)
+        self.expires_at += 5
         return self
 
-    def like(self):
-        self.likes += 1
-        return self.update()
+    def like(self, count=1):
+        # the expiry is extended before the likes are counted, see `expiry_at()`
+        self.expires_at += 5 * count
+        self.likes += count
+        return self
+
+    def take_like(self) -> int:
+        """Counts a like that will be folded in later, returning the new total.
+
+        Likes are buffered by `LikeCombiner`, so `likes` can lag behind; every
+        caller still gets a unique, increasing count straight away.
+        """
+        if self._tickets is None:
+            with Snippet._tickets_lock:
+                if self._tickets is None:
+                    self._tickets = itertools.count(self.likes + 1)
+        return next(self._tickets)  # atomic, no lock needed
+
+    def expiry_at(self, likes) -> float:
+        """The expiry as of the snippet having `likes` likes in total.
+
+        `likes` is read before `expires_at`, and `like()` writes them the other
+        way around, so a concurrent fold can only make this overshoot.
+        """
+        folded = self.likes
+        return self.expires_at + 5 * (likes - folded)
 
     def is_editable(self, password):
-        return not self.password_hash or self.password_hash == hash(password)
+        if not self.password_hash:
+            return True
+        return self.password_hash == hasher.hash(password)
 
     def edit(self, new_name, new_content, new_expiration_delta):
+        """Applies an edit, leaving out whatever's `None`."""
         if new_expiration_delta:
-            self.expires_at += datetime.timedelta(seconds=new_expiration_delta)
+            self.expires_at += new_expiration_delta
         else:
             self.update()
 
-        self.snippet = new_content
-        self.name = new_name
+        if new_content is not None:
+            self.snippet = new_content
+        if new_name is not None:
+            self.name = new_name
+        self._revision += 1
+
+    @property
+    def version(self) -> int:
+        """How many times the snippet has been edited."""
+        return self._revision
+
+    @property
+    def url(self):
+        return self.base_url + urllib.parse.quote(self.name, safe="")
 
     @property
     def expired(self):
-        return self.expires_at < datetime.datetime.now()
+        return self.expires_at < time.time()
 
     @property
     def json(self):
         js = {
             "name": self.name,
-            "expires_at": self.expires_at.strftime(DATE_FORMAT),
+            "expires_at": format_time(self.expires_at),
             "snippet": self.snippet,
             "url": self.url,
             "likes": self.likes,
             "secure": bool(self.password_hash),
+            "version": self.version,
         }
         return js
 
+    @property
+    def body(self) -> bytes:
+        likes = self.likes  # in the same order as `expiry_at()`
+        return self.encode(self.expires_at, likes)
+
+    def encode(self, expires_at, likes, encoding=None) -> bytes:
+        """The encoded `json`, only re-encoding the parts that have changed.
+
+        The name, content, url, security and version only change in `edit()`,
+        so they're encoded once per revision (see `encoding()`, or pass what it
+        returned), and the expiry and likes spliced on after them.
+        """
+        _, (head, prefix, _), rest, _ = encoding or self.encoding()
+        if head is None:
+            if prefix is None:
+                head = encode_head(self.snippet)
+            else:
+                head = compression.inflate_prefix(prefix)
+        return b"".join((head, rest, self._encode_volatile(expires_at, likes)))
+
+    def encode_gzip(self, expires_at, likes, encoding=None) -> bytes:
+        """`encode()`, gzipped. Only compressed snippets are worth it, and only
+        zlib keeps what this needs; other codecs deflate the content each time.
+        """
+        _, (_, prefix, _), rest, _ = encoding or self.encoding()
+        if prefix is None:
+            prefix = codec.deflate_prefix(encode_head(self.snippet))
+        tail = rest + self._encode_volatile(expires_at, likes)
+        return compression.gzip_body(prefix, tail)
+
+    @property
+    def etag(self) -> str:
+        """A strong validator for everything but the expiry and likes."""
+        return '"%s"' % self.encoding()[3].hex()
+
+    def encoding(self, cache=True):
+        """Encodes everything but the expiry and likes, once per revision.
+
+        Returns `(revision, content, rest, digest)`: `_encode_content()`, the
+        rest of the static fields, and the digest the ETag is made of. It's
+        only kept if `cache` is true, so snippets that are never read, like
+        those only responded to when written, don't keep one. It's keyed by
+        the revision it was built from, so a concurrent edit can't leave a
+        stale one behind.
+        """
+        static = self._static
+        # read once, so a concurrent edit can't leave what it replaced cached
+        # under its revision
+        revision = self._revision
+        if static is None or static[0] != revision:
+            content = self._encode_content()
+            js = {
+                "name": self.name,
+                "url": self.url,
+                "secure": bool(self.password_hash),
+                "version": revision,
+            }
+            # the content opens the object, and the volatile fields close it
+            rest = json.dumps(js)[1:-1].encode() + b", "
+            digest = hashlib.blake2b(content[2] + rest, digest_size=16).digest()
+            if isinstance(self._content, str):  # there's nothing to share
+                rest, content = content[0] + rest, _UNSHARED
+            static = (revision, content, rest, digest)
+            if cache:
+                self._static = static
+        return static
+
+    def _encode_content(self):
+        """Encodes the start of `json`, up to and including the content.
+
+        Returns `(head, prefix, digest)`: the encoding (or if the content is
+        compressed, `None` and the prefix to inflate or gzip it from, which is
+        the stored content itself, or `None` if it isn't stored as one), and a
+        digest of it. Snippets that share a `blobs.Blob` share this as well,
+        rather than each keep a copy the size of the content.
+        """
+        content = self._content
+        if not isinstance(content, str) and content.encoded is not None:
+            return content.encoded
+
+        value = None if isinstance(content, str) else content.value
+        if isinstance(value, tuple):  # stored as the prefix, see `contents`
+            head = compression.inflate_prefix(value)
+            encoded = (None, value, hashlib.blake2b(head, digest_size=16).digest())
+        else:
+            head = encode_head(self.snippet)
+            digest = hashlib.blake2b(head, digest_size=16).digest()
+            # compressed contents stay compressed, and are encoded per response
+            encoded = (None, None, digest) if self.compressed else (head, None, digest)
+        if not isinstance(content, str):
+            content.encoded = encoded  # racing threads encode it the same
+        return encoded
+
+    @staticmethod
+    def _encode_volatile(expires_at, likes) -> bytes:
+        # not cached, since it's short and every like changes it
+        expiry = format_time(expires_at).encode()
+        return b'"expires_at": "%s", "likes": %d}' % (expiry, likes)
+
+
+#
+# Persistence follows
+#
+
+
+def persist(op, snippet, *fields, name=None):
+    """Journals an event for `snippet`, returning its sequence number.
+
+    The event is keyed by `name`, if it's known by another one in the journal.
+    """
+    if journal is None:
+        return 0
+    name = snippet.name if name is None else name
+    return journal.append(op, snippet.expires_at, snippet.likes, name, *fields)
+
+
+def dump_snapshot():
+    for snippet in database.values():
+        if not snippet.expired:
+            yield persistence.encode(
+                persistence.CREATE,
+                snippet.expires_at,
+                snippet.likes,
+                snippet.name,
+                snippet.snippet,
+                snippet.password_hash or b"",
+                snippet.base_url,
+                str(snippet.version),
+            )
+
+
+def restore(event: persistence.Event):
+    """Applies a journaled event to `database`."""
+    if event.op == persistence.CREATE:
+        for snippet in restore_creations([event]):
+            if search_index is not None:
+                search_index.add(snippet)
+        return
+
+    name, *fields = [field.decode("utf8") for field in event.fields]
+    snippet = database.get(name)
+    if snippet is None:
+        return
+
+    if event.op == persistence.EDIT:
+        new_name, content, *version = fields  # older ones lack a version
+        version = int(version[0]) if version else snippet._revision + 1
+        # a snapshot dumped after the edit already has it, and the snippet
+        # now known by the old name may have been created after it, too
+        renamed = database.get(new_name)
+        if snippet._revision >= version or (
+            renamed is not None and renamed._revision >= version
+        ):
+            return
+        database.pop(name)
+        size = snippet.size
+        snippet.name, snippet.snippet = new_name, content
+        snippet._revision = version
+        database.put(snippet)
+        meter.add("content_bytes", snippet.size - size)
+        if search_index is not None:
+            search_index.add(snippet, content)
+        make_room(snippet)
+
+    snippet.expires_at = max(snippet.expires_at, event.expires_at)
+    snippet.likes = max(snippet.likes, event.likes)
+    if leaderboard is not None:
+        leaderboard.update(snippet, snippet.likes)
+
+
+def restore_creations(events) -> list:
+    """Applies journaled CREATE events all at once, returning the snippets that
+    were restored, which are left for the caller to index for search.
+    """
+    snippets = []
+    for event in events:
+        name, content, password_hash, base_url, *version = [
+            field.decode("utf8") for field in event.fields
+        ]  # older ones lack a version
+        password_hash = password_hash.encode("utf8") or None
+        snippet = Snippet.restore(
+            name, event.expires_at, content, password_hash, event.likes, base_url
+        )
+        snippet._revision = int(version[0]) if version else 0
+        snippets.append(snippet)
+
+    # the rest were already restored from the snapshot
+    snippets = list(itertools.compress(snippets, database.load(snippets)))
+    expiry_index.schedule_many(snippets)
+    meter.add("content_bytes", sum(snippet.size for snippet in snippets))
+    if leaderboard is not None:
+        leaderboard.rank_many(snippets)
+    if memory_budget is not None:
+        for snippet in snippets:
+            make_room(snippet)
+    return snippets
+
+
+def recover(journal, batch_size=8192) -> threading.Thread:
+    """Replays `journal`, restoring runs of CREATE events (e.g. the snapshot's)
+    a batch at a time.
+
+    Tokenizing their contents would take longer than all of the rest, so the
+    restored snippets are indexed for search by the thread that's returned,
+    while requests are served. Until it's done, searches miss some of them.
+    """
+    batch, restored = [], []
+
+    def replay(event):
+        if event.op == persistence.CREATE:
+            batch.append(event)
+            if len(batch) < batch_size:
+                return
+        if batch:
+            restored.extend(restore_creations(batch))
+            batch.clear()
+        if event.op != persistence.CREATE:
+            restore(event)
+
+    journal.recover(replay)
+    if batch:
+        restored.extend(restore_creations(batch))
+
+    def index():
+        if search_index is not None:
+            search_index.backfill(
+                restored, lambda snippet: database.get(snippet.name) is snippet
+            )
+
+    indexer = threading.Thread(name="Indexer", target=index, daemon=True)
+    indexer.start()
+    return indexer
+
+
+if DATA_DIR:
+    journal = persistence.Journal(DATA_DIR, dump_snapshot)
+    recover(journal)
+    reaper.ensure_started()  # or what was recovered only expires once it's read
+
+    @app.before_request
+    def restart_reaper():
+        # the reaper doesn't survive the server being forked after this module
+        # is imported (see `Reaper`), and recovered snippets can't wait for a
+        # `created()` to restart it
+        reaper.ensure_started()
+
+
+def fold_likes(snippet, count):
+    """Applies a batch of buffered likes, journaling them as a single event."""
+    if database.add_likes(snippet, count):
+        persist(persistence.LIKE, snippet)
+        if leaderboard is not None:
+            leaderboard.update(snippet, snippet.likes)
+        if memory_budget is not None:
+            memory_budget.liked(snippet)
+
+
+like_buffer = LikeCombiner(fold_likes)
+
 
 #
 # Routes follow
 #
 
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def respond(snippet, status, likes=None, gzip=False, cache=True):
+    """Replies with `snippet`, as of it having `likes` likes if given.
+
+    The expiry and likes are also sent as headers, since they're all that's
+    left of the snippet in a 304 (see `fetch_snippet()`). Compressed snippets
+    are gzipped if the client allows it. Replies to writes pass `cache=False`,
+    see `Snippet.encoding()`.
+    """
+    if likes is None:
+        likes = snippet.likes  # read before `expires_at`, see `expiry_at()`
+        expires_at = snippet.expires_at
+    else:
+        expires_at = snippet.expiry_at(likes)
+
+    encoding = snippet.encoding(cache)
+    headers = {
+        "ETag": etag(snippet, gzip, encoding),
+        "X-Snippet-Expires-At": format_time(expires_at),
+        "X-Snippet-Likes": str(likes),
+    }
+    if snippet.compressed:
+        headers["Vary"] = "Accept-Encoding"
+    if status == 304:
+        return b"", status, headers
+
+    headers.update(JSON_HEADERS)
+    if gzip and snippet.compressed:
+        headers["Content-Encoding"] = "gzip"
+        return snippet.encode_gzip(expires_at, likes, encoding), status, headers
+    return snippet.encode(expires_at, likes, encoding), status, headers
+
+
+def etag(snippet, gzip=False, encoding=None) -> str:
+    """The ETag of `snippet`'s body, which differs once it's gzipped."""
+    digest = (encoding or snippet.encoding())[3].hex()
+    if gzip and snippet.compressed:
+        return '"%s-gzip"' % digest
+    return '"%s"' % digest
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """Whether an `If-None-Match` header matches `etag`, weakly as it should."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def created(snippet) -> int:
+    """Indexes a newly stored snippet and returns its journal sequence number."""
+    expiry_index.schedule(snippet)
+    reaper.ensure_started()
+    meter.add("content_bytes", snippet.size)
+    if search_index is not None:
+        search_index.add(snippet)
+    make_room(snippet)
+    return persist(
+        persistence.CREATE,
+        snippet,
+        snippet.snippet,
+        snippet.password_hash or b"",
+        snippet.base_url,
+    )
+
+
+def result(status, snippet=None, cache=True, **fields) -> bytes:
+    """Encodes one item of a bulk response, splicing in the snippet's body.
+
+    Items for writes pass `cache=False`, see `Snippet.encoding()`.
+    """
+    if snippet is None:
+        return json.dumps({"status": status, **fields}).encode()
+    head = json.dumps({"status": status, **fields}).encode()[:-1]
+    likes = snippet.likes  # in the same order as `Snippet.body`
+    body = snippet.encode(snippet.expires_at, likes, snippet.encoding(cache))
+    return head + b', "snippet": ' + body + b"}"
+
+
+@app.errorhandler(hashing.Saturated)
+def hashing_saturated(e: hashing.Saturated):
+    return {"error": "Server busy"}, 503, {"Retry-After": str(e.retry_after)}
+
+
+@app.errorhandler(validation.Invalid)
+def invalid_json(e: validation.Invalid):
+    return {"error": "Invalid JSON"}, 400
+
+
+@app.errorhandler(validation.TooLarge)
+def too_large(e: validation.TooLarge):
+    return {"error": str(e)}, 413
+
+
+@app.errorhandler(persistence.CommitFailed)
+def commit_failed(e: persistence.CommitFailed):
+    return {"error": "Could not persist the change"}, 503
+
+
+@app.errorhandler(NotImplementedError)
+def not_implemented(e: NotImplementedError):
+    return {"error": str(e)}, 501
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+# e.g. "make_snippet=2/20,like_snippet=20/100", see `ratelimit.parse_limits()`;
+# routes without a limit, or all of them if this isn't set, aren't limited.
+rate_limits = ratelimit.parse_limits(os.environ.get("SNIPPETS_RATE_LIMITS", ""))
+# Clients are told apart by this header if it's set (say, an API key), and
+# by their address otherwise.
+RATE_LIMIT_HEADER = os.environ.get("SNIPPETS_RATE_LIMIT_HEADER")
+
+
+def throttle(endpoint, client):
+    """Implements `limit_rate()`, independently of the web framework.
+
+    Returns the response refusing `client` its request to `endpoint` if it's
+    over the limit, `None` otherwise.
+    """
+    limiter = rate_limits.get(endpoint)
+    if limiter is None:
+        return None
+    wait = limiter.acquire(client)
+    if not wait:
+        return None
+    headers = {"Retry-After": str(math.ceil(wait))}
+    return {"error": "Too many requests"}, 429, headers
+
+
+if rate_limits:
+
+    @app.before_request
+    def limit_rate():
+        client = None
+        if RATE_LIMIT_HEADER:
+            client = request.headers.get(RATE_LIMIT_HEADER)
+        return throttle(request.endpoint, client or request.remote_addr)
+
+
+@app.after_request
+def record_request(response):
+    started = g.get("started")
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        meter.observe(request.endpoint or "unmatched", response.status_code, elapsed)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Reports request, store and hashing metrics for Prometheus to scrape."""
+    return render_metrics(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_metrics() -> str:
+    """Implements `metrics()`, independently of the web framework."""
+    # the reaper evicts whatever expires soon enough that counting is cheap
+    due = expiry_index.due()
+    expired = sum(1 for s in due if s.expired and database.get(s.name) is s)
+    live = len(database) - expired
+    hashes = hasher.stats()
+    compressed, deduplicated = codec.stats(), contents.stats()
+
+    return meter.render(
+        [
+            ("snippets_live", "gauge", "Unexpired snippets.", live),
+            ("snippets_expired", "gauge", "Expired snippets not evicted yet.", expired),
+            (
+                "snippets_content_bytes",
+                "gauge",
+                "UTF-8 size of the stored snippets' contents.",
+                meter.sum("content_bytes"),
+            ),
+            (
+                "snippets_evictions_total",
+                "counter",
+                "Snippets evicted early to stay within the memory budget.",
+                meter.sum("evictions"),
+            ),
+            ("snippets_hashes_total", "counter", "Passwords hashed.", hashes["hashes"]),
+            (
+                "snippets_hash_seconds_total",
+                "counter",
+                "Time spent hashing passwords, including waiting for a worker.",
+                hashes["latency_total"],
+            ),
+            (
+                "snippets_hash_rejected_total",
+                "counter",
+                "Hashes rejected because the queue was full.",
+                hashes["rejected"],
+            ),
+            (
+                "snippets_hash_queue_depth",
+                "gauge",
+                "Hashes waiting for or running on a worker.",
+                hashes["queue_depth"],
+            ),
+            (
+                "snippets_compressed_total",
+                "counter",
+                "Contents kept compressed.",
+                compressed["compressed"],
+            ),
+            (
+                "snippets_compression_raw_bytes_total",
+                "counter",
+                "UTF-8 size of the contents kept compressed.",
+                compressed["raw_bytes"],
+            ),
+            (
+                "snippets_compression_stored_bytes_total",
+                "counter",
+                "Compressed size of the contents kept compressed.",
+                compressed["stored_bytes"],
+            ),
+            (
+                "snippets_compression_ratio",
+                "gauge",
+                "Raw over compressed bytes of the contents kept compressed.",
+                compressed["ratio"],
+            ),
+            (
+                "snippets_blobs",
+                "gauge",
+                "Distinct contents shared by the snippets that have them.",
+                deduplicated["blobs"],
+            ),
+            (
+                "snippets_dedup_hits_total",
+                "counter",
+                "Contents that were already stored, and shared instead.",
+                deduplicated["hits"],
+            ),
+            (
+                "snippets_dedup_misses_total",
+                "counter",
+                "Contents long enough to share that had to be stored anew.",
+                deduplicated["misses"],
+            ),
+        ]
+    )
+
+
+# Profiling is opt-in: set this, then send `X-Profile: 1` with a request, or
+# have a share of all requests sampled. Otherwise nothing's installed at all.
+profiler = None
+if os.environ.get("SNIPPETS_PROFILING"):
+    profiler = profiling.RequestProfiler(
+        app.wsgi_app,
+        sample_rate=float(os.environ.get("SNIPPETS_PROFILE_SAMPLE", 0)),
+        top=int(os.environ.get("SNIPPETS_PROFILE_TOP", 20)),
+    )
+    app.wsgi_app = profiler
+
+    @app.route("/debug/profiles", methods=["GET"])
+    def profiles():
+        """Lists the hottest frames of recently profiled requests, newest first."""
+        return {"profiles": profiler.recent()}, 200
+
+
 @app.route("/snippets/", methods=["POST"])
 def make_snippet() -> Tuple[Dict, int]:
     """Process & validate a new snippet.
@@ -127,21 +924,183 @@ def make_snippet() -> Tuple[Dict, int]:
     Return the response bytes (for example, marshaled JSON) and an appropriate
     HTTP status code.
     """
-    js = get_json()
+    js = get_json(fields=SNIPPET_FIELDS)
 
-    valid = validate_make_snippet(js)
+    valid = isinstance(js, dict) and validate_make_snippet(js)
     if not valid:
         return {"error": "Invalid JSON"}, 400
     name, expiration, snippet, password = valid
 
-    if name in database:
+    if name in database:  # cheap check before paying for `hash()`
         return {"error": "Snippet already exists"}, 409
+    if over_budget(name, snippet):
+        return {"error": "Snippet is larger than the memory budget"}, 413
 
     snippet = Snippet(name, expiration, snippet)
     snippet.secure(password)
 
-    database[name] = snippet
-    return snippet.json, 201
+    if not database.create_if_absent(snippet):
+        return {"error": "Snippet already exists"}, 409
+
+    seq = created(snippet)
+    if journal is not None:
+        journal.wait(seq)  # only acknowledge durable creations
+    return respond(snippet, 201, cache=False)
+
+
+@app.route("/snippets/_bulk/", methods=["POST"])
+def make_snippets():
+    """Process & validate a list of new snippets in one go.
+
+    Each item is handled like `make_snippet()` would, and the reply holds an
+    individual status for each, in the same order.
+    """
+    js = get_json(fields=BULK_FIELDS, many=True)
+    return create_snippets(js, request.url_root + "snippets/")
+
+
+def create_snippets(js, base_url):
+    """Implements `make_snippets()`, independently of the web framework.
+
+    `base_url` is what `Snippet()` would take from the request.
+    """
+    if not isinstance(js, list):
+        return {"error": "Invalid JSON"}, 400
+
+    results = [None] * len(js)
+    indices, snippets = [], []
+    for i, item in enumerate(js):
+        valid = isinstance(item, dict) and validate_make_snippet(item)
+        if not valid:
+            results[i] = result(400, error="Invalid JSON")
+            continue
+        name, expiration, snippet, password = valid
+
+        if name in database:
+            results[i] = result(409, error="Snippet already exists")
+            continue
+        if over_budget(name, snippet):
+            results[i] = result(413, error="Snippet is larger than the memory budget")
+            continue
+
+        try:
+            expires_at = time.time() + expiration
+            snippet = Snippet.restore(name, expires_at, snippet, None, 0, base_url)
+            snippet.secure(password)
+        except hashing.Saturated as e:
+            results[i] = result(503, error="Server busy", retry_after=e.retry_after)
+            continue
+        indices.append(i)
+        snippets.append(snippet)
+
+    seq = 0
+    for i, snippet, ok in zip(indices, snippets, database.create_many(snippets)):
+        if ok:
+            seq = created(snippet)
+            results[i] = result(201, snippet, cache=False)
+        else:
+            results[i] = result(409, error="Snippet already exists")
+
+    if journal is not None:
+        journal.wait(seq)  # the whole batch shares a group commit
+    return b'{"results": [' + b", ".join(results) + b"]}", 200, JSON_HEADERS
+
+
+@app.route("/snippets/", methods=["GET"])
+def list_snippets():
+    """Lists live snippets by name, a page at a time.
+
+    It corresponds to `GET /snippets/?prefix=...&limit=...&cursor=...`, where
+    the cursor is the `next_cursor` of the previous page.
+    """
+    args = request.args
+    return scan_snippets(args.get("prefix", ""), args.get("limit"), args.get("cursor"))
+
+
+def scan_snippets(prefix="", limit=None, cursor=None):
+    """Implements `list_snippets()`, independently of the web framework."""
+    try:
+        limit = int(limit) if limit is not None else 100
+        after = None
+        if cursor:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            raw = base64.b64decode(padded.encode("ascii"), b"-_", validate=True)
+            after = raw.decode("utf8")
+    except ValueError:  # including bad base64 and UTF-8
+        return {"error": "Invalid query"}, 400
+    if not 0 < limit <= 1000:
+        return {"error": "Invalid query"}, 400
+
+    snippets = database.scan(prefix, after, limit)
+    next_cursor = None
+    if len(snippets) == limit:
+        last = snippets[-1].name.encode("utf8")
+        next_cursor = base64.urlsafe_b64encode(last).decode("ascii").rstrip("=")
+
+    return {"snippets": [summary(s) for s in snippets], "next_cursor": next_cursor}, 200
+
+
+def summary(snippet, **fields) -> Dict:
+    """Everything about `snippet` but its content."""
+    return {
+        "name": snippet.name,
+        "expires_at": format_time(snippet.expires_at),
+        "url": snippet.url,
+        "likes": snippet.likes,
+        "secure": bool(snippet.password_hash),
+        **fields,
+    }
+
+
+@app.route("/snippets/_top/", methods=["GET"])
+def top_snippets():
+    """Lists the most liked live snippets, most liked first.
+
+    It corresponds to `GET /snippets/_top/?n=...`. Likes are ranked as they're
+    folded in by `like_buffer`, so the order can lag the counts by a moment.
+    """
+    return rank_snippets(request.args.get("n"))
+
+
+def rank_snippets(n=None):
+    """Implements `top_snippets()`, independently of the web framework."""
+    if leaderboard is None:
+        raise NotImplementedError("the leaderboard isn't supported by this server")
+    try:
+        n = int(n) if n is not None else 10
+    except ValueError:
+        return {"error": "Invalid query"}, 400
+    if not 0 < n <= 100:
+        return {"error": "Invalid query"}, 400
+
+    js = [summary(snippet, likes=likes) for likes, snippet in leaderboard.top(n)]
+    return {"snippets": js}, 200
+
+
+@app.route("/snippets/_search/", methods=["GET"])
+def search_snippets():
+    """Finds the live snippets containing every word of a query.
+
+    It corresponds to `GET /snippets/_search/?q=...&limit=...`; a word ending in
+    `*` matches any word it's a prefix of. The best matches come first.
+    """
+    return find_snippets(request.args.get("q", ""), request.args.get("limit"))
+
+
+def find_snippets(query, limit=None):
+    """Implements `search_snippets()`, independently of the web framework."""
+    if search_index is None:
+        raise NotImplementedError("search isn't supported by this server")
+    try:
+        limit = int(limit) if limit is not None else 10
+    except ValueError:
+        return {"error": "Invalid query"}, 400
+    if not search.parse(query) or not 0 < limit <= 100:
+        return {"error": "Invalid query"}, 400
+
+    results = search_index.search(query, limit)
+    js = [summary(snippet, score=round(score, 4)) for score, snippet in results]
+    return {"snippets": js}, 200
 
 
 @app.route("/snippets/<name>/", methods=["GET"])
@@ -153,12 +1112,136 @@ def get_snippet(name: str) -> Tuple[Dict, int]:
     Like `make_snippet()`, it should return the response bytes and an
     appropriate HTTP status code.
     """
-    snippet = database.pop(name, None)
+    return fetch_snippet(
+        name,
+        request.headers.get("If-None-Match"),
+        compression.accepts_gzip(request.headers.get("Accept-Encoding")),
+    )
+
+
+def fetch_snippet(name, if_none_match=None, gzip=False):
+    """Implements `get_snippet()`, independently of the web framework.
+
+    If the client already has the current content, it gets a 304 instead; the
+    snippet is refreshed regardless.
+    """
+    snippet = database.get(name)
+    if snippet is not None:
+        like_buffer.flush(snippet)
+
+    snippet = database.get_and_extend(name)
+    if snippet is None:
+        return {"error": f"{name} does not exist"}, 404
+
+    persist(persistence.EXTEND, snippet)
+    if memory_budget is not None:
+        memory_budget.touch(snippet)
+    if etag_matches(if_none_match, etag(snippet, gzip)):
+        return respond(snippet, 304, gzip=gzip)
+    return respond(snippet, 200, gzip=gzip)
+
+
+@app.route("/snippets/<name>/", methods=["PUT"])
+def edit_snippet(name: str):
+    """Process an edit to a snippet by name, given its password.
+
+    It corresponds to `PUT /snippets/<name>`. Given an `If-Match` header, the
+    edit only goes through if the snippet is still at the version that the
+    header's ETag is of.
+    """
+    js = get_json(fields=SNIPPET_FIELDS)
+    return change_snippet(name, js, request.headers.get("If-Match"))
+
+
+def change_snippet(name, js, if_match=None):
+    """Implements `edit_snippet()`, independently of the web framework.
+
+    The password is checked before any lock is taken, and the edit applied
+    only if the snippet wasn't replaced in the meantime (nor edited, given
+    `if_match`), so the check is never repeated.
+    """
+    valid = isinstance(js, dict) and validate_edit_request(js)
+    if not valid:
+        return {"error": "Invalid JSON"}, 400
+    new_name, expires_in, content, password = valid
+
+    snippet = database.get(name)
     if snippet is None or snippet.expired:
         return {"error": f"{name} does not exist"}, 404
+    version = None
+    if if_match is not None:
+        version = snippet.version  # read before the ETag it's matched against
+        if not precondition_holds(if_match, snippet):
+            return {"error": "Precondition failed"}, 412, {"ETag": snippet.etag}
+    if not snippet.is_editable(password):
+        return {"error": "Wrong password"}, 403
+
+    new_name = name if new_name is None else new_name
+    if over_budget(new_name, snippet.snippet if content is None else content):
+        return {"error": "Snippet is larger than the memory budget"}, 413
+    seq = 0
+
+    def apply(snippet):
+        nonlocal seq
+        size = snippet.size
+        snippet.edit(new_name, content, expires_in)
+        meter.add("content_bytes", snippet.size - size)
+        if search_index is not None and content is not None:
+            search_index.add(snippet, content)
+        fields = (new_name, snippet.snippet, str(snippet.version))
+        seq = persist(persistence.EDIT, snippet, *fields, name=name)
+
+    outcome = database.edit(snippet, new_name, apply, version, content)
+    if outcome == "missing":
+        return {"error": f"{name} does not exist"}, 404
+    if outcome == "conflict":
+        return {"error": "Precondition failed"}, 412, {"ETag": snippet.etag}
+    if outcome == "taken":
+        return {"error": "Snippet already exists"}, 409
+
+    make_room(snippet)
+    if journal is not None:
+        journal.wait(seq)  # only acknowledge durable edits
+    return respond(snippet, 200, cache=False)
+
+
+def precondition_holds(if_match, snippet) -> bool:
+    """Whether an `If-Match` header matches `snippet`, strongly as it should."""
+    if if_match.strip() == "*":
+        return True
+    tags = {tag.strip() for tag in if_match.split(",")}
+    return etag(snippet) in tags or etag(snippet, gzip=True) in tags
+
+
+@app.route("/snippets/_mget/", methods=["POST"])
+def get_snippets():
+    """Process requests for a list of snippet names in one go.
+
+    Each found snippet is refreshed just like `get_snippet()` would, the others
+    are reported as either expired or missing.
+    """
+    return fetch_snippets(get_json())
+
+
+def fetch_snippets(names):
+    """Implements `get_snippets()`, independently of the web framework."""
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        return {"error": "Invalid JSON"}, 400
+
+    for name in names:
+        snippet = database.get(name)
+        if snippet is not None:
+            like_buffer.flush(snippet)
+
+    results = []
+    for name, (status, snippet) in zip(names, database.get_many_and_extend(names)):
+        if snippet is not None:
+            persist(persistence.EXTEND, snippet)
+            if memory_budget is not None:
+                memory_budget.touch(snippet)
+        results.append(result(status, snippet, name=name))
 
-    database[name] = snippet.update()
-    return snippet.json, 200
+    return b'{"results": [' + b", ".join(results) + b"]}", 200, JSON_HEADERS
 
 
 @app.route("/snippets/<name>/like/", methods=["POST"])
@@ -167,9 +1250,10 @@ def like_snippet(name: str) -> Tuple[Dict, int]:
 
     It correponds to `POST /snippets/<name>/like`.
     """
-    snippet = database.pop(name, None)
+    snippet = database.get(name)
     if snippet is None or snippet.expired:
         return {"error": f"{name} does not exist"}, 404
 
-    database[name] = snippet.like()
-    return snippet.json, 200
+    likes = snippet.take_like()
+    like_buffer.like(snippet)
+    return respond(snippet, 200, likes)
@@ -0,0 +1,352 @@
+"""A thread-safe snippet store.
+
+Flask's development server is threaded, so the routes must never leave a window
+where a snippet is missing from the store or where two requests can interleave
+a read-modify-write on the same snippet.
+"""
+import bisect
+import itertools
+import threading
+
+
+class NameIndex:
+    """A sorted set of names, kept as a list of sorted chunks.
+
+    This is a two-level B-tree of sorts: `_maxes` locates a chunk in O(log n),
+    and chunks are small enough that inserting into one is a cheap `memmove`.
+    """
+
+    def __init__(self, chunk_size=512):
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._maxes = []  # the last name of each chunk
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(map(len, self._chunks))
+
+    def add(self, name):
+        with self._lock:
+            self._add(name)
+
+    def _add(self, name):
+        if not self._chunks:
+            self._chunks.append([name])
+            self._maxes.append(name)
+            return
+
+        i = min(bisect.bisect_left(self._maxes, name), len(self._maxes) - 1)
+        chunk = self._chunks[i]
+        j = bisect.bisect_left(chunk, name)
+        if j < len(chunk) and chunk[j] == name:
+            return
+        chunk.insert(j, name)
+        self._maxes[i] = chunk[-1]
+
+        if len(chunk) > 2 * self.chunk_size:
+            half = len(chunk) // 2
+            self._chunks[i : i + 1] = [chunk[:half], chunk[half:]]
+            self._maxes[i : i + 1] = [chunk[half - 1], chunk[-1]]
+
+    def update(self, names):
+        """Adds names that aren't in the index yet, all at once.
+
+        For more than a few, they're sorted and merged in, which is much
+        quicker than inserting them one at a time.
+        """
+        names = sorted(names)
+        with self._lock:
+            if len(names) * 16 < sum(map(len, self._chunks)):
+                for name in names:
+                    self._add(name)
+                return
+            # two sorted runs, which `sorted()` merges in linear time
+            merged = sorted([*itertools.chain.from_iterable(self._chunks), *names])
+            size = self.chunk_size
+            self._chunks = [merged[i : i + size] for i in range(0, len(merged), size)]
+            self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    def discard(self, name):
+        with self._lock:
+            i = bisect.bisect_left(self._maxes, name)
+            if i == len(self._maxes):
+                return
+            chunk = self._chunks[i]
+            j = bisect.bisect_left(chunk, name)
+            if j == len(chunk) or chunk[j] != name:
+                return
+
+            del chunk[j]
+            if chunk:
+                self._maxes[i] = chunk[-1]
+            else:
+                del self._chunks[i], self._maxes[i]
+
+    def page(self, prefix="", after=None, limit=100) -> list:
+        """Returns up to `limit` names starting with `prefix`, in order.
+
+        If given, only names that sort after `after` are returned, so passing
+        the last name of one page gets the next. Other comparable items than
+        names can be stored too, if they're paged with a `prefix` of `None`.
+        """
+        if after is not None and (prefix is None or after >= prefix):
+            locate, key = bisect.bisect_right, after
+        elif prefix:
+            locate, key = bisect.bisect_left, prefix
+        else:
+            locate = None  # from the very start
+
+        rv = []
+        with self._lock:
+            i = j = 0
+            if locate is not None:
+                i = locate(self._maxes, key)
+                if i < len(self._chunks):
+                    j = locate(self._chunks[i], key)
+            while i < len(self._chunks) and len(rv) < limit:
+                for name in self._chunks[i][j : j + limit - len(rv)]:
+                    if prefix and not name.startswith(prefix):
+                        return rv
+                    rv.append(name)
+                i, j = i + 1, 0
+        return rv
+
+
+class SnippetStore:
+    """Maps names to snippets, split into shards that each have their own lock.
+
+    Requests for different names rarely contend, while every operation on a
+    given name is atomic with respect to every other one. Expired snippets are
+    treated as absent and dropped whenever they're encountered.
+
+    Every stored name is also kept in a `NameIndex`, for ordered listing.
+    """
+
+    def __init__(self, shards=32):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._names = NameIndex()
+
+    def _shard(self, name):
+        return self._shards[hash(name) % len(self._shards)]
+
+    def __len__(self):
+        return sum(len(data) for data, _ in self._shards)
+
+    def __contains__(self, name):
+        snippet = self.get(name)
+        return snippet is not None and not snippet.expired
+
+    def __iter__(self):
+        for snippet in self.values():
+            yield snippet.name
+
+    def get(self, name, default=None):
+        """Returns the snippet without refreshing it, even if it's expired."""
+        data, _ = self._shard(name)
+        return data.get(name, default)
+
+    def values(self):
+        """Returns a snapshot of every stored snippet, expired or not."""
+        rv = []
+        for data, lock in self._shards:
+            with lock:
+                rv.extend(data.values())
+        return rv
+
+    def put(self, snippet):
+        """Unconditionally stores `snippet`, e.g. when recovering from disk."""
+        data, lock = self._shard(snippet.name)
+        with lock:
+            if snippet.name not in data:
+                self._names.add(snippet.name)
+            data[snippet.name] = snippet
+
+    def pop(self, name, default=None):
+        data, lock = self._shard(name)
+        with lock:
+            if name not in data:
+                return default
+            self._names.discard(name)
+            return data.pop(name)
+
+    def create_if_absent(self, snippet) -> bool:
+        """Stores `snippet` unless a live one already has its name."""
+        data, lock = self._shard(snippet.name)
+        with lock:
+            return self._create(data, snippet)
+
+    def create_many(self, snippets) -> list:
+        """Like `create_if_absent()` for each snippet, taking each lock once."""
+        created = [False] * len(snippets)
+        for shard, indices in self._group([s.name for s in snippets]):
+            data, lock = self._shards[shard]
+            with lock:
+                for i in indices:
+                    created[i] = self._create(data, snippets[i])
+        return created
+
+    def load(self, snippets) -> list:
+        """Like `create_many()`, but indexes the names all at once at the end.
+
+        That's much quicker for many snippets, but a name removed in the
+        meantime would stay indexed, so this is only for when nothing else
+        uses the store yet, e.g. while recovering from the journal.
+        """
+        created = [False] * len(snippets)
+        names = []
+        for shard, indices in self._group([s.name for s in snippets]):
+            data, lock = self._shards[shard]
+            with lock:
+                for i in indices:
+                    snippet = snippets[i]
+                    existing = data.get(snippet.name)
+                    if existing is not None and not existing.expired:
+                        continue
+                    if existing is None:
+                        names.append(snippet.name)
+                    data[snippet.name] = snippet
+                    created[i] = True
+        self._names.update(names)
+        return created
+
+    def get_many_and_extend(self, names) -> list:
+        """Returns a `(status, snippet)` pair for each name, taking each lock once.
+
+        The status is one of "found" (in which case the snippet was extended, as
+        in `get_and_extend()`), "expired" or "missing".
+        """
+        rv = [None] * len(names)
+        for shard, indices in self._group(names):
+            data, lock = self._shards[shard]
+            with lock:
+                for i in indices:
+                    snippet = data.get(names[i])
+                    if snippet is None:
+                        rv[i] = ("missing", None)
+                    elif snippet.expired:
+                        self._delete(data, names[i])
+                        rv[i] = ("expired", None)
+                    else:
+                        rv[i] = ("found", snippet.update())
+        return rv
+
+    def get_and_extend(self, name):
+        """Returns the live snippet after extending its expiration, or `None`."""
+        return self._modify(name, lambda snippet: snippet.update())
+
+    def add_likes(self, snippet, count) -> bool:
+        """Likes `snippet` `count` times, unless it's no longer stored."""
+        data, lock = self._shard(snippet.name)
+        with lock:
+            if data.get(snippet.name) is not snippet:
+                return False
+            snippet.like(count)
+            return True
+
+    def remove_expired(self, snippet) -> bool:
+        """Drops `snippet` if it's expired and its name hasn't been reused."""
+        data, lock = self._shard(snippet.name)
+        with lock:
+            if data.get(snippet.name) is not snippet or not snippet.expired:
+                return False
+            self._delete(data, snippet.name)
+            return True
+
+    def edit(self, snippet, new_name, apply, version=None, content=None) -> str:
+        """Runs `apply(snippet)`, which renames it to `new_name`, atomically.
+
+        Returns "edited", or why it wasn't: "missing" if `snippet` is no longer
+        stored or has expired, "conflict" if its version isn't `version` (when
+        given), or "taken" if a live snippet already has `new_name`. Only the
+        locks of the shards involved are held, in order.
+
+        `content` is what `apply()` changes the content to, if anything, for
+        stores that have to make room for it first, unlike this one.
+        """
+        old = hash(snippet.name) % len(self._shards)
+        new = hash(new_name) % len(self._shards)
+        locks = [self._shards[i][1] for i in sorted({old, new})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            data, new_data = self._shards[old][0], self._shards[new][0]
+            if data.get(snippet.name) is not snippet or snippet.expired:
+                return "missing"
+            if version is not None and snippet.version != version:
+                return "conflict"
+            if new_name == snippet.name:
+                apply(snippet)
+                return "edited"
+
+            existing = new_data.get(new_name)
+            if existing is not None and not existing.expired:
+                return "taken"
+            self._delete(data, snippet.name)
+            apply(snippet)
+            if existing is None:
+                self._names.add(new_name)
+            new_data[new_name] = snippet
+            return "edited"
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def remove(self, snippet) -> bool:
+        """Drops `snippet`, expired or not, unless its name has been reused."""
+        data, lock = self._shard(snippet.name)
+        with lock:
+            if data.get(snippet.name) is not snippet:
+                return False
+            self._delete(data, snippet.name)
+            return True
+
+    def scan(self, prefix="", after=None, limit=100) -> list:
+        """Returns up to `limit` live snippets by name, see `NameIndex.page()`.
+
+        Expired snippets are skipped; the reaper drops them from the index
+        soon enough that this never has to wade through many.
+        """
+        rv = []
+        while len(rv) < limit:
+            wanted = limit - len(rv)
+            names = self._names.page(prefix, after, wanted)
+            for name in names:
+                snippet = self.get(name)
+                if snippet is not None and not snippet.expired:
+                    rv.append(snippet)
+            if len(names) < wanted:
+                break
+            after = names[-1]
+        return rv
+
+    def _group(self, names):
+        """Groups the indices of `names` by the shard they belong to."""
+        groups = {}
+        for i, name in enumerate(names):
+            groups.setdefault(hash(name) % len(self._shards), []).append(i)
+        return groups.items()
+
+    def _create(self, data, snippet) -> bool:
+        existing = data.get(snippet.name)
+        if existing is not None and not existing.expired:
+            return False
+
+        if existing is None:
+            self._names.add(snippet.name)
+        data[snippet.name] = snippet
+        return True
+
+    def _delete(self, data, name):
+        del data[name]
+        self._names.discard(name)
+
+    def _modify(self, name, op):
+        data, lock = self._shard(name)
+        with lock:
+            snippet = data.get(name)
+            if snippet is None:
+                return None
+            if snippet.expired:
+                self._delete(data, name)
+                return None
+            return op(snippet)
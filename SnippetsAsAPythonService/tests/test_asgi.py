@@ -0,0 +1,114 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import asyncio
+import json
+import unittest
+import urllib.parse
+from unittest import mock
+
+import asgi
+import solution
+
+
+def call(method, path, js=None):
+    """Drives `asgi.app` with a single request, returning `(status, js)`."""
+    body = b"" if js is None else json.dumps(js).encode()
+    scope = {
+        "type": "http",
+        "method": method,
+        "scheme": "http",
+        "path": urllib.parse.unquote(path),
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"host", b"example.com")],
+        "server": ("example.com", 80),
+    }
+    chunks = [body[:3], body[3:]]  # make sure the body is read incrementally
+    sent = []
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+class TestAsgi(unittest.TestCase):
+    def test_routes(self):
+        request = {"name": "asgi test", "expires_in": 30, "snippet": "x"}
+        status, js = call("POST", "/snippets/", request)
+        self.assertEqual(201, status)
+        self.assertEqual("http://example.com/snippets/asgi%20test", js["url"])
+
+        status, js = call("POST", "/snippets/", request)
+        self.assertEqual(409, status)
+
+        status, js = call("GET", "/snippets/asgi%20test/")
+        self.assertEqual(200, status)
+        self.assertEqual("x", js["snippet"])
+
+        status, js = call("POST", "/snippets/asgi%20test/like/")
+        self.assertEqual(200, status)
+        self.assertEqual(1, js["likes"])
+
+    def test_edit(self):
+        request = {"name": "asgi edit", "expires_in": 30, "snippet": "x"}
+        call("POST", "/snippets/", dict(request, password="pw"))
+        status, js = call("PUT", "/snippets/asgi%20edit/", {"snippet": "y"})
+        self.assertEqual(400, status)  # the password is required
+        edit = {"snippet": "y", "password": "pw"}
+        status, js = call("PUT", "/snippets/asgi%20edit/", edit)
+        self.assertEqual((200, "y", 1), (status, js["snippet"], js["version"]))
+
+    def test_errors(self):
+        self.assertEqual(404, call("GET", "/snippets/missing/")[0])
+        self.assertEqual(400, call("POST", "/snippets/", {"name": 1})[0])
+        long_name = {"name": "x" * (solution.MAX_NAME + 1)}
+        self.assertEqual(413, call("POST", "/snippets/", long_name)[0])
+        self.assertEqual(405, call("PUT", "/snippets/")[0])
+
+    def test_bulk(self):
+        items = [{"name": "asgi bulk", "expires_in": 30, "snippet": "x"}, {"name": 1}]
+        status, js = call("POST", "/snippets/_bulk/", items)
+        self.assertEqual(200, status)
+        self.assertEqual([201, 400], [item["status"] for item in js["results"]])
+        url = js["results"][0]["snippet"]["url"]
+        self.assertEqual("http://example.com/snippets/asgi%20bulk", url)
+
+        status, js = call("POST", "/snippets/_mget/", ["asgi bulk", "missing"])
+        self.assertEqual(200, status)
+        statuses = [item["status"] for item in js["results"]]
+        self.assertEqual(["found", "missing"], statuses)
+        self.assertEqual(405, call("GET", "/snippets/_mget/")[0])
+
+    def test_error_handlers(self):
+        self.assertEqual(400, call("POST", "/snippets/_mget/", "not a list")[0])
+        unsupported = mock.Mock(side_effect=NotImplementedError("not here"))
+        with mock.patch.object(solution, "rank_snippets", unsupported):
+            status, js = call("GET", "/snippets/_top/")
+        self.assertEqual((501, {"error": "not here"}), (status, js))
+
+    def test_listing(self):
+        request = {"name": "asgi list", "expires_in": 30, "snippet": "x"}
+        call("POST", "/snippets/", request)
+        status, js = call("GET", "/snippets/")
+        self.assertEqual(200, status)
+        self.assertIn("asgi list", [item["name"] for item in js["snippets"]])
+
+    def test_secured(self):
+        request = {"name": "asgi secure", "expires_in": 30, "snippet": "x"}
+        status, js = call("POST", "/snippets/", {**request, "password": "hunter2"})
+        self.assertEqual(201, status)
+        self.assertTrue(js["secure"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import json
+import time
+import unittest
+
+import blobs
+import solution
+
+
+TEMPLATE = "<html>{{ content }}</html>\n" * 20
+
+
+class TestBlobStore(unittest.TestCase):
+    def test_dedup(self):
+        store = blobs.BlobStore(min_size=10)
+        self.assertEqual("short", store.intern("short"))
+
+        first = store.intern(TEMPLATE)
+        second = store.intern("".join(TEMPLATE.partition("\n")))  # an equal copy
+        self.assertIs(first, second)
+        self.assertEqual(TEMPLATE, first.value)
+        self.assertEqual({"blobs": 1, "hits": 1, "misses": 1}, store.stats())
+
+    def test_freed_with_last_reference(self):
+        store = blobs.BlobStore(min_size=10)
+        blob = store.intern(TEMPLATE)
+        self.assertEqual(1, len(store))
+        del blob
+        self.assertEqual(0, len(store))
+
+
+class TestSharedContents(unittest.TestCase):
+    def test_encoding_shared(self):
+        with solution.app.test_request_context("/snippets/", method="POST"):
+            first, second = [solution.Snippet(name, 30, TEMPLATE) for name in "ab"]
+        self.assertEqual(first.json, json.loads(first.body))
+        self.assertEqual(second.json, json.loads(second.body))
+        self.assertIs(first._static[1], second._static[1])
+        self.assertNotIn(TEMPLATE[:30].encode(), second._static[2])
+        self.assertNotEqual(first.etag, second.etag)
+
+    def test_eviction_releases(self):
+        with solution.app.test_request_context("/snippets/", method="POST"):
+            snippets = [solution.Snippet(f"blob {i}", 30, TEMPLATE) for i in range(3)]
+        self.assertIs(snippets[0]._content, snippets[2]._content)
+        self.assertEqual(TEMPLATE, snippets[1].snippet)
+
+        digest = snippets[0]._content.digest
+        for snippet in snippets:
+            self.assertTrue(solution.database.create_if_absent(snippet))
+            snippet.expires_at = time.time() - 1
+        for snippet in snippets:
+            self.assertTrue(solution.evict(snippet))
+
+        del snippet, snippets
+        self.assertNotIn(digest, solution.contents._blobs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+from unittest import mock
+
+import solution
+from budget import MemoryBudget
+
+
+class FakeSnippet:
+    def __init__(self, name, likes=0, expires_at=100):
+        self.name = name
+        self.likes = likes
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return self.name
+
+
+def names(snippets):
+    return [snippet.name for snippet in snippets]
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_lru(self):
+        budget = MemoryBudget(30, "lru")
+        a, b, c, d = map(FakeSnippet, "abcd")
+        for snippet in (a, b, c):
+            self.assertEqual([], budget.add(snippet, 10))
+        budget.touch(a)
+        self.assertEqual(["b"], names(budget.add(d, 10)))
+        self.assertEqual(["c", "a"], names(budget.add(FakeSnippet("big"), 15)))
+        self.assertEqual((2, 25), (len(budget), budget.used))
+
+    def test_lfu(self):
+        budget = MemoryBudget(40, "lfu")
+        a, b, c, d = (FakeSnippet(name) for name in "abcd")
+        for snippet in (a, b, c, d):
+            budget.add(snippet, 10)
+        a.likes = 3
+        budget.liked(a)
+        b.likes = 1
+        budget.liked(b)
+        d.likes = 5
+        budget.liked(d)
+        c.likes = 3
+        budget.liked(c)  # ranked after `a`, which got there first
+
+        victims = budget.add(FakeSnippet("e"), 40)
+        self.assertEqual(["b", "a", "c", "d"], names(victims))
+
+    def test_expiry(self):
+        budget = MemoryBudget(20, "expiry")
+        soon = FakeSnippet("soon", expires_at=10)
+        late = FakeSnippet("late", expires_at=20)
+        budget.add(soon, 10)
+        budget.add(late, 10)
+        soon.expires_at = 30  # extended since it was added
+
+        self.assertEqual(["late"], names(budget.add(FakeSnippet("new"), 10)))
+        self.assertEqual(["soon"], names(budget.add(FakeSnippet("newer"), 10)))
+
+    def test_discard_and_readd(self):
+        for policy in ("lru", "lfu", "expiry"):
+            with self.subTest(policy):
+                budget = MemoryBudget(20, policy)
+                a, b = FakeSnippet("a"), FakeSnippet("b")
+                budget.add(a, 10)
+                budget.add(a, 15)  # edited
+                self.assertEqual(15, budget.used)
+                budget.discard(a)
+                self.assertEqual((0, 0), (len(budget), budget.used))
+                budget.add(b, 20)
+                self.assertEqual(["b"], names(budget.add(FakeSnippet("c"), 5)))
+
+    def test_over_limit(self):
+        budget = MemoryBudget(30, "lru")
+        a, b = FakeSnippet("a"), FakeSnippet("b")
+        budget.add(a, 10)
+        self.assertEqual([b], budget.add(b, 31))  # rather than evict `a`
+        self.assertEqual((1, 10), (len(budget), budget.used))
+
+    def test_shared(self):
+        budget = MemoryBudget(100, "lru")
+        a, b, c = FakeSnippet("a"), FakeSnippet("b"), FakeSnippet("c")
+        budget.add(a, 10, ("blob", 50))
+        budget.add(b, 10, ("blob", 50))
+        self.assertEqual(70, budget.used)  # the blob is only charged once
+
+        # evicting `a` and `b` credits the blob back, and makes room for `c`
+        self.assertEqual(["a", "b"], names(budget.add(c, 60, ("other", 20))))
+        self.assertEqual(80, budget.used)
+        budget.discard(c)
+        self.assertEqual(0, budget.used)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            MemoryBudget(10, "random")
+
+
+class TestEviction(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+        self.names = ["budget a", "budget b", "budget c"]
+        with solution.app.test_request_context("/snippets/", method="POST"):
+            footprint = solution.Snippet(self.names[0], 30, "x").footprint
+        patcher = mock.patch.object(
+            solution, "memory_budget", MemoryBudget(2 * footprint, "lru")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for name in self.names:
+            snippet = solution.database.get(name)
+            if snippet is not None:
+                solution.database.remove(snippet)
+                solution.expiry_index.discard(snippet)
+                solution.forget(snippet)
+
+    def create(self, name):
+        request = {"name": name, "expires_in": 30, "snippet": "x"}
+        self.assertEqual(201, self.client.post("/snippets/", json=request).status_code)
+
+    def test_evicts_least_recently_read(self):
+        before = solution.meter.sum("evictions")
+        self.create("budget a")
+        self.create("budget b")
+        self.assertEqual(200, self.client.get("/snippets/budget a/").status_code)
+
+        self.create("budget c")
+        self.assertEqual(404, self.client.get("/snippets/budget b/").status_code)
+        self.assertEqual(200, self.client.get("/snippets/budget a/").status_code)
+        self.assertEqual(before + 1, solution.meter.sum("evictions"))
+        self.assertIn("snippets_evictions_total", solution.render_metrics())
+
+    def test_refuses_over_budget(self):
+        request = {"name": "budget a", "expires_in": 30, "snippet": "x"}
+        rv = self.client.post("/snippets/", json=dict(request, password="pw"))
+        self.assertEqual(201, rv.status_code)
+        limit = solution.memory_budget.limit
+        request = dict(request, name="budget b", snippet="x" * limit)
+        rv = self.client.post("/snippets/", json=request)
+        self.assertEqual(413, rv.status_code)
+        rv = self.client.post("/snippets/_bulk/", json=[request])
+        self.assertEqual([413], [item["status"] for item in rv.json["results"]])
+
+        edit = {"snippet": "x" * limit, "password": "pw"}
+        rv = self.client.put("/snippets/budget a/", json=edit)
+        self.assertEqual(413, rv.status_code)
+        self.assertEqual("x", self.client.get("/snippets/budget a/").json["snippet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import time
+
+from helpers import *
+import solution, runner
+
+server = runner.ServerManager.create(solution.app)  # keep this!
+
+
+class TestBulk(SnippetTestCase):
+    def __init__(self, *a, **kw):
+        super().__init__(server, *a, **kw)
+
+    def test_bulk_create(self):
+        request = [
+            make_request("one"),
+            make_request("one"),
+            {"name": "bad", "expires_in": -1, "snippet": "content"},
+            make_request("two"),
+            {"name": "boolean", "expires_in": True, "snippet": "content"},
+        ]
+        r = post("snippets/_bulk/", json=request)
+        self.assertIsNotNone(r)
+        self.assertEqual(200, r.status_code)
+
+        results = r.json()["results"]
+        self.assertEqual([201, 409, 400, 201, 400], [i["status"] for i in results])
+        self.assertEqual("two", results[3]["snippet"]["name"])
+
+        r = get("snippets/two/")
+        self.assertEqual(200, r.status_code)
+
+    def test_bulk_create_not_a_list(self):
+        r = post("snippets/_bulk/", json=make_request("one"))
+        self.assertIsNotNone(r)
+        self.assertEqual(400, r.status_code)
+
+    def test_mget(self):
+        post("snippets", json=make_request("one"))
+        post("snippets", json=make_request("gone", exp=0.1))
+        time.sleep(0.25)
+
+        r = post("snippets/_mget/", json=["one", "gone", "missing"])
+        self.assertIsNotNone(r)
+        self.assertEqual(200, r.status_code)
+
+        results = r.json()["results"]
+        statuses = [(i["name"], i["status"]) for i in results]
+        self.assertEqual(
+            [("one", "found"), ("gone", "expired"), ("missing", "missing")], statuses
+        )
+        self.assertEqual("content", results[0]["snippet"]["snippet"])
+
+
+def make_request(name, exp=30):
+    return {"name": name, "expires_in": exp, "snippet": "content"}
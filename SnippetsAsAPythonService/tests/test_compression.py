@@ -0,0 +1,107 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import gzip
+import json
+import unittest
+from unittest import mock
+
+import compression
+import solution
+
+
+LOG = "".join(f"{i:08d} GET /snippets/ 200\n" for i in range(1000))
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        for algorithm in compression.ALGORITHMS:
+            codec = compression.Codec(algorithm, level=1, threshold=100)
+            self.assertEqual("short", codec.pack("short"))
+
+            packed = codec.pack(LOG)
+            self.assertIsInstance(packed, bytes)
+            self.assertEqual(LOG, codec.unpack(packed))
+            self.assertGreater(codec.stats()["ratio"], 5)
+
+    def test_incompressible(self):
+        codec = compression.Codec(threshold=10)
+        self.assertEqual("abcdefghij", codec.pack("abcdefghij"))
+        self.assertEqual(1, codec.stats()["incompressible"])
+
+    def test_gzip_body(self):
+        codec = compression.Codec()
+        prefix = codec.deflate_prefix(LOG.encode())
+        self.assertEqual(LOG.encode(), compression.inflate_prefix(prefix))
+
+        body = compression.gzip_body(prefix, b"the end")
+        self.assertEqual(LOG.encode() + b"the end", gzip.decompress(body))
+
+    def test_encoded_prefix(self):
+        codec = compression.Codec(threshold=100)
+        packed = codec.pack(LOG, str.encode)
+        self.assertEqual(LOG.encode(), compression.inflate_prefix(packed))
+        self.assertEqual(LOG, codec.unpack(packed, bytes.decode))
+
+    def test_accepts_gzip(self):
+        self.assertTrue(compression.accepts_gzip("deflate, gzip;q=0.5"))
+        self.assertTrue(compression.accepts_gzip("*"))
+        self.assertFalse(compression.accepts_gzip("gzip;q=0"))
+        self.assertFalse(compression.accepts_gzip("br"))
+        self.assertFalse(compression.accepts_gzip(None))
+
+
+class TestCompressedSnippets(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+        request = {"name": "compressed", "expires_in": 30, "snippet": LOG}
+        self.assertEqual(201, self.client.post("/snippets/", json=request).status_code)
+
+    def tearDown(self):
+        solution.database.pop("compressed")
+
+    def test_stored_compressed(self):
+        snippet = solution.database.get("compressed")
+        self.assertTrue(snippet.compressed)
+        self.assertEqual(LOG, snippet.snippet)
+        self.assertEqual(snippet.json, json.loads(snippet.body))
+
+    def test_stored_once(self):
+        snippet = solution.database.get("compressed")
+        value = snippet._content.value
+        self.assertIsInstance(value, tuple)  # the deflated start of the body
+        self.assertIs(value, snippet.encoding()[1][1])
+
+    def test_lzma_gzip(self):
+        codec = compression.Codec("lzma", threshold=100)
+        with mock.patch.object(solution, "codec", codec):
+            with solution.app.test_request_context("/snippets/", method="POST"):
+                snippet = solution.Snippet("lzma", 30, LOG + "lzma")
+            self.assertIsInstance(snippet._content.value, bytes)
+            self.assertEqual(snippet.json, json.loads(snippet.body))
+            body = snippet.encode_gzip(snippet.expires_at, snippet.likes)
+            self.assertEqual(snippet.json, json.loads(gzip.decompress(body)))
+
+    def test_gzip_response(self):
+        plain = self.client.get("/snippets/compressed/")
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(LOG, plain.json["snippet"])
+
+        headers = {"Accept-Encoding": "gzip"}
+        rv = self.client.get("/snippets/compressed/", headers=headers)
+        self.assertEqual("gzip", rv.headers["Content-Encoding"])
+        self.assertNotEqual(plain.headers["ETag"], rv.headers["ETag"])
+        js = json.loads(gzip.decompress(rv.data))
+        self.assertEqual(LOG, js["snippet"])
+        self.assertEqual(plain.json["likes"], js["likes"])
+
+        headers["If-None-Match"] = rv.headers["ETag"]
+        rv = self.client.get("/snippets/compressed/", headers=headers)
+        self.assertEqual(304, rv.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import threading
+import unittest
+
+import persistence
+import solution
+
+
+class TestEdit(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+        request = {"name": "editable", "expires_in": 30, "snippet": "before"}
+        request["password"] = "hunter2"
+        self.assertEqual(201, self.client.post("/snippets/", json=request).status_code)
+
+    def tearDown(self):
+        for name in ("editable", "edited", "taken"):
+            snippet = solution.database.get(name)
+            if snippet is not None:
+                solution.database.remove(snippet)
+                solution.expiry_index.discard(snippet)
+                solution.forget(snippet)
+
+    def edit(self, target="editable", headers=None, **js):
+        js.setdefault("password", "hunter2")
+        return self.client.put(f"/snippets/{target}/", json=js, headers=headers)
+
+    def test_edit(self):
+        rv = self.edit(snippet="after")
+        self.assertEqual(200, rv.status_code)
+        self.assertEqual(("after", 1), (rv.json["snippet"], rv.json["version"]))
+        rv = self.client.get("/snippets/editable/")
+        self.assertEqual("after", rv.json["snippet"])
+        hits = solution.search_index.search("after")
+        self.assertEqual(["editable"], [snippet.name for _, snippet in hits])
+
+    def test_rename(self):
+        rv = self.edit(name="edited")
+        self.assertEqual(200, rv.status_code)
+        self.assertEqual("before", rv.json["snippet"])
+        self.assertEqual(404, self.client.get("/snippets/editable/").status_code)
+        self.assertEqual(200, self.client.get("/snippets/edited/").status_code)
+        listed = self.client.get("/snippets/").json["snippets"]
+        names = [item["name"] for item in listed]
+        self.assertIn("edited", names)
+        self.assertNotIn("editable", names)
+
+        request = {"name": "taken", "expires_in": 30, "snippet": "x"}
+        self.client.post("/snippets/", json=request)
+        self.assertEqual(409, self.edit("edited", name="taken").status_code)
+
+    def test_errors(self):
+        self.assertEqual(400, self.edit(password=None).status_code)
+        self.assertEqual(400, self.edit(snippet=1).status_code)
+        self.assertEqual(403, self.edit(password="wrong", snippet="x").status_code)
+        self.assertEqual(404, self.edit("missing", snippet="x").status_code)
+        self.assertEqual("before", solution.database.get("editable").snippet)
+
+    def test_if_match(self):
+        etag = self.client.get("/snippets/editable/").headers["ETag"]
+        rv = self.edit(headers={"If-Match": etag}, snippet="first")
+        self.assertEqual(200, rv.status_code)
+        self.assertNotEqual(etag, rv.headers["ETag"])
+
+        rv = self.edit(headers={"If-Match": etag}, snippet="second")  # stale
+        self.assertEqual(412, rv.status_code)
+        self.assertEqual("first", solution.database.get("editable").snippet)
+
+        weak = {"If-Match": "W/" + rv.headers["ETag"]}  # only strong tags match
+        self.assertEqual(412, self.edit(headers=weak, snippet="second").status_code)
+        self.assertEqual(200, self.edit(headers={"If-Match": "*"}).status_code)
+
+    def test_concurrent_editors(self):
+        etag = self.client.get("/snippets/editable/").headers["ETag"]
+        statuses = []
+
+        def edit(i):
+            client = solution.app.test_client()
+            rv = client.put(
+                "/snippets/editable/",
+                json={"snippet": str(i), "password": "hunter2"},
+                headers={"If-Match": etag},
+            )
+            statuses.append(rv.status_code)
+
+        hashes = solution.hasher.stats()["hashes"]
+        threads = [threading.Thread(target=edit, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, statuses.count(200))  # everyone else lost the race
+        self.assertEqual(7, statuses.count(412))
+        self.assertEqual(1, solution.database.get("editable").version)
+        self.assertLessEqual(solution.hasher.stats()["hashes"] - hashes, 8)
+
+    def replay(self, name, new_name, content, version):
+        event = persistence.Event(
+            persistence.EDIT,
+            solution.database.get(name).expires_at,
+            0,
+            [field.encode() for field in (name, new_name, content, str(version))],
+        )
+        solution.restore(event)
+
+    def test_replay(self):
+        snippet = solution.database.get("editable")
+        self.replay("editable", "edited", "new", 1)
+        self.assertIsNone(solution.database.get("editable"))
+        self.assertEqual(("new", 1), (snippet.snippet, snippet.version))
+        self.assertIs(snippet, solution.database.get("edited"))
+
+        self.replay("edited", "edited", "newer", 3)  # the versions may skip
+        self.assertEqual(("newer", 3), (snippet.snippet, snippet.version))
+
+    def test_replay_already_applied(self):
+        # as if the snapshot had been dumped after the edit of "editable" to
+        # version 1 renamed it to "taken", and another "editable" was created
+        self.assertEqual(200, self.edit(name="taken", snippet="renamed").status_code)
+        request = {"name": "editable", "expires_in": 30, "snippet": "recreated"}
+        self.assertEqual(201, self.client.post("/snippets/", json=request).status_code)
+
+        self.replay("editable", "taken", "renamed", 1)
+        self.assertEqual("recreated", solution.database.get("editable").snippet)
+        self.replay("taken", "taken", "stale", 1)
+        self.assertEqual("renamed", solution.database.get("taken").snippet)
+
+
+if __name__ == "__main__":
+    unittest.main()
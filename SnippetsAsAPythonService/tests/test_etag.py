@@ -0,0 +1,59 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+
+import solution
+
+
+class TestConditionalGet(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+        request = {"name": "etag test", "expires_in": 30, "snippet": "x"}
+        created = self.client.post("/snippets/", json=request)
+        self.assertEqual(201, created.status_code)
+        self.etag = created.headers["ETag"]
+
+    def tearDown(self):
+        solution.database.pop("etag test")
+
+    def get(self, if_none_match):
+        headers = {"If-None-Match": if_none_match}
+        return self.client.get("/snippets/etag test/", headers=headers)
+
+    def test_cached_on_reads(self):
+        snippet = solution.database.get("etag test")
+        self.assertIsNone(snippet._static)  # only written so far
+        self.client.get("/snippets/etag test/")
+        self.assertEqual(snippet.version, snippet._static[0])
+
+    def test_not_modified(self):
+        before = self.client.get("/snippets/etag test/")
+        self.assertEqual(self.etag, before.headers["ETag"])
+
+        rv = self.get(self.etag)
+        self.assertEqual(304, rv.status_code)
+        self.assertEqual(b"", rv.data)
+        self.assertEqual(self.etag, rv.headers["ETag"])
+        # the read still counts towards the expiry
+        self.assertGreater(
+            rv.headers["X-Snippet-Expires-At"], before.headers["X-Snippet-Expires-At"]
+        )
+
+    def test_match_variants(self):
+        self.assertEqual(304, self.get('"other", W/' + self.etag).status_code)
+        self.assertEqual(304, self.get("*").status_code)
+        self.assertEqual(200, self.get('"other"').status_code)
+
+    def test_likes_keep_etag(self):
+        rv = self.client.post("/snippets/etag test/like/")
+        self.assertEqual("1", rv.headers["X-Snippet-Likes"])
+        self.assertEqual(self.etag, rv.headers["ETag"])
+        self.assertEqual(304, self.get(self.etag).status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
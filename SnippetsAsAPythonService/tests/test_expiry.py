@@ -0,0 +1,88 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+
+from expiry import ExpiryIndex
+
+
+class FakeSnippet:
+    def __init__(self, name, expires_at):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class TestExpiryIndex(unittest.TestCase):
+    def setUp(self):
+        self.now = 100
+        self.index = ExpiryIndex(clock=lambda: self.now, batch_size=2)
+        self.evicted = []
+
+    def test_evicts_only_due(self):
+        self.index.schedule(FakeSnippet("old", 50))
+        self.index.schedule(FakeSnippet("new", 150))
+
+        self.index.reap(self.evicted.append)
+        self.assertEqual(["old"], [s.name for s in self.evicted])
+        self.assertEqual(1, len(self.index))
+
+    def test_reschedules_extended(self):
+        snippet = FakeSnippet("liked", 50)
+        self.index.schedule(snippet)
+        snippet.expires_at = 120  # e.g. liked a bunch since creation
+
+        self.index.reap(self.evicted.append)
+        self.assertEqual([], self.evicted)
+        self.assertEqual(1, len(self.index))
+
+        self.now = 130
+        self.index.reap(self.evicted.append)
+        self.assertEqual([snippet], self.evicted)
+
+    def test_bounded_batches(self):
+        for i in range(5):
+            self.index.schedule(FakeSnippet(str(i), i))
+
+        self.assertEqual(2, self.index.reap(self.evicted.append))
+        self.assertEqual(2, self.index.reap(self.evicted.append))
+        self.assertEqual(1, self.index.reap(self.evicted.append))
+        self.assertEqual(["0", "1", "2", "3", "4"], [s.name for s in self.evicted])
+
+    def test_due(self):
+        for expires_at in (150, 90, 120, 50, 100, 200, 60):
+            self.index.schedule(FakeSnippet(str(expires_at), expires_at))
+        due = sorted(snippet.name for snippet in self.index.due())
+        self.assertEqual(["100", "50", "60", "90"], due)
+        self.assertEqual(7, len(self.index))
+
+    def test_schedule_many(self):
+        self.index.schedule(FakeSnippet("90", 90))
+        self.index.schedule_many([FakeSnippet(str(t), t) for t in (150, 60, 95)])
+        self.index.schedule_many([FakeSnippet("80", 80)])  # pushed, one by one
+        due = sorted(snippet.name for snippet in self.index.due())
+        self.assertEqual(["60", "80", "90", "95"], due)
+        self.assertEqual(5, len(self.index))
+
+    def test_discard(self):
+        snippets = [FakeSnippet(str(i), i) for i in range(20)]
+        for snippet in snippets:
+            self.index.schedule(snippet)
+
+        self.index.discard(snippets[0])  # skipped once it comes due
+        self.index.reap(self.evicted.append)
+        self.assertEqual(["1"], [s.name for s in self.evicted])
+
+        for snippet in snippets[10:13]:  # past an eighth, they're all dropped
+            self.index.discard(snippet)
+        self.assertEqual(15, len(self.index))
+        while self.index.reap(self.evicted.append):
+            pass
+        self.assertNotIn("11", [s.name for s in self.evicted])
+        self.assertEqual(16, len(self.evicted))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import threading
+import unittest
+
+import solution
+from hashing import HashPool, Saturated
+
+
+class TestHashPool(unittest.TestCase):
+    def test_matches_hash(self):
+        pool = HashPool(solution.hash, workers=2)
+        self.assertEqual(solution.hash("hunter2"), pool.hash("hunter2"))
+        self.assertEqual(1, pool.stats()["hashes"])
+        self.assertEqual(0, pool.stats()["queue_depth"])
+
+    def test_backpressure(self):
+        release = threading.Event()
+        pool = HashPool(lambda s: release.wait(), workers=1, max_pending=2)
+        threads = [threading.Thread(target=pool.hash, args=(s,)) for s in "ab"]
+        for thread in threads:
+            thread.start()
+        while pool.stats()["queue_depth"] < 2:
+            release.wait(0.01)
+
+        with self.assertRaises(Saturated) as cm:
+            pool.hash("c")
+        self.assertGreaterEqual(cm.exception.retry_after, 1)
+        self.assertEqual(1, pool.stats()["rejected"])
+
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(0, pool.stats()["queue_depth"])
+
+    def test_saturated_is_503(self):
+        client = solution.app.test_client()
+        request = {"name": "busy", "expires_in": 30, "snippet": "x", "password": "p"}
+
+        max_pending, solution.hasher.max_pending = solution.hasher.max_pending, 0
+        try:
+            r = client.post("/snippets/", json=request)
+        finally:
+            solution.hasher.max_pending = max_pending
+        self.assertEqual(503, r.status_code)
+        self.assertIn("Retry-After", r.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
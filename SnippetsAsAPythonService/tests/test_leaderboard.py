@@ -0,0 +1,81 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+
+import solution
+from leaderboard import Leaderboard
+
+
+class FakeSnippet:
+    def __init__(self, name):
+        self.name = name
+        self.expired = False
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.board = Leaderboard()
+        self.snippets = [FakeSnippet(name) for name in "abcd"]
+
+    def top(self, n=10):
+        return [(likes, snippet.name) for likes, snippet in self.board.top(n)]
+
+    def test_ranking(self):
+        a, b, c, d = self.snippets
+        self.board.update(a, 3)
+        self.board.update(b, 5)
+        self.board.update(c, 3)
+        self.board.update(d, 0)
+        self.assertEqual([(5, "b"), (3, "a"), (3, "c")], self.top())
+        self.assertEqual([(5, "b")], self.top(1))
+
+        self.board.update(c, 7)
+        self.board.update(b, 4)  # stale, e.g. from a concurrent fold
+        self.assertEqual([(7, "c"), (5, "b"), (3, "a")], self.top())
+
+    def test_removal(self):
+        a, b, c, _ = self.snippets
+        for likes, snippet in enumerate((a, b, c), 1):
+            self.board.update(snippet, likes)
+        c.expired = True
+        self.board.discard(b)
+        self.assertEqual([(1, "a")], self.top(2))
+        self.assertEqual(2, len(self.board))
+
+    def test_rank_many(self):
+        a, b, c, d = self.snippets
+        self.board.update(a, 2)
+        for likes, snippet in zip((1, 3, 0, 4), self.snippets):
+            snippet.likes = likes
+        self.board.rank_many([a, b, c, d])  # `a` stays as it was ranked
+        self.assertEqual([(4, "d"), (3, "b"), (2, "a")], self.top())
+
+
+class TestTopRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+
+    def test_top(self):
+        for name, likes in (("top one", 2), ("top two", 4)):
+            request = {"name": name, "expires_in": 30, "snippet": "x"}
+            rv = self.client.post("/snippets/", json=request)
+            self.assertEqual(201, rv.status_code)
+            for _ in range(likes):
+                self.client.post(f"/snippets/{name}/like/")
+            # folding normally happens in the background
+            solution.like_buffer.flush(solution.database.get(name))
+
+        rv = self.client.get("/snippets/_top/", query_string={"n": 100})
+        self.assertEqual(200, rv.status_code)
+        ranked = [(js["name"], js["likes"]) for js in rv.json["snippets"]]
+        self.assertLess(ranked.index(("top two", 4)), ranked.index(("top one", 2)))
+
+        self.assertEqual(400, self.client.get("/snippets/_top/?n=0").status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
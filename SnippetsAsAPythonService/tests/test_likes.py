@@ -0,0 +1,62 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import threading
+import time
+import unittest
+
+from likes import LikeCombiner
+
+
+class FakeSnippet:
+    def __init__(self, expires_in=30):
+        self.expires_at = time.time() + expires_in
+
+
+class TestLikeCombiner(unittest.TestCase):
+    def setUp(self):
+        self.folded = {}
+        self.combiner = LikeCombiner(self._fold, stripes=4)
+
+    def _fold(self, snippet, count):
+        self.folded[snippet] = self.folded.get(snippet, 0) + count
+
+    def test_buffers_until_flushed(self):
+        snippet = FakeSnippet()
+        self.combiner.ensure_started = lambda: None  # no background flushes
+        for _ in range(3):
+            self.combiner.like(snippet)
+        self.assertEqual({}, self.folded)
+
+        self.combiner.flush(snippet)
+        self.assertEqual({snippet: 3}, self.folded)
+
+    def test_folds_expiring_right_away(self):
+        snippet = FakeSnippet(expires_in=0.01)
+        self.combiner.like(snippet)
+        self.assertEqual({snippet: 1}, self.folded)
+
+    def test_flush_all_across_threads(self):
+        snippets = [FakeSnippet(), FakeSnippet()]
+        self.combiner.ensure_started = lambda: None
+
+        def like():
+            for _ in range(100):
+                for snippet in snippets:
+                    self.combiner.like(snippet)
+
+        threads = [threading.Thread(target=like) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.combiner.flush_all()
+        self.assertEqual([800, 800], [self.folded[s] for s in snippets])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+
+import solution
+
+
+class TestListing(unittest.TestCase):
+    names = ["listing/é", "listing/a", "listing/c", "listing/b"]
+
+    def setUp(self):
+        self.client = solution.app.test_client()
+        for name in self.names:
+            request = {"name": name, "expires_in": 30, "snippet": "x"}
+            rv = self.client.post("/snippets/", json=request)
+            self.assertEqual(201, rv.status_code)
+
+    def tearDown(self):
+        for name in self.names:
+            solution.database.pop(name)
+
+    def list(self, **query):
+        rv = self.client.get("/snippets/", query_string=query)
+        self.assertEqual(200, rv.status_code)
+        return [js["name"] for js in rv.json["snippets"]], rv.json["next_cursor"]
+
+    def test_pages(self):
+        names, cursor = self.list(prefix="listing/", limit=3)
+        self.assertEqual(sorted(self.names)[:3], names)
+
+        names, cursor = self.list(prefix="listing/", limit=3, cursor=cursor)
+        self.assertEqual(["listing/é"], names)
+        self.assertIsNone(cursor)
+
+    def test_invalid(self):
+        for query in ({"limit": "none"}, {"limit": 0}, {"cursor": "!"}):
+            rv = self.client.get("/snippets/", query_string=query)
+            self.assertEqual(400, rv.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import threading
+import unittest
+
+import solution
+from metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_threads(self):
+        metrics = Metrics(buckets=(0.1, 1))
+
+        def record():
+            for seconds in (0.05, 0.5, 5):
+                metrics.observe("get_snippet", 200, seconds)
+            metrics.add("bytes", 10)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        record()  # and one that's still alive
+
+        totals = metrics.collect()
+        self.assertEqual({("get_snippet", 200): 15}, totals.requests)
+        self.assertEqual([5, 5, 5, 27.75], totals.latencies["get_snippet"])
+        self.assertEqual(50, metrics.sum("bytes"))
+        self.assertEqual(1, len(metrics._shards))  # the others were retired
+
+    def test_render(self):
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.observe("like_snippet", 404, 0.5)
+        text = metrics.render([("snippets_live", "gauge", "Live snippets.", 3)])
+        self.assertIn('_total{route="like_snippet",status="404"} 1', text)
+        self.assertIn('_bucket{route="like_snippet",le="0.1"} 0', text)
+        self.assertIn('_bucket{route="like_snippet",le="+Inf"} 1', text)
+        self.assertIn("# TYPE snippets_live gauge\nsnippets_live 3\n", text)
+
+
+class TestMetricsRoute(unittest.TestCase):
+    def test_scrape(self):
+        client = solution.app.test_client()
+        before = solution.meter.sum("content_bytes")
+        request = {"name": "metered", "expires_in": 30, "snippet": "☃" * 10}
+        self.assertEqual(201, client.post("/snippets/", json=request).status_code)
+        self.assertEqual(404, client.get("/snippets/unmetered/").status_code)
+        self.assertEqual(30, solution.meter.sum("content_bytes") - before)
+
+        rv = client.get("/metrics")
+        self.assertEqual(200, rv.status_code)
+        self.assertTrue(rv.content_type.startswith("text/plain"))
+        text = rv.get_data(as_text=True)
+        self.assertIn('_total{route="make_snippet",status="201"}', text)
+        self.assertIn('_total{route="get_snippet",status="404"}', text)
+        self.assertIn("snippets_live ", text)
+        self.assertIn("snippets_hash_seconds_total ", text)
+        self.assertIn("# TYPE snippets_compression_ratio gauge\n", text)
+        self.assertIn("snippets_blobs ", text)
+        self.assertIn("snippets_dedup_hits_total ", text)
+        solution.database.pop("metered")
+
+
+if __name__ == "__main__":
+    unittest.main()
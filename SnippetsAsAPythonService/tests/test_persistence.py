@@ -0,0 +1,145 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import errno
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import persistence
+import solution
+from persistence import CREATE, EDIT, LIKE, Journal
+
+
+class TestRecordFormat(unittest.TestCase):
+    def test_round_trip(self):
+        record = persistence.encode(CREATE, 12.5, 3, "name", b"\x00hash", "body")
+        (event,) = persistence.decode(record)
+        self.assertEqual(CREATE, event.op)
+        self.assertEqual(12.5, event.expires_at)
+        self.assertEqual(3, event.likes)
+        self.assertEqual([b"name", b"\x00hash", b"body"], event.fields)
+
+    def test_torn_tail(self):
+        good = persistence.encode(LIKE, 1.0, 1, "a")
+        torn = persistence.encode(LIKE, 2.0, 2, "a")[:-1]
+        events = list(persistence.decode(good + torn))
+        self.assertEqual(1, len(events))
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.live = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _journal(self):
+        dump = lambda: [persistence.encode(CREATE, 9.0, 7, name) for name in self.live]
+        return Journal(self.directory.name, dump)
+
+    def _recover(self):
+        events = []
+        self._journal().recover(events.append)
+        return [(e.op, e.fields[0].decode()) for e in events]
+
+    def test_recovers_log(self):
+        journal = self._journal()
+        journal.wait(journal.append(CREATE, 1.0, 0, "a"))
+        journal.wait(journal.append(LIKE, 2.0, 1, "a"))
+
+        self.assertEqual([(CREATE, "a"), (LIKE, "a")], self._recover())
+
+    def test_snapshot_compacts(self):
+        journal = self._journal()
+        for _ in range(10):
+            journal.append(LIKE, 1.0, 1, "a")
+        self.live = ["a"]
+        journal.snapshot()
+        journal.wait(journal.append(LIKE, 2.0, 8, "a"))
+
+        self.assertEqual([(CREATE, "a"), (LIKE, "a")], self._recover())
+        self.assertEqual(2, len(os.listdir(self.directory.name)))
+
+
+    def test_commits_during_snapshot(self):
+        dumping, release = threading.Event(), threading.Event()
+
+        def dump():
+            dumping.set()
+            release.wait(5)
+            return ()
+
+        journal = Journal(self.directory.name, dump, snapshot_interval=0.01)
+        journal.append(LIKE, 1.0, 1, "a")
+        self.assertTrue(dumping.wait(5))
+        seq = journal.append(LIKE, 2.0, 2, "a")
+        waiter = threading.Thread(target=journal.wait, args=(seq,))
+        waiter.start()
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())  # it didn't wait for the snapshot
+
+        journal.snapshot_interval = 3600
+        release.set()
+        journal._snapshotter.join()
+
+
+    def test_failed_commit(self):
+        journal = self._journal()
+        failing, fsync = threading.Event(), os.fsync
+
+        def flaky_fsync(fd):
+            if failing.is_set():
+                raise OSError(errno.EIO, "I/O error")
+            fsync(fd)
+
+        failing.set()
+        with mock.patch.object(persistence.os, "fsync", flaky_fsync):
+            with mock.patch.object(persistence, "RETRY_INTERVAL", 0.01):
+                seq = journal.append(CREATE, 1.0, 0, "a")
+                with self.assertRaises(persistence.CommitFailed):
+                    journal.wait(seq)
+                failing.clear()
+                journal.wait(journal.append(LIKE, 2.0, 1, "a"))
+
+        # the batch was retried, after the segments that failed to sync it
+        self.assertEqual([(CREATE, "a"), (LIKE, "a")], self._recover()[-2:])
+
+
+class TestRecovery(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        for name in ("recovered 0", "recovered 1", "recovered 2"):
+            snippet = solution.database.get(name)
+            if snippet is not None:
+                solution.database.remove(snippet)
+                solution.expiry_index.discard(snippet)
+                solution.forget(snippet)
+
+    def test_batches(self):
+        journal = Journal(self.directory.name, lambda: ())
+        expires_at = solution.time.time() + 60
+        for i in range(3):
+            fields = (f"recovered {i}", f"body {i}", b"", "http://x/snippets/", "0")
+            journal.append(CREATE, expires_at, i, *fields)
+        journal.append(EDIT, expires_at, 0, "recovered 1", "recovered 1", "edited", "1")
+        journal.wait(journal.append(LIKE, expires_at, 5, "recovered 0"))
+
+        solution.recover(Journal(self.directory.name, lambda: ()), 2).join()
+        snippets = [solution.database.get(f"recovered {i}") for i in range(3)]
+        self.assertEqual([5, 1, 2], [snippet.likes for snippet in snippets])
+        self.assertEqual("edited", snippets[1].snippet)
+        found = solution.search_index.search("body")
+        self.assertEqual({"recovered 0", "recovered 2"}, {s.name for _, s in found})
+
+
+if __name__ == "__main__":
+    unittest.main()
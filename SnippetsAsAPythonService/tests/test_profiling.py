@@ -0,0 +1,52 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+
+from werkzeug.test import Client
+
+import solution
+from profiling import RequestProfiler
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.profiler = RequestProfiler(solution.app.wsgi_app, top=5, capacity=2)
+        self.client = Client(self.profiler)
+
+    def test_only_when_asked(self):
+        self.client.get("/snippets/profiled")
+        self.assertEqual([], self.profiler.recent())
+
+        request = {"name": "profiled", "expires_in": 30, "snippet": "x"}
+        rv = self.client.post("/snippets/", json=request, headers={"X-Profile": "1"})
+        self.assertEqual(201, rv.status_code)
+
+        (profile,) = self.profiler.recent()
+        self.assertEqual("POST", profile["method"])
+        self.assertEqual("/snippets/", profile["path"])
+        self.assertEqual(201, profile["status"])
+        self.assertLessEqual(len(profile["frames"]), 5)
+        self.assertTrue(profile["frames"])
+        times = [frame["tottime"] for frame in profile["frames"]]
+        self.assertEqual(sorted(times, reverse=True), times)
+
+    def test_ring_buffer(self):
+        for name in ("a", "b", "c"):
+            self.client.get(f"/snippets/{name}", headers={"X-Profile": "1"})
+        paths = [profile["path"] for profile in self.profiler.recent()]
+        self.assertEqual(["/snippets/c", "/snippets/b"], paths)
+
+    def test_sampling(self):
+        self.profiler.sample_rate = 1.0
+        self.client.get("/snippets/sampled")
+        self.assertEqual(1, len(self.profiler.recent()))
+        self.client.get("/snippets/sampled", headers={"X-Profile": "0"})
+        self.assertEqual(2, len(self.profiler.recent()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import unittest
+from unittest import mock
+
+import solution
+from ratelimit import RateLimiter, parse_limits
+from test_asgi import call
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=2, burst=3, clock=clock)
+        self.assertEqual([0, 0, 0], [limiter.acquire("a") for _ in range(3)])
+        self.assertAlmostEqual(0.5, limiter.acquire("a"))
+        self.assertEqual(0, limiter.acquire("b"))  # buckets are per client
+
+        clock.now = 0.5
+        self.assertEqual(0, limiter.acquire("a"))
+        self.assertAlmostEqual(0.5, limiter.acquire("a"))
+
+        clock.now = 100  # refills up to the burst only
+        self.assertEqual([0, 0, 0], [limiter.acquire("a") for _ in range(3)])
+        self.assertGreater(limiter.acquire("a"), 0)
+
+    def test_forgets_clients(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=1, burst=1, max_clients=2, clock=clock)
+        limiter.acquire("a")
+        limiter.acquire("b")
+        limiter.acquire("c")  # over capacity: "a" was seen longest ago
+        self.assertEqual(2, len(limiter))
+        self.assertGreater(limiter.acquire("c"), 0)
+        self.assertEqual(0, limiter.acquire("a"))
+
+        clock.now = 10  # every bucket is full again, so none are worth keeping
+        limiter.acquire("d")
+        self.assertEqual(1, len(limiter))
+
+    def test_parse_limits(self):
+        limits = parse_limits("make_snippet=2/20, like_snippet=0.5,")
+        self.assertEqual({"make_snippet", "like_snippet"}, set(limits))
+        make = limits["make_snippet"]
+        self.assertEqual((2, 20), (make.rate, make.burst))
+        self.assertEqual(1, limits["like_snippet"].burst)
+        self.assertEqual({}, parse_limits(""))
+        with self.assertRaises(ValueError):
+            parse_limits("make_snippet=0")
+
+
+class TestThrottle(unittest.TestCase):
+    def setUp(self):
+        limits = {"get_snippet": RateLimiter(rate=0.1, burst=2)}
+        patcher = mock.patch.object(solution, "rate_limits", limits)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_throttle(self):
+        self.assertIsNone(solution.throttle("make_snippet", "a"))
+        self.assertIsNone(solution.throttle("get_snippet", "a"))
+        self.assertIsNone(solution.throttle("get_snippet", "a"))
+        body, status, headers = solution.throttle("get_snippet", "a")
+        self.assertEqual(429, status)
+        self.assertEqual("10", headers["Retry-After"])
+
+    def test_asgi(self):
+        statuses = [call("GET", "/snippets/throttled/")[0] for _ in range(3)]
+        self.assertEqual([404, 404, 429], statuses)
+        self.assertEqual(404, call("POST", "/snippets/throttled/like/")[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
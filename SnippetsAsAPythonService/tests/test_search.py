@@ -0,0 +1,106 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import time
+import unittest
+
+import search
+import solution
+
+
+class FakeSnippet:
+    def __init__(self, name, snippet):
+        self.name = name
+        self.snippet = snippet
+        self.expired = False
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = search.SearchIndex()
+        self.docs = {
+            "flask": FakeSnippet("flask", "from flask import Flask\napp = Flask()"),
+            "django": FakeSnippet("django", "from django.http import HttpResponse"),
+            "logs": FakeSnippet("logs", "ERROR flask app crashed; ERROR again"),
+        }
+        for snippet in self.docs.values():
+            self.index.add(snippet)
+
+    def names(self, query, k=10):
+        return [snippet.name for _, snippet in self.index.search(query, k)]
+
+    def test_and(self):
+        self.assertEqual(["flask", "logs"], self.names("flask app"))
+        self.assertEqual(["logs"], self.names("flask error"))
+        self.assertEqual([], self.names("flask httpresponse"))
+        self.assertEqual([], self.names("nonexistent"))
+
+    def test_prefix(self):
+        self.assertEqual(["django", "flask"], sorted(self.names("fr* imp*")))
+        self.assertEqual(["logs"], self.names("cras*"))
+
+    def test_top_k(self):
+        self.assertEqual(["flask"], self.names("flask", k=1))
+
+    def test_updates(self):
+        self.docs["logs"].expired = True
+        self.assertEqual(["flask"], self.names("flask"))
+
+        self.index.discard(self.docs["flask"])
+        self.index.discard(self.docs["logs"])
+        self.assertEqual([], self.names("flask"))
+        self.assertEqual([], self.index._vocabulary.page("fla", None, 10))
+
+        self.index.add(self.docs["django"], "now about flask")
+        self.assertEqual(["django"], self.names("flask"))
+        self.assertEqual([], self.names("httpresponse"))
+
+    def test_backfill(self):
+        index = self.index = search.SearchIndex()
+        gone = FakeSnippet("gone", "flask too")
+        index.add(self.docs["django"], "flask, edited meanwhile")
+        snippets = [*self.docs.values(), gone]
+
+        index.backfill(snippets, lambda snippet: snippet is not gone, batch_size=2)
+        self.assertEqual(["flask", "logs"], self.names("flask app"))
+        self.assertEqual(["django"], self.names("edit*"))
+        self.assertEqual([], self.names("httpresponse"))
+        self.assertEqual(3, len(index))
+
+    def test_parse(self):
+        self.assertEqual([("foo", False), ("bar", True)], search.parse("Foo-bar*"))
+        self.assertEqual([], search.parse("* -"))
+
+
+class TestSearchRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+        request = {"name": "searchable", "expires_in": 30, "snippet": "quux frobnicate"}
+        rv = self.client.post("/snippets/", json=request)
+        self.assertEqual(201, rv.status_code)
+
+    def tearDown(self):
+        snippet = solution.database.pop("searchable")
+        if snippet is not None:
+            solution.search_index.discard(snippet)
+
+    def test_search(self):
+        rv = self.client.get("/snippets/_search/", query_string={"q": "frob* QUUX"})
+        self.assertEqual(200, rv.status_code)
+        self.assertEqual(["searchable"], [js["name"] for js in rv.json["snippets"]])
+
+        rv = self.client.get("/snippets/_search/", query_string={"q": ""})
+        self.assertEqual(400, rv.status_code)
+
+    def test_eviction(self):
+        snippet = solution.database.get("searchable")
+        snippet.expires_at = time.time() - 1
+        self.assertTrue(solution.evict(snippet))
+        self.assertEqual([], solution.search_index.search("frobnicate"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import http.client
+import json
+import signal
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+import serve
+import solution
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.server = serve.Server(
+            ("127.0.0.1", 0), solution.app, threads=2, max_body=1000, keepalive=1
+        )
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        if not self.server.draining:
+            self.server.drain(5)
+        snippet = solution.database.get("served")
+        if snippet is not None:
+            solution.database.remove(snippet)
+            solution.expiry_index.discard(snippet)
+            solution.forget(snippet)
+
+    def connect(self):
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+    def test_keepalive(self):
+        conn = self.connect()
+        request = {"name": "served", "expires_in": 30, "snippet": "hello"}
+        conn.request("POST", "/snippets/", json.dumps(request))
+        rv = conn.getresponse()
+        self.assertEqual(201, rv.status)
+        rv.read()
+        sock = conn.sock
+
+        conn.request("GET", "/snippets/served/")
+        rv = conn.getresponse()
+        self.assertEqual(200, rv.status)
+        self.assertEqual("hello", json.loads(rv.read())["snippet"])
+        self.assertIs(sock, conn.sock)  # the same connection was reused
+
+    def test_refusals(self):
+        conn = self.connect()
+        conn.request("POST", "/snippets/", b"x" * 1001)
+        rv = conn.getresponse()
+        self.assertEqual((413, "close"), (rv.status, rv.headers["Connection"]))
+        rv.read()
+
+        conn = self.connect()
+        conn.putrequest("POST", "/snippets/")
+        conn.putheader("Transfer-Encoding", "chunked")
+        conn.endheaders()
+        self.assertEqual(411, conn.getresponse().status)
+
+    def test_idle_makes_room(self):
+        server = serve.Server(("127.0.0.1", 0), solution.app, threads=1, keepalive=30)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.drain, 5)
+        port = server.server_address[1]
+
+        idle = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        idle.request("GET", "/snippets/")
+        self.assertEqual(200, idle.getresponse().status)
+        # the only worker is now waiting for its next request, for up to 30s
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", "/snippets/")
+        self.assertEqual(200, conn.getresponse().status)
+
+    def test_drain(self):
+        idle = socket.create_connection(("127.0.0.1", self.port))
+        conn = self.connect()
+        conn.request("GET", "/snippets/")
+        self.assertEqual(200, conn.getresponse().status)
+
+        self.assertTrue(self.server.drain(5))
+        self.assertEqual(b"", idle.recv(1))  # closed rather than left hanging
+        idle.close()
+
+
+    def test_main_flushes_likes(self):
+        handlers = {}
+
+        def terminate():
+            while signal.SIGTERM not in handlers:
+                time.sleep(0.01)
+            handlers[signal.SIGTERM]()
+
+        threading.Thread(target=terminate, daemon=True).start()
+        argv = ["--host", "127.0.0.1", "--port", "0", "--threads", "1"]
+        with mock.patch.object(signal, "signal", handlers.__setitem__):
+            with mock.patch.object(solution.like_buffer, "flush_all") as flush_all:
+                with self.assertRaises(SystemExit) as exit:
+                    serve.main(argv)
+        self.assertEqual(0, exit.exception.code)
+        flush_all.assert_called_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import multiprocessing
+import time
+import unittest
+
+import solution
+from shared_store import SharedSnippetStore, StoreFull
+
+
+def make_snippet(name, expires_in=30, content="content"):
+    expires_at = time.time() + expires_in
+    return solution.Snippet.restore(name, expires_at, content, None, 0, "http://x/")
+
+
+class TestSharedSnippetStore(unittest.TestCase):
+    def setUp(self):
+        self.store = SharedSnippetStore(capacity=64, arena_size=4096, shards=2)
+
+    def test_create_and_get(self):
+        self.assertTrue(self.store.create_if_absent(make_snippet("a", content="☃")))
+        self.assertFalse(self.store.create_if_absent(make_snippet("a")))
+
+        snippet = self.store.get_and_extend("a")
+        self.assertEqual("☃", snippet.snippet)
+        self.assertEqual("http://x/a", snippet.url)
+        self.assertEqual(1, len(self.store))
+        self.assertIs(snippet, self.store.get("a"))  # same copy while referenced
+
+    def test_likes_write_through(self):
+        self.store.create_if_absent(make_snippet("a"))
+        snippet = self.store.get("a")
+        expires_at = snippet.expires_at
+
+        self.assertEqual(1, snippet.take_like())
+        self.assertEqual(2, snippet.take_like())
+        self.assertTrue(self.store.add_likes(snippet, 2))
+
+        del snippet  # make sure the next read comes from shared memory
+        snippet = self.store.get("a")
+        self.assertEqual(2, snippet.likes)
+        self.assertEqual(expires_at + 10, snippet.expires_at)
+
+    def test_expired(self):
+        self.store.create_if_absent(make_snippet("a", expires_in=-1))
+        self.assertNotIn("a", self.store)
+        self.assertIsNone(self.store.get_and_extend("a"))
+        self.assertTrue(self.store.create_if_absent(make_snippet("a")))
+
+    def test_rebuild_reclaims_space(self):
+        content = "x" * 500  # two shards of 2 KiB fit ~8 of these at a time
+        for i in range(50):
+            self.store.create_if_absent(make_snippet(f"old{i}", -1, content))
+        for i in range(4):
+            self.assertTrue(self.store.create_if_absent(make_snippet(f"new{i}")))
+
+        self.assertEqual(
+            ["content"] * 4, [self.store.get(f"new{i}").snippet for i in range(4)]
+        )
+
+    def test_edit(self):
+        self.store.create_if_absent(make_snippet("a"))
+        self.store.create_if_absent(make_snippet("b"))
+        self.store.create_if_absent(make_snippet("gone", expires_in=-1))
+        snippet = self.store.get("a")
+        self.assertEqual(1, snippet.take_like())
+
+        def rename(new_name):
+            return lambda snippet: snippet.edit(new_name, "edited", None)
+
+        self.assertEqual("taken", self.store.edit(snippet, "b", rename("b")))
+        self.assertEqual("conflict", self.store.edit(snippet, "c", rename("c"), 1))
+        self.assertEqual("edited", self.store.edit(snippet, "c", rename("c"), 0))
+        self.assertIsNone(self.store.get("a"))
+        self.assertIs(snippet, self.store.get("c"))
+        self.assertEqual(("edited", 1), (snippet.snippet, snippet.version))
+        self.assertEqual(2, snippet.take_like())  # the tickets carried over
+
+        # an expired snippet's name can be taken over
+        self.assertEqual("edited", self.store.edit(snippet, "gone", rename("gone")))
+        self.assertEqual(2, len(self.store))
+        self.store.pop("gone")
+        self.assertEqual("missing", self.store.edit(snippet, "d", rename("d")))
+
+    def test_edit_without_room(self):
+        store = SharedSnippetStore(capacity=8, arena_size=400, shards=1)
+        store.create_if_absent(make_snippet("a"))
+        for i in range(4):  # their space is reclaimed to make room
+            store.create_if_absent(make_snippet(f"old{i}", -1, "x" * 50))
+        snippet = store.get("a")
+        applied = []
+
+        def edit(content):
+            return lambda snippet: applied.append(snippet.edit("a", content, None))
+
+        with self.assertRaises(StoreFull):
+            store.edit(snippet, "a", edit("x" * 500), content="x" * 500)
+        self.assertEqual([], applied)
+        self.assertEqual("content", store.get("a").snippet)
+
+        outcome = store.edit(snippet, "a", edit("y" * 300), content="y" * 300)
+        self.assertEqual("edited", outcome)
+        self.assertEqual("y" * 300, store.get("a").snippet)
+
+    def test_edit_across_processes(self):
+        self.store.create_if_absent(make_snippet("a"))
+        snippet = self.store.get("a")
+        context = multiprocessing.get_context("fork")
+        child = context.Process(
+            target=self.store.edit,
+            args=(snippet, "b", lambda snippet: snippet.edit("b", "child", None)),
+        )
+        child.start()
+        child.join()
+
+        self.assertIs(snippet, self.store.get("b"))  # refreshed in place
+        self.assertEqual(("b", "child"), (snippet.name, snippet.snippet))
+        self.assertEqual(1, snippet.version)
+
+    def test_full(self):
+        with self.assertRaises(StoreFull):
+            for i in range(64):
+                self.store.create_if_absent(make_snippet(f"live{i}"))
+
+    def test_shared_across_processes(self):
+        context = multiprocessing.get_context("fork")
+        child = context.Process(
+            target=self.store.create_if_absent, args=(make_snippet("child"),)
+        )
+        child.start()
+        child.join()
+        self.assertEqual("content", self.store.get("child").snippet)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import json
+import unittest
+
+import solution
+
+
+class TestSnippet(unittest.TestCase):
+    def setUp(self):
+        with solution.app.test_request_context("/snippets/", method="POST"):
+            self.snippet = solution.Snippet("name", 30, "hello, ☃!")
+
+    def _body(self):
+        return json.loads(self.snippet.body)
+
+    def test_body_matches_json(self):
+        self.assertEqual(self.snippet.json, self._body())
+
+    def test_body_tracks_likes(self):
+        self._body()
+        self.snippet.like()
+        self.assertEqual(1, self._body()["likes"])
+        self.assertEqual(self.snippet.json, self._body())
+
+    def test_body_tracks_edits(self):
+        self._body()
+        self.snippet.secure("hunter2")
+        self.snippet.edit("renamed", "new content", 0)
+
+        body = self._body()
+        self.assertEqual("renamed", body["name"])
+        self.assertEqual("new content", body["snippet"])
+        self.assertTrue(body["secure"])
+
+    def test_etag_ignores_likes(self):
+        etag = self.snippet.etag
+        self.snippet.like()
+        self.snippet.update()
+        self.assertEqual(etag, self.snippet.etag)
+
+        self.snippet.edit("name", "new content", 0)
+        self.assertNotEqual(etag, self.snippet.etag)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import threading
+import unittest
+
+from store import NameIndex, SnippetStore
+
+
+class FakeSnippet:
+    def __init__(self, name, expired=False):
+        self.name = name
+        self.expired = expired
+        self.likes = 0
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+        return self
+
+    def like(self, count=1):
+        self.likes += count
+        return self.update()
+
+
+class TestSnippetStore(unittest.TestCase):
+    def setUp(self):
+        self.store = SnippetStore(shards=4)
+
+    def test_create_if_absent(self):
+        self.assertTrue(self.store.create_if_absent(FakeSnippet("a")))
+        self.assertFalse(self.store.create_if_absent(FakeSnippet("a")))
+        self.assertIn("a", self.store)
+        self.assertEqual(1, len(self.store))
+
+    def test_create_replaces_expired(self):
+        self.store.create_if_absent(FakeSnippet("a", expired=True))
+        self.assertTrue(self.store.create_if_absent(FakeSnippet("a")))
+
+    def test_expired_are_dropped(self):
+        self.store.create_if_absent(FakeSnippet("a", expired=True))
+        self.assertIsNone(self.store.get_and_extend("a"))
+        self.assertIsNone(self.store.get("a"))
+
+    def test_remove_expired_checks_identity(self):
+        old = FakeSnippet("a", expired=True)
+        self.store.create_if_absent(old)
+        new = FakeSnippet("a")
+        self.store.create_if_absent(new)
+
+        self.assertFalse(self.store.remove_expired(old))
+        self.assertIs(new, self.store.get("a"))
+
+    def test_concurrent_likes(self):
+        hot = FakeSnippet("hot")
+        self.store.create_if_absent(hot)
+
+        def like():
+            for _ in range(1000):
+                self.assertTrue(self.store.add_likes(hot, 1))
+
+        threads = [threading.Thread(target=like) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8000, self.store.get("hot").likes)
+
+    def test_scan(self):
+        for name in ("b2", "a", "b1", "b3", "c"):
+            self.store.create_if_absent(FakeSnippet(name))
+        self.store.create_if_absent(FakeSnippet("b0", expired=True))
+        self.store.pop("b3")
+
+        def names(*args):
+            return [snippet.name for snippet in self.store.scan(*args)]
+
+        self.assertEqual(["b1", "b2"], names("b"))
+        self.assertEqual(["a", "b1"], names("", None, 2))
+        self.assertEqual(["b2", "c"], names("", "b1", 2))
+        self.assertEqual([], names("b", "b2"))
+
+    def test_load(self):
+        self.store.create_if_absent(FakeSnippet("a"))
+        self.store.create_if_absent(FakeSnippet("b", expired=True))
+        snippets = [FakeSnippet(name) for name in ("c", "a", "b", "d")]
+
+        self.assertEqual([True, False, True, True], self.store.load(snippets))
+        self.assertIs(snippets[2], self.store.get("b"))
+        self.assertEqual(["a", "b", "c", "d"], [s.name for s in self.store.scan("")])
+
+
+class TestNameIndex(unittest.TestCase):
+    def test_chunks(self):
+        index = NameIndex(chunk_size=4)
+        names = [f"{i:04d}" for i in range(100)]
+        for name in reversed(names):
+            index.add(name)
+        index.add("0050")
+        self.assertEqual(100, len(index))
+        self.assertGreater(len(index._chunks), 1)
+
+        for name in names[::2]:
+            index.discard(name)
+        index.discard("missing")
+        self.assertEqual(names[1::2], index.page("", None, 1000))
+        self.assertEqual(["0011", "0013"], index.page("001", "0010", 2))
+        self.assertEqual(["0091", "0093"], index.page("009", None, 2))
+
+    def test_update(self):
+        index = NameIndex(chunk_size=4)
+        index.update(f"{i:04d}" for i in range(0, 100, 2))  # merged in
+        index.update(["0051", "0007"])  # too few to merge
+        self.assertEqual(52, len(index))
+        self.assertEqual(["0006", "0007", "0008"], index.page("000", "0004", 3))
+        self.assertEqual(["0050", "0051", "0052"], index.page("005", None, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+# required for CodeSignal unit tests: add current directory into search path
+import os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.dirname(currentdir))
+
+import io
+import json
+import unittest
+from unittest import mock
+
+import solution
+import validation
+from validation import Field, JSONParser
+
+
+def parse(data, chunk_size=1, **kwargs):
+    """Feeds `data` a chunk at a time, or all at once if `chunk_size` is `None`."""
+    parser = JSONParser(**kwargs)
+    if chunk_size is None:
+        return parser.parse(data)
+    for i in range(0, len(data), chunk_size):
+        parser.feed(data[i : i + chunk_size])
+    return parser.close()
+
+
+class Huge(io.RawIOBase):
+    """A body of `size` bytes, made up as they're read, that remembers how
+    many of them were.
+    """
+
+    def __init__(self, head, size):
+        self.head = head
+        self.size = size
+        self.served = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self.served, io.SEEK_END: self.size}
+        self.served = start[whence] + offset
+        return self.served
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.size - self.served)
+        data = self.head[self.served :][:size]
+        data += b"x" * (size - len(data))
+        buffer[:size] = data
+        self.served += size
+        return size
+
+
+class TestJSONParser(unittest.TestCase):
+    def test_like_json_loads(self):
+        text = json.dumps(
+            {
+                "name": "café \U0001f600",
+                "n": [1, -2.5e3, 0, True, False, None, {}, [], ""],
+                "s": 'a\n"b"\\ 😀 ☃ \ud800',
+            },
+            ensure_ascii=False,
+        )
+        for data in (text.encode("utf8", "surrogatepass"), json.dumps(text).encode()):
+            for chunk_size in (1, 2, 3, 7, 1000, None):
+                with self.subTest(data=data[:20], chunk_size=chunk_size):
+                    self.assertEqual(json.loads(data), parse(data, chunk_size))
+
+    def test_malformed(self):
+        for data in (b"", b"[1,]", b'{"a" 1}', b"01", b'"\\x"', b'"a\nb"', b"NaN"):
+            for chunk_size in (1, None):
+                with self.subTest(data=data, chunk_size=chunk_size):
+                    with self.assertRaises(validation.Invalid):
+                        parse(data, chunk_size)
+
+    def test_fields(self):
+        fields = {"name": Field(("string",), 4), "expires_in": Field(("number",))}
+        data = b'{"name": "four", "expires_in": 1.5}'
+        accented = b'{"name": "\\u00e9\\u00e9\\u00e9"}'  # six bytes in UTF-8
+        want = {"name": "four", "expires_in": 1.5}
+        for chunk_size in (1, None):
+            self.assertEqual(want, parse(data, chunk_size, fields=fields))
+            with self.assertRaises(validation.TooLarge):
+                parse(accented, chunk_size, fields=fields)
+            with self.assertRaises(validation.Invalid):
+                parse(b'{"expires_in": true}', chunk_size, fields=fields)
+
+        parser = JSONParser(fields)
+        with self.assertRaises(validation.Invalid):
+            parser.feed(b'{"expires_in": "')  # without waiting for the rest
+        # only the top-level object's fields are checked
+        data = b'{"x": {"name": 1}}'
+        self.assertEqual({"x": {"name": 1}}, parse(data, fields=fields))
+
+        data = b'[{"name": 1}, {"name": "12345"}]'
+        with self.assertRaises(validation.TooLarge):
+            parse(data, fields={"name": Field((), 4)}, many=True)
+
+    def test_limit(self):
+        parser = JSONParser(limit=10)
+        with self.assertRaises(validation.TooLarge):
+            parser.check_length(11)
+        parser.feed(b'["123456",')
+        with self.assertRaises(validation.TooLarge):
+            parser.feed(b" 1]")
+
+
+class TestRequests(unittest.TestCase):
+    def setUp(self):
+        self.client = solution.app.test_client()
+
+    def post(self, stream):
+        return self.client.post("/snippets/", input_stream=stream)
+
+    def test_refused_early(self):
+        for head, status in (
+            (b'{"name": "big", "expires_in": 30, "snippet": "', 413),
+            (b'{"name": "long', 413),
+            (b'{"name": 1, "snippet": "', 400),
+            (b'{"name": "x" "', 400),
+        ):
+            with self.subTest(head=head):
+                body = Huge(head, 1 << 30)
+                with mock.patch.object(solution, "MAX_BODY", 1 << 30):
+                    rv = self.post(body)
+                self.assertEqual(status, rv.status_code)
+                self.assertLess(body.served, solution.MAX_SNIPPET + (1 << 20))
+                self.assertIsNone(solution.database.get("big"))
+
+    def test_declared_length(self):
+        body = Huge(b"", solution.MAX_BODY + 1)
+        rv = self.post(body)
+        self.assertEqual(413, rv.status_code)
+        self.assertEqual(0, body.served)
+
+    def test_bulk(self):
+        rv = self.client.post("/snippets/_bulk/", json=[{"name": 1}])
+        self.assertEqual(200, rv.status_code)  # the item gets its own 400
+        self.assertEqual(400, rv.json["results"][0]["status"])
+
+        item = {"name": "x" * (solution.MAX_NAME + 1), "expires_in": 1, "snippet": ""}
+        rv = self.client.post("/snippets/_bulk/", json=[item])
+        self.assertEqual(413, rv.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,359 @@
+"""Parses JSON request bodies as they're read, to turn bad ones away early.
+
+`request.get_json()` reads and parses a whole body before anything checks it,
+so a 500 MB body would be buffered just to be refused. A `JSONParser` is fed
+the body a chunk at a time instead, and raises as soon as the body is over its
+limit, stops being JSON, has a field (of those it's told about) start out as
+the wrong kind of value, or has a string field grow past its limit.
+"""
+import codecs
+import json
+import re
+from json.decoder import scanstring
+from typing import NamedTuple
+
+
+class Invalid(ValueError):
+    """The body isn't JSON, or one of its fields is of the wrong kind."""
+
+
+class TooLarge(ValueError):
+    """The body, or one of its fields, is over its limit."""
+
+
+class Field(NamedTuple):
+    """What a field may be: one of `kinds` (any, if empty), and if a string, no
+    more than `limit` bytes in UTF-8 (any, if 0).
+
+    The kinds are "string", "number", "boolean", "null", "object" and "array".
+    """
+
+    kinds: tuple = ()
+    limit: int = 0
+
+
+CHUNK_SIZE = 64 * 1024
+
+# what's expected next, outside of a string
+VALUE, VALUE_OR_END, KEY, KEY_OR_END, COLON, COMMA_OR_END, DONE = range(7)
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_NUMBER_CHARS = re.compile(rb"[-+.eE0-9]*")
+_NUMBER = re.compile(rb"-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+# runs of string bytes and whole escapes, up to a quote or anything invalid
+_SPAN = re.compile(rb'(?:[^"\\\x00-\x1f]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+_PARTIAL_ESCAPE = re.compile(rb"\\(?:u[0-9a-fA-F]{0,3})?")
+_HIGH_SURROGATE = re.compile(rb"\\u[dD][89abAB][0-9a-fA-F]{2}")
+
+_KINDS = {ord('"'): "string", ord("{"): "object", ord("["): "array"}
+_KINDS.update({ord(c): "number" for c in "-0123456789"})
+_KINDS.update({ord("t"): "boolean", ord("f"): "boolean", ord("n"): "null"})
+_LITERALS = {ord("t"): (b"true", True), ord("f"): (b"false", False)}
+_LITERALS[ord("n")] = (b"null", None)
+
+_utf8 = codecs.getincrementaldecoder("utf-8")
+
+
+def _refuse(constant):
+    raise ValueError(f"{constant} isn't JSON")
+
+
+_STRICT = {"parse_constant": _refuse}  # NaN and Infinity aren't JSON
+
+
+def _kind(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "object" if isinstance(value, dict) else "array"
+
+
+class JSONParser:
+    """An incremental (push) JSON parser, which checks `fields` as it goes.
+
+    The fields are checked in the top-level object, or if `many`, in each
+    object of the top-level array. Past `limit` bytes (if nonzero), the body
+    is too large. Values come out as `json.loads()` would make them.
+    """
+
+    def __init__(self, fields=None, many=False, limit=0):
+        self.fields = fields or {}
+        self.many = many
+        self.limit = limit
+        self.received = 0
+
+        self._buf = b""
+        self._pos = 0
+        self._expect = VALUE
+        self._stack = []  # of `[container, key, whether it's checked]`
+        self._value = None
+
+        self._string = None  # the parts of the string being parsed, if any
+        self._string_field = None  # its name, if it's a field with a limit
+        self._string_limit = 0
+        self._string_size = 0
+        self._decoder = None
+
+    def check_length(self, length):
+        """Refuses a body whose declared length is too large, before reading it."""
+        if self.limit and length is not None and length > self.limit:
+            raise TooLarge("Request body too large")
+
+    def parse(self, data):
+        """Parses a whole body at once, which is much quicker for one that's
+        already been read in full, and checks it just the same.
+        """
+        self.check_length(len(data))
+        try:
+            value = json.loads(data.decode("utf8", "surrogatepass"), **_STRICT)
+        except ValueError as e:
+            raise Invalid(str(e)) from None
+        if not self.many:
+            self._check(value)
+        elif isinstance(value, list):
+            for item in value:
+                self._check(item)
+        return value
+
+    def _check(self, record):
+        if not isinstance(record, dict):
+            return
+        for name, field in self.fields.items():
+            if name not in record:
+                continue
+            value = record[name]
+            if field.kinds and _kind(value) not in field.kinds:
+                raise Invalid(f"{name} must be of kind {' or '.join(field.kinds)}")
+            if field.limit and isinstance(value, str):
+                if len(value.encode("utf8", "surrogatepass")) > field.limit:
+                    raise TooLarge(f"{name} is over {field.limit} bytes")
+
+    def feed(self, data):
+        self.received += len(data)
+        if self.limit and self.received > self.limit:
+            raise TooLarge("Request body too large")
+        self._buf = self._buf[self._pos :] + bytes(data)
+        self._pos = 0
+        self._parse(eof=False)
+
+    def close(self):
+        """Returns the value, once the whole body has been fed."""
+        self._parse(eof=True)
+        if self._expect != DONE:
+            raise Invalid("truncated")
+        return self._value
+
+    def _parse(self, eof):
+        buf = self._buf
+        while True:
+            if self._string is not None:
+                if not self._scan_string(eof):
+                    return
+                continue
+
+            pos = self._pos = _WHITESPACE.match(buf, self._pos).end()
+            if pos == len(buf):
+                return
+            c, expect = buf[pos], self._expect
+
+            if expect == DONE:
+                raise Invalid("trailing data")
+            if expect == COMMA_OR_END:
+                container = self._stack[-1][0]
+                if c == ord(","):
+                    self._expect = KEY if isinstance(container, dict) else VALUE
+                    self._pos += 1
+                elif c == (ord("}") if isinstance(container, dict) else ord("]")):
+                    self._pos += 1
+                    self._add(self._stack.pop()[0])
+                else:
+                    raise Invalid(f"expected ',' at byte {self._at(pos)}")
+            elif expect == COLON:
+                if c != ord(":"):
+                    raise Invalid(f"expected ':' at byte {self._at(pos)}")
+                self._pos += 1
+                self._expect = VALUE
+            elif expect in (KEY, KEY_OR_END):
+                if c == ord("}") and expect == KEY_OR_END:
+                    self._pos += 1
+                    self._add(self._stack.pop()[0])
+                elif c == ord('"'):
+                    self._pos += 1
+                    self._start_string(None, 0)
+                else:
+                    raise Invalid(f"expected a key at byte {self._at(pos)}")
+            elif c == ord("]") and expect == VALUE_OR_END:
+                self._pos += 1
+                self._add(self._stack.pop()[0])
+            elif not self._start_value(c, eof):
+                return
+
+    def _at(self, pos) -> int:
+        """Where `_buf[pos]` is in the body, for error messages."""
+        return self.received - len(self._buf) + pos
+
+    def _start_value(self, c, eof) -> bool:
+        """Parses a value starting with `c`, or returns `False` if it's cut off."""
+        kind = _KINDS.get(c)
+        if kind is None:
+            raise Invalid(f"unexpected {chr(c)!r}")
+        name, field = None, None
+        if self._stack and self._stack[-1][2]:
+            name = self._stack[-1][1]
+            field = self.fields.get(name)
+        if field is not None and field.kinds and kind not in field.kinds:
+            raise Invalid(f"{name} must be of kind {' or '.join(field.kinds)}")
+
+        buf, pos = self._buf, self._pos
+        if kind == "string":
+            self._pos += 1
+            if field is not None and field.limit:
+                self._start_string(name, field.limit)
+            else:
+                self._start_string(None, 0)
+        elif kind in ("object", "array"):
+            self._pos += 1
+            if kind == "object":
+                depth = 1 if self.many else 0
+                checked = len(self._stack) == depth and (
+                    not self.many or isinstance(self._stack[0][0], list)
+                )
+                self._stack.append([{}, None, checked])
+                self._expect = KEY_OR_END
+            else:
+                self._stack.append([[], None, False])
+                self._expect = VALUE_OR_END
+        elif kind == "number":
+            end = _NUMBER_CHARS.match(buf, pos).end()
+            if end == len(buf) and not eof:
+                return False
+            match = _NUMBER.fullmatch(buf, pos, end)
+            if match is None:
+                raise Invalid(f"malformed number {buf[pos:end][:32]!r}")
+            try:
+                value = float(match[0]) if match[1] or match[2] else int(match[0])
+            except ValueError as e:  # too many digits
+                raise Invalid(str(e)) from None
+            self._pos = end
+            self._add(value)
+        else:
+            word, value = _LITERALS[c]
+            if len(buf) - pos < len(word) and word.startswith(buf[pos:]):
+                if not eof:
+                    return False
+            if buf[pos : pos + len(word)] != word:
+                raise Invalid(f"malformed literal {buf[pos:pos + len(word)]!r}")
+            self._pos += len(word)
+            self._add(value)
+        return True
+
+    def _add(self, value):
+        """Puts a complete value where it belongs."""
+        if not self._stack:
+            self._value = value
+            self._expect = DONE
+            return
+        container, key, _ = self._stack[-1]
+        if isinstance(container, dict):
+            container[key] = value
+        else:
+            container.append(value)
+        self._expect = COMMA_OR_END
+
+    def _start_string(self, field, limit):
+        self._string = []
+        self._string_field = field
+        self._string_limit = limit
+        self._string_size = 0
+        self._decoder = None
+
+    def _grow(self, size):
+        self._string_size += size
+        if self._string_limit and self._string_size > self._string_limit:
+            limit = self._string_limit
+            raise TooLarge(f"{self._string_field} is over {limit} bytes")
+
+    def _scan_string(self, eof) -> bool:
+        """Parses as much of a string as has been read, returning whether it
+        was all there.
+        """
+        buf, pos = self._buf, self._pos
+        end = _SPAN.match(buf, pos).end()
+        if end < len(buf) and buf[end] == ord('"'):
+            self._take(buf[pos:end], final=True)
+            self._pos = end + 1
+            self._end_string("".join(self._string))
+            return True
+
+        if end < len(buf) and not _PARTIAL_ESCAPE.fullmatch(buf, end):
+            if buf[end] == ord("\\"):
+                raise Invalid(f"invalid escape at byte {self._at(end)}")
+            raise Invalid(f"control character at byte {self._at(end)}")
+        if eof:
+            raise Invalid("unterminated string")
+
+        # the rest is cut off, so hold back half of a surrogate pair
+        start = end - 6
+        if start >= pos and _HIGH_SURROGATE.fullmatch(buf, start, end):
+            i = start
+            while i > pos and buf[i - 1] == ord("\\"):
+                i -= 1
+            if (start - i) % 2 == 0:  # and not just an escaped backslash
+                end = start
+        self._take(buf[pos:end], final=False)
+        self._pos = end
+        return False
+
+    def _take(self, data, final):
+        """Decodes and unescapes a piece of a string, up to a token boundary."""
+        if final and self._decoder is None:
+            try:
+                text = data.decode("utf8", "surrogatepass")
+            except UnicodeDecodeError as e:
+                raise Invalid(str(e)) from None
+        else:  # the piece may end, or start, in the middle of a character
+            if self._decoder is None:
+                self._decoder = _utf8("surrogatepass")  # as `json.loads()` does
+            try:
+                text = self._decoder.decode(data, final)
+            except UnicodeDecodeError as e:
+                raise Invalid(str(e)) from None
+
+        if b"\\" in data:
+            text = scanstring(text + '"', 0)[0]
+            self._grow(len(text.encode("utf8", "surrogatepass")))
+        else:
+            self._grow(len(data))
+        self._string.append(text)
+
+    def _end_string(self, text):
+        self._string = self._decoder = None
+        if self._expect in (KEY, KEY_OR_END):
+            self._stack[-1][1] = text
+            self._expect = COLON
+        else:
+            self._add(text)
+
+
+def read(stream, parser, length=None):
+    """Feeds `parser` the whole of a file-like `stream`, returning its value.
+
+    Given the body's declared `length`, one that's too large for the parser is
+    refused without reading any of it.
+    """
+    parser.check_length(length)
+    first = stream.read(CHUNK_SIZE)
+    chunk = stream.read(CHUNK_SIZE) if first else b""
+    if not chunk:  # it all came at once
+        return parser.parse(first)
+
+    parser.feed(first)
+    while chunk:
+        parser.feed(chunk)
+        chunk = stream.read(CHUNK_SIZE)
+    return parser.close()